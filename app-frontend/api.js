@@ -22,6 +22,10 @@ export async function processTrip(tripData) {
 }
 
 // INIT NAVIGATION ROUTE → Used in NavigationScreen
+// The server issues one navigation session per route; its id is sent with
+// every location update so drivers never share state.
+
+let navigationSessionId = null;
 
 export async function initNavigationRoute(coords, durationText) {
   try {
@@ -35,6 +39,9 @@ export async function initNavigationRoute(coords, durationText) {
     });
 
     const data = await res.json();
+    if (data.route && data.route.session_id) {
+      navigationSessionId = data.route.session_id;
+    }
     return data;
   } catch (err) {
     console.log("initNavigationRoute() error:", err);
@@ -50,6 +57,7 @@ export async function sendLocationUpdate(location, heading, speedKmh) {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({
+        session_id: navigationSessionId,
         location: location,
         heading: heading,
         speed_kmh: speedKmh, 
@@ -0,0 +1,229 @@
+"""
+Benchmark: /ai/analyze_routes latency for 1, 3 and 50 routes.
+
+Run from backend/:
+    python benchmarks/bench_ai_inference.py [--routes 1 3 50] [--repeat 30] [--models-dir DIR]
+
+The trained .pkl files are Git LFS objects; when they are not checked out
+(or --models-dir is not given) stand-in random forests with the same feature
+columns are trained on synthetic rows (--trees, --train-rows).
+
+Feature preparation alone, per request:
+  - dataframe:  the previous prepare_trip_features - dict copy, one
+                LabelEncoder.transform per categorical, a one-row DataFrame
+                reindexed by feature_columns - per route
+  - compiled:   encode_features - value -> code dicts compiled at load,
+                written straight into one preallocated array
+
+Then the real endpoint in-process (FastAPI TestClient):
+  - per-route:  the previous engine path - dataframe features and separate
+                predict / predict / predict_proba calls per route
+  - batched:    GreenMileRecommendationEngine.predict_routes - one feature
+                matrix, one regression call and one predict_proba call
+  - compiled:   batched, with both forests compiled by tree_compiler to
+                flat node arrays (memory-mapped) instead of sklearn
+Reports median and p95 latency per request.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+os.environ.setdefault("JWT_SECRET", "bench")
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+from models.ai_models.recommendation_engine import GreenMileRecommendationEngine
+from models.ai_models.tree_compiler import compile_file
+
+CATEGORIES = {
+    "Vehicle Type": ["Light-Duty Trucks", "Heavy-Duty Trucks", "Vans", "Cars"],
+    "Fuel Type": ["Diesel", "Gasoline", "CNG", "Electric", "Hybrid"],
+    "Road Type": ["Highway", "Urban", "Rural"],
+    "Traffic Conditions": ["Light", "Moderate", "Heavy"],
+    "City": ["Riyadh", "Jeddah", "Dammam", "Mecca", "Medina"],
+}
+MODEL_FILES = ("regression_model.pkl", "classification_model.pkl", "label_encoders.pkl", "category_thresholds.pkl")
+
+
+def train_standin_models(directory, trees, rows, seed=0):
+    """Random forests over the engine's feature columns, saved as the four .pkl files."""
+    rng = np.random.default_rng(seed)
+    columns = [
+        "Distance_km", "Speed", "TrafficIndexLive", "JamsCount",
+        "Hour", "DayOfWeek", "Month", "IsWeekend", "IsPeakHour",
+        "Temperature", "Humidity", "Wind Speed",
+    ]
+    data = pd.DataFrame({
+        "Distance_km": rng.uniform(1, 80, rows),
+        "Speed": rng.uniform(10, 120, rows),
+        "TrafficIndexLive": rng.uniform(0, 60, rows),
+        "JamsCount": rng.integers(0, 20, rows),
+        "Hour": rng.integers(0, 24, rows),
+        "DayOfWeek": rng.integers(0, 7, rows),
+        "Month": rng.integers(1, 13, rows),
+        "Temperature": rng.uniform(10, 48, rows),
+        "Humidity": rng.uniform(5, 90, rows),
+        "Wind Speed": rng.uniform(0, 40, rows),
+    })
+    data["IsWeekend"] = (data["DayOfWeek"] >= 5).astype(int)
+    data["IsPeakHour"] = data["Hour"].isin([7, 8, 9, 17, 18, 19]).astype(int)
+
+    encoders = {}
+    for name, values in CATEGORIES.items():
+        encoders[name] = LabelEncoder().fit(values)
+        data[f"{name}_encoded"] = rng.integers(0, len(values), rows)
+        columns.append(f"{name}_encoded")
+
+    features = data[columns]
+    co2e = (
+        features["Distance_km"] * (0.18 + 0.02 * features["Vehicle Type_encoded"])
+        * (1 + features["TrafficIndexLive"] / 100) + rng.normal(0, 0.5, rows)
+    )
+    labels = np.where(co2e < 5, "Green", np.where(co2e < 12, "Yellow", "Red"))
+
+    regression = RandomForestRegressor(n_estimators=trees, min_samples_leaf=2, random_state=seed, n_jobs=1)
+    classification = RandomForestClassifier(n_estimators=trees, min_samples_leaf=2, random_state=seed, n_jobs=1)
+    regression.fit(features, co2e)
+    classification.fit(features, labels)
+
+    for filename, obj in zip(MODEL_FILES, (regression, classification, encoders, {"Green": 5, "Yellow": 12})):
+        joblib.dump(obj, os.path.join(directory, filename))
+    return directory
+
+
+def dataframe_features(engine, trip_data):
+    """prepare_trip_features as it was before the compiled encoder."""
+    trip_encoded, warnings = dict(trip_data), []
+    for col in engine.CATEGORICAL_COLUMNS:
+        if col in trip_encoded:
+            trip_encoded[f"{col}_encoded"], warn = engine._safe_encode(col, trip_encoded[col])
+            if warn:
+                warnings.append(warn)
+    for f in engine.feature_columns:
+        if f not in trip_encoded:
+            trip_encoded[f] = 0
+    return pd.DataFrame([trip_encoded])[engine.feature_columns], warnings
+
+
+class PerRouteEngine(GreenMileRecommendationEngine):
+    """The engine as it was: a one-row DataFrame and three model calls per route."""
+
+    def predict_routes(self, routes_list):
+        predictions = []
+        for route_data in routes_list:
+            features, warnings = dataframe_features(self, route_data)
+            predicted_co2 = float(self.regression_model.predict(features)[0])
+            self.classification_model.predict(features)
+            proba = self.classification_model.predict_proba(features)[0]
+            predictions.append(self._build_prediction(route_data, predicted_co2, proba, warnings))
+        return predictions
+
+
+def make_payload(count, rng):
+    summaries = ["King Fahd Highway", "Olaya Street", "Northern Ring Road", "Rural Road 505"]
+    return {
+        "routes": [
+            {
+                "summary": f"{rng.choice(summaries)} {i}",
+                "distance": f"{rng.uniform(5, 60):.1f} km",
+                "duration": f"{rng.randint(10, 90)} mins",
+                "trafficIndex": rng.uniform(0, 50),
+                "jamsCount": rng.randint(0, 10),
+                "trafficConditions": rng.choice(["light", "moderate", "heavy"]),
+            }
+            for i in range(count)
+        ],
+        "trip_metadata": {"vehicleType": "Light-Duty Trucks", "fuelType": "Diesel", "city": "Riyadh"},
+    }
+
+
+def measure_features(engine, formatted, repeat):
+    timings = {}
+    for name, prepare in (
+        ("dataframe", lambda: [dataframe_features(engine, trip) for trip in formatted]),
+        ("compiled", lambda: engine.encode_features(formatted)),
+    ):
+        prepare()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            prepare()
+        timings[name] = (time.perf_counter() - started) / repeat * 1000
+    return timings
+
+
+def measure(client, payload, repeat):
+    client.post("/ai/analyze_routes", json=payload)  # warm-up
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.post("/ai/analyze_routes", json=payload)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(response.text)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", type=int, nargs="+", default=[1, 3, 50])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--models-dir", default=None)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--train-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    models_dir = args.models_dir or train_standin_models(tempfile.mkdtemp(), args.trees, args.train_rows)
+    paths = dict(zip(
+        ("regression_model_path", "classification_model_path", "encoders_path", "thresholds_path"),
+        (os.path.join(models_dir, name) for name in MODEL_FILES),
+    ))
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    compiled_dir = tempfile.mkdtemp()
+    for key in ("regression_model_path", "classification_model_path"):
+        name = os.path.splitext(os.path.basename(paths[key]))[0]
+        compile_file(paths[key], os.path.join(compiled_dir, name))
+
+    engines = {
+        "per-route": PerRouteEngine(**paths),
+        "batched": GreenMileRecommendationEngine(**paths),
+        "compiled": GreenMileRecommendationEngine(**paths, compiled_models_dir=compiled_dir),
+    }
+    client = TestClient(app_main.app)
+    rng = random.Random(3)
+    payloads = {count: make_payload(count, rng) for count in args.routes}
+
+    print(f"models: {models_dir}")
+    print(f"{'routes':>7} {'dataframe ms':>13} {'compiled ms':>12}")
+    for count in args.routes:
+        formatted = [
+            app_main.ai_controller.format_route_for_ai(route, payloads[count]["trip_metadata"])
+            for route in payloads[count]["routes"]
+        ]
+        timings = measure_features(engines["batched"], formatted, args.repeat)
+        print(f"{count:>7} {timings['dataframe']:>13.3f} {timings['compiled']:>12.3f}")
+
+    print()
+    print(f"{'routes':>7} {'engine':>10} {'median ms':>10} {'p95 ms':>8}")
+    for count in args.routes:
+        for name, engine in engines.items():
+            app_main.ai_controller.engine = engine
+            median, p95 = measure(client, payloads[count], args.repeat)
+            print(f"{count:>7} {name:>10} {median:>10.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
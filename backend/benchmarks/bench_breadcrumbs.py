@@ -0,0 +1,148 @@
+"""
+Benchmark: sustained location_update pings per second with the breadcrumb log.
+
+Run from backend/:
+    python benchmarks/bench_breadcrumbs.py [--sessions 200] [--seconds 5] [--database-url sqlite:////tmp/trace.db]
+
+Drives NavigationController.location_update round-robin over many sessions
+for a fixed time and compares:
+  - none:       no breadcrumbs (the ceiling)
+  - buffered:   BreadcrumbLog (buffer append on the hot path, bulk INSERT in
+                its background thread)
+  - per-ping:   one INSERT + COMMIT per ping, as a naive logger would do
+Reports pings/s on the request path, hot-path p99, and checks every ping
+reached the trace table once all sessions end (flush_session per session).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from controllers.NavigationController import NavigationController
+from models.trip_trace_db import TripTracePointDB
+from utils.breadcrumbs import BreadcrumbLog
+
+
+class PerPingLog:
+    """Naive baseline: commit every ping as it arrives."""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def record(self, session_id, latitude, longitude, speed_kmh=None, heading=None, timestamp=None, trip_id=None):
+        db = self.session_factory()
+        try:
+            db.add(TripTracePointDB(
+                session_id=session_id, trip_id=trip_id,
+                recorded_at=timestamp or time.time(),
+                latitude=latitude, longitude=longitude, speed_kmh=speed_kmh, heading=heading,
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def flush_session(self, session_id):
+        return 0
+
+    def close(self):
+        return 0
+
+
+def synthetic_route(rng, vertices=300):
+    lat, lng = 24.7136 + rng.uniform(-0.2, 0.2), 46.6753 + rng.uniform(-0.2, 0.2)
+    coords = []
+    for _ in range(vertices):
+        lat += rng.uniform(0, 0.0004)
+        lng += rng.uniform(-0.0002, 0.0004)
+        coords.append({"latitude": lat, "longitude": lng})
+    return coords
+
+
+def row_count(session_factory):
+    db = session_factory()
+    try:
+        return db.execute(select(func.count()).select_from(TripTracePointDB)).scalar_one()
+    finally:
+        db.close()
+
+
+def run(mode, args, routes, session_factory):
+    if mode == "buffered":
+        log = BreadcrumbLog(session_factory, flush_size=args.flush_size, flush_interval=args.flush_seconds)
+    elif mode == "per-ping":
+        log = PerPingLog(session_factory)
+    else:
+        log = None
+
+    controller = NavigationController(breadcrumbs=log)
+    for session_id, route in routes.items():
+        controller.init_route(route, "60 mins", session_id=session_id)
+
+    before = row_count(session_factory)
+    sessions = list(routes.items())
+    latencies = []
+    pings = 0
+    deadline = time.perf_counter() + args.seconds
+
+    while time.perf_counter() < deadline:
+        session_id, route = sessions[pings % len(sessions)]
+        p = route[(pings // len(sessions)) % len(route)]
+        started = time.perf_counter()
+        controller.location_update(
+            {"latitude": p["latitude"] + 0.00002, "longitude": p["longitude"]}, 45, 50, session_id=session_id
+        )
+        latencies.append(time.perf_counter() - started)
+        pings += 1
+
+    elapsed = args.seconds
+
+    started = time.perf_counter()
+    for session_id in routes:
+        controller.end_session(session_id)
+        controller.flush_trace(session_id)
+    end_flush = time.perf_counter() - started
+
+    if log is not None:
+        log.close()
+    written = row_count(session_factory) - before
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    return pings / elapsed, p99, written, pings, end_flush
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--flush-size", type=int, default=1000)
+    parser.add_argument("--flush-seconds", type=float, default=5.0)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--modes", nargs="+", default=["none", "buffered", "per-ping"])
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'trace.db')}"
+    engine = create_engine(url)
+    TripTracePointDB.__table__.create(engine, checkfirst=True)
+    session_factory = sessionmaker(bind=engine)
+
+    rng = random.Random(7)
+    routes = {f"driver-{i}": synthetic_route(rng) for i in range(args.sessions)}
+
+    print(f"database: {url}")
+    print(f"{'mode':>9} {'pings/s':>9} {'p99 ms':>8} {'end flush ms':>13} {'stored':>14}")
+    for mode in args.modes:
+        rate, p99, written, pings, end_flush = run(mode, args, routes, session_factory)
+        stored = f"{written}/{pings}" if mode != "none" else "-"
+        print(f"{mode:>9} {rate:>9.0f} {p99:>8.3f} {end_flush * 1000:>13.1f} {stored:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: one location_update call per ping vs one batched call per gateway delivery.
+
+Run from backend/:
+    python benchmarks/bench_location_batch.py [--vehicles 100 500 2000] [--deliveries 20]
+
+Each vehicle has its own navigation session and route. A gateway "delivery"
+carries one ping per vehicle. Compares applying a delivery with
+NavigationController.location_update per ping against
+NavigationController.location_update_batch (one vectorized windowed
+projection over all sessions), and checks both give the same results. Times
+exclude HTTP, which the batch path saves once per ping on top of this.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.NavigationController import NavigationController
+
+
+def synthetic_route(rng, vertices):
+    lat, lng = 24.7136 + rng.uniform(-0.2, 0.2), 46.6753 + rng.uniform(-0.2, 0.2)
+    coords = []
+    for _ in range(vertices):
+        lat += rng.uniform(0, 0.0004)
+        lng += rng.uniform(-0.0002, 0.0004)
+        coords.append({"latitude": lat, "longitude": lng})
+    return coords
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vehicles", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--deliveries", type=int, default=20)
+    parser.add_argument("--vertices", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'vehicles':>9} {'per-ping ms':>12} {'batch ms':>9} {'speedup':>8} {'pings/s batched':>16}")
+
+    for vehicles in args.vehicles:
+        rng = random.Random(vehicles)
+        routes = {f"vehicle-{v}": synthetic_route(rng, args.vertices) for v in range(vehicles)}
+
+        single = NavigationController()
+        batched = NavigationController()
+        for controller in (single, batched):
+            for session_id, route in routes.items():
+                controller.init_route(route, "60 mins", session_id=session_id)
+
+        deliveries = []
+        for d in range(args.deliveries):
+            records = []
+            for session_id, route in routes.items():
+                p = route[min(d * 5, len(route) - 1)]
+                records.append({
+                    "session_id": session_id,
+                    "location": {"latitude": p["latitude"] + 0.00002, "longitude": p["longitude"] - 0.00001},
+                    "heading": 45,
+                    "speed_kmh": 50,
+                    "timestamp": 1_700_000_000 + d,
+                })
+            deliveries.append(records)
+
+        single_time = 0.0
+        batch_time = 0.0
+        for records in deliveries:
+            started = time.perf_counter()
+            expected = [
+                single.location_update(r["location"], r["heading"], r["speed_kmh"], session_id=r["session_id"])
+                for r in records
+            ]
+            single_time += time.perf_counter() - started
+
+            started = time.perf_counter()
+            results = batched.location_update_batch(records)
+            batch_time += time.perf_counter() - started
+
+            for want, got in zip(expected, results):
+                assert abs(want["remainingKm"] - got["remainingKm"]) < 1e-9, "batch disagrees with per-ping path"
+
+        per_single = single_time / args.deliveries
+        per_batch = batch_time / args.deliveries
+        print(
+            f"{vehicles:>9} {per_single * 1000:>12.2f} {per_batch * 1000:>9.2f} "
+            f"{per_single / per_batch:>7.1f}x {vehicles / per_batch:>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: location-update latency vs number of live navigation sessions.
+
+Run from backend/:
+    python benchmarks/bench_navigation_sessions.py [--sessions 1 100 1000 10000] [--vertices 200]
+
+Starts N driver sessions, each with its own route, then sends location updates
+to randomly chosen sessions through NavigationController (sequentially, then
+from --threads threads at once) and reports p50/p99 per update. Session lookup
+is a dict hit with no lock, so latency should not grow with N; it only depends
+on route length.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.NavigationController import NavigationController
+from utils.navigation_sessions import NavigationSessionStore
+
+
+def synthetic_route(vertices, rng):
+    lat, lng = 24.7136 + rng.uniform(-0.1, 0.1), 46.6753 + rng.uniform(-0.1, 0.1)
+    coords = []
+    for _ in range(vertices):
+        lat += rng.uniform(-0.0005, 0.001)
+        lng += rng.uniform(-0.0005, 0.001)
+        coords.append({"latitude": lat, "longitude": lng})
+    return coords
+
+
+def percentile(sorted_values, p):
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def run_updates(controller, session_ids, routes, count, rng, out):
+    for _ in range(count):
+        i = rng.randrange(len(session_ids))
+        vertex = rng.choice(routes[i % len(routes)])
+        location = {"latitude": vertex["latitude"] + 0.0001, "longitude": vertex["longitude"]}
+        start = time.perf_counter()
+        controller.location_update(location, 90, 45, session_id=session_ids[i])
+        out.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 100, 1000, 10000])
+    parser.add_argument("--vertices", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    routes = [synthetic_route(args.vertices, rng) for _ in range(64)]
+
+    print(f"{'sessions':>9} {'setup s':>8} {'p50 us':>9} {'p99 us':>9} "
+          f"{'thr p50 us':>11} {'thr p99 us':>11} {'updates/s':>10}")
+
+    for n in args.sessions:
+        controller = NavigationController(NavigationSessionStore(max_sessions=max(n, 1)))
+        session_ids = [f"driver-{i}" for i in range(n)]
+
+        started = time.perf_counter()
+        for i, session_id in enumerate(session_ids):
+            controller.init_route(routes[i % len(routes)], "30 mins", session_id=session_id)
+        setup = time.perf_counter() - started
+
+        sequential = []
+        run_updates(controller, session_ids, routes, args.updates, random.Random(1), sequential)
+        sequential.sort()
+
+        threaded = []
+        per_thread = args.updates // args.threads
+        workers = [
+            threading.Thread(
+                target=run_updates,
+                args=(controller, session_ids, routes, per_thread, random.Random(100 + t), threaded),
+            )
+            for t in range(args.threads)
+        ]
+        started = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - started
+        threaded.sort()
+
+        assert len(controller.sessions) == n
+        print(
+            f"{n:>9} {setup:>8.2f} "
+            f"{percentile(sequential, 50) * 1e6:>9.1f} {percentile(sequential, 99) * 1e6:>9.1f} "
+            f"{percentile(threaded, 50) * 1e6:>11.1f} {percentile(threaded, 99) * 1e6:>11.1f} "
+            f"{len(threaded) / elapsed:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
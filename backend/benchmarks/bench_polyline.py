@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: scalar vs NumPy polyline decoding.
+
+Run from backend/:
+    python benchmarks/bench_polyline.py [--vertices 10000 20000 50000] [--repeat 20]
+
+Decodes three alternative routes per "request", like Trip.get_routes does, and
+reports the best-of-N time for the old per-character decoder (plus the [lng, lat]
+swap) against utils.polyline.decode_polylines.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.polyline import decode_polylines, encode_polyline, LNG_LAT
+
+
+def scalar_decode_lnglat(polyline):
+    decoded_points = []
+    index = 0
+    lat = 0
+    lng = 0
+
+    while index < len(polyline):
+        values = []
+        for _ in range(2):
+            result = 0
+            shift = 0
+            while True:
+                c = ord(polyline[index]) - 63
+                index += 1
+                result |= (c & 0x1F) << shift
+                shift += 5
+                if c < 32:
+                    break
+            values.append(~(result >> 1) if (result & 1) else (result >> 1))
+        lat += values[0]
+        lng += values[1]
+        decoded_points.append((lat / 1e5, lng / 1e5))
+
+    return [[p_lng, p_lat] for (p_lat, p_lng) in decoded_points]
+
+
+def synthetic_route(vertices, seed):
+    rng = random.Random(seed)
+    lat, lng = 24.7136, 46.6753
+    points = []
+    for _ in range(vertices):
+        lat += rng.uniform(-0.002, 0.002)
+        lng += rng.uniform(-0.002, 0.002)
+        points.append((lat, lng))
+    return encode_polyline(points)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vertices", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'vertices':>10} {'scalar ms':>12} {'numpy ms':>12} {'speedup':>9}")
+
+    for vertices in args.vertices:
+        routes = [synthetic_route(vertices, seed) for seed in range(3)]
+
+        expected = [scalar_decode_lnglat(r) for r in routes]
+        points, offsets = decode_polylines(routes, order=LNG_LAT)
+        actual = points.tolist()
+        for i in range(3):
+            assert actual[offsets[i]:offsets[i + 1]] == expected[i], "decoders disagree"
+
+        scalar = min(timeit.repeat(
+            lambda: [scalar_decode_lnglat(r) for r in routes],
+            number=1, repeat=args.repeat,
+        ))
+        vectorized = min(timeit.repeat(
+            lambda: decode_polylines(routes, order=LNG_LAT)[0].tolist(),
+            number=1, repeat=args.repeat,
+        ))
+
+        print(
+            f"{vertices:>10} {scalar * 1000:>12.2f} {vectorized * 1000:>12.2f} "
+            f"{scalar / vectorized:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark: haversine route geometry vs the precomputed local projection.
+
+Run from backend/:
+    python benchmarks/bench_projection.py [--vertices 500 5000 50000] [--updates 2000]
+
+"before" is the trig-based path: a haversine loop for cumulative distances in
+init_route, and per update a haversine to each vertex in the progress window
+(as snapping did before segment projection). "after" is init_route building
+RouteSegments (one vectorized projection) and Navigation.update_location,
+which only does arithmetic on the precomputed arrays. Also prints the
+measured vs documented distance error for routes in Saudi cities.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.Navigation import Navigation, Point
+from models.route_segments import RouteSegments
+
+
+def synthetic_route(vertices, lat0=24.7136, lng0=46.6753, seed=1):
+    rng = random.Random(seed)
+    lat, lng = lat0, lng0
+    coords = []
+    for _ in range(vertices):
+        lat += rng.uniform(-0.00002, 0.00008)
+        lng += rng.uniform(-0.00002, 0.00008)
+        coords.append({"latitude": lat, "longitude": lng})
+    return coords
+
+
+def haversine_cumulative(points):
+    cumulative = [0.0]
+    for a, b in zip(points, points[1:]):
+        cumulative.append(cumulative[-1] + Navigation.haversine_meters(a, b))
+    return cumulative
+
+
+def haversine_window_update(points, cumulative, last, fix):
+    lo = max(0, last - Navigation.SNAP_WINDOW_BEHIND)
+    hi = min(len(points), last + Navigation.SNAP_WINDOW_AHEAD + 1)
+    best, best_d = lo, float("inf")
+    for i in range(lo, hi):
+        d = Navigation.haversine_meters(fix, points[i])
+        if d < best_d:
+            best, best_d = i, d
+    return best, cumulative[-1] - cumulative[best]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vertices", type=int, nargs="+", default=[500, 5000, 50000])
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'vertices':>9} {'init before ms':>15} {'init after ms':>14} "
+          f"{'update before us':>17} {'update after us':>16}")
+
+    for vertices in args.vertices:
+        route = synthetic_route(vertices)
+        points = [Point(c["latitude"], c["longitude"]) for c in route]
+        # a fix every few vertices, as for a phone reporting every 1-2 s
+        fixes = [Point(p.latitude + 0.00002, p.longitude) for p in points[::3]][:args.updates]
+
+        started = time.perf_counter()
+        cumulative = haversine_cumulative([Point(c["latitude"], c["longitude"]) for c in route])
+        init_before = time.perf_counter() - started
+
+        nav = Navigation()
+        started = time.perf_counter()
+        nav.init_route(route, "60 mins")
+        init_after = time.perf_counter() - started
+
+        last = 0
+        started = time.perf_counter()
+        for fix in fixes:
+            last, _ = haversine_window_update(points, cumulative, last, fix)
+        update_before = (time.perf_counter() - started) / len(fixes)
+
+        started = time.perf_counter()
+        for fix in fixes:
+            nav.update_location({"latitude": fix.latitude, "longitude": fix.longitude}, 0, 40)
+        update_after = (time.perf_counter() - started) / len(fixes)
+
+        print(f"{vertices:>9} {init_before * 1000:>15.2f} {init_after * 1000:>14.2f} "
+              f"{update_before * 1e6:>17.1f} {update_after * 1e6:>16.1f}")
+
+    print(f"\n{'city':>8} {'measured error':>15} {'documented bound':>17}")
+    rng = random.Random(4)
+    for city, lat0, lng0 in [("Jeddah", 21.54, 39.17), ("Riyadh", 24.71, 46.68),
+                             ("Dammam", 26.42, 50.09), ("Tabuk", 28.38, 36.57)]:
+        points = [Point(lat0 + rng.uniform(-0.25, 0.25), lng0 + rng.uniform(-0.25, 0.25)) for _ in range(500)]
+        segments = RouteSegments(points)
+        haversine = haversine_cumulative(points)[-1]
+        error = abs(segments.total_meters - haversine) / haversine
+        print(f"{city:>8} {error * 100:>14.4f}% {segments.projection.max_relative_error * 100:>16.4f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: memory held per navigation session for its route.
+
+Run from backend/:
+    python benchmarks/bench_route_memory.py [--vertices 1000 10000 50000] [--sessions 20]
+
+Initializes --sessions Navigation objects per route size and measures what
+they retain with tracemalloc, for:
+  - lists:   the previous layout - one Point dataclass per vertex plus a
+             parallel list of float cumulative distances, on top of the
+             RouteSegments arrays
+  - arrays:  Navigation.init_route as it is now - the RouteSegments arrays
+             are the only copy (Points are made only at the API boundary)
+Reports bytes per vertex, KB per session and init_route time.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.Navigation import Navigation
+from models.route_segments import RouteSegments
+
+
+@dataclass
+class ListPoint:
+    """Point as it was before: a plain dataclass with an instance __dict__."""
+    latitude: float
+    longitude: float
+
+
+class ListNavigation(Navigation):
+    """init_route keeping the per-vertex Point list and float distance list."""
+
+    def init_route(self, coords, duration_text):
+        points = [ListPoint(c["latitude"], c["longitude"]) for c in coords]
+        if not points:
+            raise ValueError("Route has no coordinates")
+        segments = RouteSegments(points)
+        result = self.init_route_arrays(segments.lat[:len(points)], segments.lng[:len(points)], duration_text)
+        self.route_points = points
+        self.route_distances = segments.cumulative[:len(points)].tolist()
+        return result
+
+
+def synthetic_route(vertices, seed):
+    rng = random.Random(seed)
+    lat, lng = 24.7136, 46.6753
+    coords = []
+    for _ in range(vertices):
+        lat += rng.uniform(0, 0.0004)
+        lng += rng.uniform(-0.0002, 0.0004)
+        coords.append({"latitude": lat, "longitude": lng})
+    return coords
+
+
+def measure(cls, route, sessions):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    navs = []
+    for _ in range(sessions):
+        nav = cls()
+        nav.init_route(route, "60 mins")
+        navs.append(nav)
+    elapsed = (time.perf_counter() - started) / sessions
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del navs
+    return retained / sessions, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vertices", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'vertices':>9} {'layout':>7} {'B/vertex':>9} {'KB/session':>11} {'init ms':>8}")
+    for vertices in args.vertices:
+        route = synthetic_route(vertices, seed=vertices)
+        for name, cls in (("lists", ListNavigation), ("arrays", Navigation)):
+            per_session, elapsed = measure(cls, route, args.sessions)
+            print(f"{vertices:>9} {name:>7} {per_session / vertices:>9.1f} "
+                  f"{per_session / 1024:>11.0f} {elapsed * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark: full-scan vs grid-indexed whole-route segment snapping.
+
+Run from backend/:
+    python benchmarks/bench_route_snapping.py [--vertices 1000 10000 50000] [--queries 500]
+
+Builds a synthetic route, then snaps --queries driver positions (within ~100 m
+of the route) onto all of its segments, once with the NumPy scan over every
+segment and once with the RouteSegmentIndex that RouteSegments.nearest builds
+for whole-route searches. Checks that both return the same (segment, t,
+metres), also for a few points far off the route, and reports mean time per
+query and the index build time.
+
+With --drive, instead replays a driver moving along the route (GPS noise of a
+few metres, one fix every few vertices) through Navigation.update_location with
+progress-aware snapping on and off, and reports time per update and how many
+updates needed a whole-route search.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.Navigation import Navigation, Point
+from models.route_index import RouteSegmentIndex
+from models.route_segments import RouteSegments
+
+
+def synthetic_route(vertices, seed):
+    rng = random.Random(seed)
+    lat, lng = 24.7136, 46.6753
+    heading_lat, heading_lng = 0.00008, 0.00006
+    points = []
+    for _ in range(vertices):
+        lat += heading_lat + rng.uniform(-0.00005, 0.00005)
+        lng += heading_lng + rng.uniform(-0.00005, 0.00005)
+        if rng.random() < 0.002:
+            heading_lat, heading_lng = -heading_lng, heading_lat
+        points.append(Point(lat, lng))
+    return points
+
+
+def drive(nav, coords, stride, seed):
+    rng = random.Random(seed)
+    fixes = [
+        {"latitude": p.latitude + rng.uniform(-0.00003, 0.00003),
+         "longitude": p.longitude + rng.uniform(-0.00003, 0.00003)}
+        for p in coords[::stride]
+    ]
+    started = time.perf_counter()
+    for fix in fixes:
+        nav.update_location(fix, 0, 50)
+    return (time.perf_counter() - started) / len(fixes)
+
+
+def main_drive(args):
+    print(f"{'vertices':>9} {'global us':>10} {'window us':>10} {'global searches':>16}")
+
+    for vertices in args.vertices:
+        coords = synthetic_route(vertices, seed=vertices)
+        route = [{"latitude": p.latitude, "longitude": p.longitude} for p in coords]
+
+        timings = {}
+        for progress in (False, True):
+            nav = Navigation(progressSnapping=progress)
+            nav.init_route(route, "60 mins")
+            timings[progress] = drive(nav, coords, args.stride, seed=3)
+
+        print(
+            f"{vertices:>9} {timings[False] * 1e6:>10.1f} {timings[True] * 1e6:>10.1f} "
+            f"{nav.globalSnaps:>7} / {nav.globalSnaps + nav.windowSnaps:<7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vertices", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--drive", action="store_true")
+    parser.add_argument("--stride", type=int, default=5, help="vertices between GPS fixes with --drive")
+    args = parser.parse_args()
+
+    if args.drive:
+        main_drive(args)
+        return
+
+    print(f"{'vertices':>9} {'build ms':>9} {'scan us':>10} {'grid us':>9} {'speedup':>9}")
+
+    for vertices in args.vertices:
+        coords = synthetic_route(vertices, seed=vertices)
+        rng = random.Random(1)
+        queries = []
+        for _ in range(args.queries):
+            base = coords[rng.randrange(vertices)]
+            queries.append(Point(base.latitude + rng.uniform(-0.001, 0.001),
+                                 base.longitude + rng.uniform(-0.001, 0.001)))
+        far_off = [Point(24.5, 46.5), Point(25.2, 47.3)]
+
+        # scanning with the grid disabled
+        segments = RouteSegments(coords)
+        segments.INDEX_MIN_SEGMENTS = segments.count + 1
+
+        started = time.perf_counter()
+        index = RouteSegmentIndex(segments)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scanned = [segments.nearest(q.latitude, q.longitude) for q in queries]
+        scan_time = (time.perf_counter() - started) / len(queries)
+
+        started = time.perf_counter()
+        indexed = [index.nearest(*segments.project(q.latitude, q.longitude)) for q in queries]
+        grid_time = (time.perf_counter() - started) / len(queries)
+
+        assert indexed == scanned, "indexed snapping disagrees with the full scan"
+        for q in far_off:
+            assert index.nearest(*segments.project(q.latitude, q.longitude)) == segments.nearest(q.latitude, q.longitude)
+
+        print(
+            f"{vertices:>9} {build * 1000:>9.1f} {scan_time * 1e6:>10.1f} "
+            f"{grid_time * 1e6:>9.1f} {scan_time / grid_time:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: per-vertex haversine snapping vs NumPy point-to-segment projection.
+
+Run from backend/:
+    python benchmarks/bench_segment_snapping.py [--vertices 1000 10000 50000] [--queries 300]
+
+Speed: time per snap for the original per-vertex haversine loop
+(Navigation.find_nearest_point_index), a whole-route
+RouteSegments.nearest, and the windowed search update_location uses while a
+driver makes progress.
+
+Accuracy: a driver moves along a sparse "highway" route (vertices ~2 km
+apart) with a few metres of GPS noise. Compares the remaining distance from
+vertex snapping and from segment projection against the true remaining
+distance.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.Navigation import Navigation, Point
+
+
+def synthetic_route(vertices, seed, step=0.0001):
+    rng = random.Random(seed)
+    lat, lng = 24.7136, 46.6753
+    points = []
+    for _ in range(vertices):
+        lat += step * 0.8 + rng.uniform(-step / 2, step / 2)
+        lng += step * 0.6 + rng.uniform(-step / 2, step / 2)
+        points.append({"latitude": lat, "longitude": lng})
+    return points
+
+
+def speed(args):
+    print(f"{'vertices':>9} {'vertex loop us':>15} {'segments us':>12} {'window us':>10}")
+
+    for vertices in args.vertices:
+        route = synthetic_route(vertices, seed=vertices)
+        nav = Navigation()
+        nav.init_route(route, "60 mins")
+        coords = nav.coords
+        segments = nav.routeSegments
+
+        rng = random.Random(1)
+        picks = sorted(rng.randrange(vertices - 1) for _ in range(args.queries))
+        queries = [Point(coords[i].latitude + 0.00003, coords[i].longitude - 0.00002) for i in picks]
+
+        started = time.perf_counter()
+        for q in queries:
+            Navigation.find_nearest_point_index(q, coords)
+        loop = (time.perf_counter() - started) / len(queries)
+
+        started = time.perf_counter()
+        for q in queries:
+            segments.nearest(q.latitude, q.longitude)
+        whole = (time.perf_counter() - started) / len(queries)
+
+        window = Navigation.SNAP_WINDOW_AHEAD + Navigation.SNAP_WINDOW_BEHIND + 1
+        started = time.perf_counter()
+        for i, q in zip(picks, queries):
+            segments.nearest(q.latitude, q.longitude, i - Navigation.SNAP_WINDOW_BEHIND, i - Navigation.SNAP_WINDOW_BEHIND + window)
+        windowed = (time.perf_counter() - started) / len(queries)
+
+        print(f"{vertices:>9} {loop * 1e6:>15.1f} {whole * 1e6:>12.1f} {windowed * 1e6:>10.1f}")
+
+
+def accuracy(args):
+    route = synthetic_route(40, seed=11, step=0.018)
+    nav = Navigation()
+    nav.init_route(route, "30 mins")
+    coords = nav.coords
+    rng = random.Random(2)
+
+    vertex_errors = []
+    segment_errors = []
+
+    for _ in range(args.queries):
+        i = rng.randrange(len(coords) - 1)
+        f = rng.random()
+        a, b = coords[i], coords[i + 1]
+        true_point = Point(a.latitude + f * (b.latitude - a.latitude), a.longitude + f * (b.longitude - a.longitude))
+        leg = nav.routeDistances[i + 1] - nav.routeDistances[i]
+        true_remaining = nav.totalRouteMeters - (nav.routeDistances[i] + f * leg)
+
+        noisy = {"latitude": true_point.latitude + rng.uniform(-0.00003, 0.00003),
+                 "longitude": true_point.longitude + rng.uniform(-0.00003, 0.00003)}
+
+        idx = Navigation.find_nearest_point_index(Point(noisy["latitude"], noisy["longitude"]), coords)
+        vertex_errors.append(abs(nav.totalRouteMeters - nav.routeDistances[idx] - true_remaining))
+
+        nav.lastSnappedIndex = None
+        result = nav.update_location(noisy, 0, 100)
+        segment_errors.append(abs(result["remainingKm"] * 1000 - true_remaining))
+
+    def summary(errors):
+        errors = sorted(errors)
+        return f"mean={sum(errors) / len(errors):8.1f} m  p95={errors[int(0.95 * (len(errors) - 1))]:8.1f} m  max={errors[-1]:8.1f} m"
+
+    spacing = nav.totalRouteMeters / (len(coords) - 1)
+    print(f"\nsparse route: {len(coords)} vertices, ~{spacing / 1000:.1f} km apart, remaining-distance error")
+    print(f"  nearest vertex     {summary(vertex_errors)}")
+    print(f"  segment projection {summary(segment_errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vertices", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    speed(args)
+    accuracy(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Load test: how many concurrently navigating drivers one backend instance can track.
+
+Run from backend/:
+    python benchmarks/load_navigation.py --drivers 100 500 1000 2000 --duration 30
+    python benchmarks/load_navigation.py --drivers 1000 --output baseline.json
+
+For each driver count it starts a fresh app under uvicorn (throwaway SQLite
+database), then every simulated driver:
+  1. POSTs /navigation/init_route with its own synthetic route;
+  2. replays a realistic ping stream for --duration seconds: one
+     /navigation/location_update every 1-2 s (uniformly random), moving along
+     its route at its own speed with a few metres of GPS jitter.
+Reports location_update latency p50/p95/p99, achieved throughput, errors, and
+the server's CPU (utime+stime from /proc/<pid>/stat over the streaming phase,
+all uvicorn processes) and RSS (/proc/<pid>/status, growth per driver).
+--output writes the rows as JSON, to diff against a baseline after changing
+models/Navigation.py. Linux only (reads /proc).
+
+Each driver holds one keep-alive HTTP/1.1 connection driven by a minimal
+asyncio client (much cheaper per request than a full HTTP library), all in a
+single client process. "client %" is printed so you can tell when the client,
+not the server, is the bottleneck; past that, run several copies with distinct
+--session-prefix values.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from benchmarks.load_process_trip import create_tables, free_port, percentile, wait_until_up
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+METERS_PER_DEG_LAT = 111195.0
+
+
+# ----------------------------- /proc sampling -----------------------------
+
+def process_tree(pid):
+    """pid and all its descendants (uvicorn --workers forks children)."""
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def cpu_seconds(pid):
+    total = 0
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                # fields after the ")" of the command name; utime, stime are 14th, 15th
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])
+        except OSError:
+            continue
+    return total / CLOCK_TICKS
+
+
+def rss_bytes(pid):
+    total = 0
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+# ----------------------------- HTTP client -----------------------------
+
+class KeepAliveConnection:
+    """One persistent HTTP/1.1 connection: JSON POST in, (status, JSON body) out."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def post(self, path, payload):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        try:
+            head = await self.reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        length = 0
+        for line in lines[1:]:
+            if line[:15].lower() == "content-length:":
+                length = int(line[15:])
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+# ----------------------------- simulated drivers -----------------------------
+
+def synthetic_route(rng, vertices):
+    lat, lng = 24.7136 + rng.uniform(-0.15, 0.15), 46.6753 + rng.uniform(-0.15, 0.15)
+    coords = []
+    for _ in range(vertices):
+        lat += rng.uniform(0, 0.0004)
+        lng += rng.uniform(-0.0002, 0.0004)
+        coords.append({"latitude": round(lat, 6), "longitude": round(lng, 6)})
+    return coords
+
+
+def route_position(route, cumulative, meters):
+    """(lat, lng) at meters along route (clamped to its end)."""
+    if meters >= cumulative[-1]:
+        return route[-1]["latitude"], route[-1]["longitude"]
+    lo, hi = 0, len(cumulative) - 1
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if cumulative[mid] <= meters:
+            lo = mid
+        else:
+            hi = mid
+    span = cumulative[hi] - cumulative[lo] or 1.0
+    t = (meters - cumulative[lo]) / span
+    a, b = route[lo], route[hi]
+    return (
+        a["latitude"] + t * (b["latitude"] - a["latitude"]),
+        a["longitude"] + t * (b["longitude"] - a["longitude"]),
+    )
+
+
+def cumulative_meters(route):
+    cumulative = [0.0]
+    for a, b in zip(route, route[1:]):
+        dy = (b["latitude"] - a["latitude"]) * METERS_PER_DEG_LAT
+        dx = (b["longitude"] - a["longitude"]) * METERS_PER_DEG_LAT * math.cos(math.radians(a["latitude"]))
+        cumulative.append(cumulative[-1] + math.hypot(dx, dy))
+    return cumulative
+
+
+async def driver(host, port, session_id, seed, args, stats, phase):
+    rng = random.Random(seed)
+    route = synthetic_route(rng, args.vertices)
+    cumulative = cumulative_meters(route)
+    speed_ms = rng.uniform(20, 70) / 3.6
+    connection = KeepAliveConnection(host, port)
+
+    try:
+        # stagger route uploads so the listen backlog is not flooded
+        async with phase["init_slots"]:
+            _, body = await connection.post("/navigation/init_route", {
+                "session_id": session_id, "coords": route, "duration_text": "30 mins",
+            })
+        if body.get("status") != "ok":
+            raise RuntimeError(body)
+        stats["initialized"] += 1
+    except Exception:
+        stats["init_errors"] += 1
+        await connection.close()
+        return
+
+    await phase["start"].wait()
+    # spread the first pings over one interval
+    await asyncio.sleep(rng.uniform(0, args.interval_max))
+
+    travelled = 0.0
+    last = time.monotonic()
+    while time.monotonic() < phase["stop_at"]:
+        now = time.monotonic()
+        travelled += speed_ms * (now - last)
+        last = now
+        lat, lng = route_position(route, cumulative, travelled)
+        jitter = rng.gauss(0, 4) / METERS_PER_DEG_LAT
+
+        started = time.perf_counter()
+        try:
+            status, body = await connection.post("/navigation/location_update", {
+                "session_id": session_id,
+                "location": {"latitude": lat + jitter, "longitude": lng + jitter},
+                "heading": 45,
+                "speed_kmh": round(speed_ms * 3.6 + rng.gauss(0, 3), 1),
+                "timestamp": time.time(),
+            })
+            stats["latencies"].append(time.perf_counter() - started)
+            if status != 200 or "remainingKm" not in body:
+                stats["errors"] += 1
+        except Exception:
+            stats["errors"] += 1
+
+        await asyncio.sleep(rng.uniform(args.interval_min, args.interval_max))
+
+    try:
+        await connection.post("/navigation/end_session", {"session_id": session_id})
+    except Exception:
+        pass
+    await connection.close()
+
+
+async def run_level(host, port, drivers, args, server_pid):
+    stats = {"latencies": [], "errors": 0, "initialized": 0, "init_errors": 0}
+    phase = {"start": asyncio.Event(), "stop_at": math.inf, "init_slots": asyncio.Semaphore(args.init_concurrency)}
+    idle_rss = rss_bytes(server_pid)
+
+    tasks = [
+        asyncio.create_task(driver(host, port, f"{args.session_prefix}{i}", i, args, stats, phase))
+        for i in range(drivers)
+    ]
+    while stats["initialized"] + stats["init_errors"] < drivers:
+        await asyncio.sleep(0.05)
+
+    client_cpu = resource.getrusage(resource.RUSAGE_SELF)
+    server_cpu = cpu_seconds(server_pid)
+    started = time.monotonic()
+    phase["stop_at"] = started + args.duration
+    phase["start"].set()
+
+    # sample RSS at the end of streaming, before sessions are ended
+    await asyncio.sleep(args.duration)
+    rss = rss_bytes(server_pid)
+    server_cpu = cpu_seconds(server_pid) - server_cpu
+    elapsed = time.monotonic() - started
+    client_usage = resource.getrusage(resource.RUSAGE_SELF)
+    client_cpu = (client_usage.ru_utime + client_usage.ru_stime) - (client_cpu.ru_utime + client_cpu.ru_stime)
+
+    await asyncio.gather(*tasks)
+
+    latencies = sorted(stats["latencies"])
+    return {
+        "drivers": drivers,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "offered_rps": round(drivers / ((args.interval_min + args.interval_max) / 2), 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "errors": stats["errors"] + stats["init_errors"],
+        "server_cpu_percent": round(100 * server_cpu / elapsed, 1),
+        "server_rss_mb": round(rss / 2**20, 1),
+        "rss_kb_per_driver": round((rss - idle_rss) / 1024 / drivers, 1),
+        "client_cpu_percent": round(100 * client_cpu / elapsed, 1),
+    }
+
+
+def start_app(args, drivers):
+    port = free_port()
+    db_dir = tempfile.mkdtemp(prefix="greenmile-nav-")
+    database_url = f"sqlite:///{os.path.join(db_dir, 'load.db')}"
+    create_tables(database_url)
+
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        JWT_SECRET=os.getenv("JWT_SECRET", "load-test-secret"),
+        NAV_MAX_SESSIONS=str(max(10000, drivers)),
+    )
+    if args.state_backend_url:
+        env["STATE_BACKEND_URL"] = args.state_backend_url
+
+    command = [sys.executable, "-m", "uvicorn", "main:app",
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+               "--backlog", str(max(2048, drivers))]
+    if args.workers > 1:
+        command += ["--workers", str(args.workers)]
+
+    app = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    wait_until_up(f"http://127.0.0.1:{port}/")
+    return app, port
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drivers", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of pinging per driver count")
+    parser.add_argument("--interval-min", type=float, default=1.0)
+    parser.add_argument("--interval-max", type=float, default=2.0)
+    parser.add_argument("--vertices", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--state-backend-url", default=None, help="e.g. sqlite:////tmp/state.db with --workers")
+    parser.add_argument("--init-concurrency", type=int, default=50, help="route uploads in flight at once")
+    parser.add_argument("--session-prefix", default="load-")
+    parser.add_argument("--output", default=None, help="write the rows as JSON")
+    args = parser.parse_args()
+
+    columns = [
+        ("drivers", 8), ("throughput_rps", 10), ("offered_rps", 9), ("p50_ms", 8), ("p95_ms", 8),
+        ("p99_ms", 8), ("errors", 7), ("server_cpu_percent", 8), ("server_rss_mb", 8),
+        ("rss_kb_per_driver", 10), ("client_cpu_percent", 8),
+    ]
+    headers = ["drivers", "req/s", "offered", "p50 ms", "p95 ms", "p99 ms", "errors",
+               "cpu %", "rss MB", "KB/driver", "client %"]
+    print(" ".join(f"{h:>{w}}" for h, (_, w) in zip(headers, columns)))
+
+    rows = []
+    for drivers in args.drivers:
+        app, port = start_app(args, drivers)
+        try:
+            row = asyncio.run(run_level("127.0.0.1", port, drivers, args, app.pid))
+        finally:
+            app.terminate()
+            app.wait()
+
+        rows.append(row)
+        print(" ".join(f"{row[key]:>{w}}" for key, w in columns), flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
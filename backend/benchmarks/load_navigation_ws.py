@@ -0,0 +1,143 @@
+"""
+Load test: thousands of simulated drivers on /navigation/ws/{session_id}.
+
+Run from backend/:
+    python benchmarks/load_navigation_ws.py --sockets 2000 --frames 20 --interval 1.0
+
+Starts the app under uvicorn (throwaway SQLite database), opens --sockets
+WebSocket connections, sends each one an init frame with its own route, then
+has every simulated driver send --frames compact location frames, one every
+--interval seconds (with random start offsets). Reports connect time, per-frame
+round-trip p50/p95/p99, frame throughput and errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from benchmarks.load_process_trip import free_port, percentile, wait_until_up
+
+
+def synthetic_route(rng, vertices):
+    lat, lng = 24.7136 + rng.uniform(-0.1, 0.1), 46.6753 + rng.uniform(-0.1, 0.1)
+    coords = []
+    for _ in range(vertices):
+        lat += rng.uniform(0, 0.0004)
+        lng += rng.uniform(-0.0002, 0.0004)
+        coords.append({"latitude": round(lat, 6), "longitude": round(lng, 6)})
+    return coords
+
+
+async def driver(url, index, args, rtts, counters, start_gate):
+    rng = random.Random(index)
+    route = synthetic_route(rng, args.vertices)
+
+    try:
+        async with websockets.connect(f"{url}/navigation/ws/load-{index}", max_queue=None) as ws:
+            await ws.send(json.dumps({"type": "init", "coords": route, "duration_text": "30 mins"}))
+            await ws.recv()
+            counters["connected"] += 1
+
+            await start_gate.wait()
+            await asyncio.sleep(rng.uniform(0, args.interval))
+
+            step = max(1, len(route) // args.frames)
+            for i in range(args.frames):
+                p = route[min(i * step, len(route) - 1)]
+                frame = f"[{p['latitude'] + 0.00002:.6f},{p['longitude']:.6f},90,45]"
+
+                start = time.perf_counter()
+                await ws.send(frame)
+                reply = json.loads(await ws.recv())
+                rtts.append(time.perf_counter() - start)
+
+                if "km" not in reply:
+                    counters["errors"] += 1
+                await asyncio.sleep(args.interval)
+
+            await ws.send('{"type":"end"}')
+            await ws.recv()
+
+    except Exception:
+        counters["errors"] += 1
+
+
+async def run(url, args):
+    rtts = []
+    counters = {"connected": 0, "errors": 0}
+    start_gate = asyncio.Event()
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(args.sockets):
+        tasks.append(asyncio.create_task(driver(url, i, args, rtts, counters, start_gate)))
+        if i % 100 == 99:
+            await asyncio.sleep(0.05)
+
+    while counters["connected"] + counters["errors"] < args.sockets:
+        await asyncio.sleep(0.05)
+    connect_time = time.perf_counter() - started
+
+    start_gate.set()
+    streaming = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - streaming
+
+    return sorted(rtts), counters, connect_time, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--vertices", type=int, default=300)
+    args = parser.parse_args()
+
+    port = free_port()
+    db_dir = tempfile.mkdtemp(prefix="greenmile-ws-")
+
+    app_env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'load.db')}",
+        JWT_SECRET=os.getenv("JWT_SECRET", "load-test-secret"),
+        NAV_MAX_SESSIONS=str(max(10000, args.sockets)),
+    )
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+         "--ws-max-size", str(4 * 1024 * 1024), "--backlog", str(max(2048, args.sockets))],
+        cwd=BACKEND_DIR,
+        env=app_env,
+        stdout=subprocess.DEVNULL,
+    )
+
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}/")
+        rtts, counters, connect_time, elapsed = asyncio.run(run(f"ws://127.0.0.1:{port}", args))
+
+        print(f"sockets={args.sockets} frames/socket={args.frames} interval={args.interval}s "
+              f"connected={counters['connected']} errors={counters['errors']}")
+        print(f"connect+init    {connect_time:8.2f}s for all sockets")
+        print(f"throughput      {len(rtts) / elapsed:8.1f} frames/s  ({elapsed:.2f}s streaming)")
+        print(f"frame RTT       p50={percentile(rtts, 50) * 1000:7.2f}ms "
+              f"p95={percentile(rtts, 95) * 1000:7.2f}ms "
+              f"p99={percentile(rtts, 99) * 1000:7.2f}ms  (n={len(rtts)})")
+
+    finally:
+        app.terminate()
+        app.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Load test: /process_trip against a local stand-in for the Google Routes API.
+
+Run from backend/:
+    python benchmarks/load_process_trip.py --requests 500 --concurrency 100 --stub-latency 0.5
+
+What it does:
+  1. starts a stub Routes server (this file with --serve-stub) that sleeps
+     --stub-latency seconds per call and returns three alternative routes;
+  2. creates a throwaway SQLite database with the app tables;
+  3. starts the real app under uvicorn with GOOGLE_ROUTES_URL pointing at the stub;
+  4. fires --requests POST /process_trip calls, --concurrency at a time, each with
+     a unique origin so the route cache never hits, while probing GET / to check
+     that slow upstream calls do not stall the rest of the server.
+
+With a blocking client every request holds a threadpool worker for the whole
+stub latency, so throughput is capped near (threadpool size / latency) and the
+probe waits in the same queue. With the async client both stay flat.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+
+# ---------------------------------------------------------------------------
+# Stub Routes server
+# ---------------------------------------------------------------------------
+
+def build_stub_app(latency, vertices):
+    from fastapi import FastAPI
+    from utils.polyline import encode_polyline
+
+    rng = random.Random(42)
+    shapes = []
+    for _ in range(3):
+        lat, lng = 24.7136, 46.6753
+        points = []
+        for _ in range(vertices):
+            lat += rng.uniform(-0.001, 0.001)
+            lng += rng.uniform(-0.001, 0.001)
+            points.append((lat, lng))
+        shapes.append(encode_polyline(points))
+
+    payload = {
+        "routes": [
+            {
+                "distanceMeters": 12000 + i * 1500,
+                "duration": f"{900 + i * 120}s",
+                "description": f"Stub route {i + 1}",
+                "polyline": {"encodedPolyline": shape},
+            }
+            for i, shape in enumerate(shapes)
+        ]
+    }
+
+    stub = FastAPI()
+
+    @stub.post("/directions/v2:computeRoutes")
+    async def compute_routes(body: dict):
+        await asyncio.sleep(latency)
+        return payload
+
+    return stub
+
+
+def serve_stub(port, latency, vertices):
+    import uvicorn
+    uvicorn.run(build_stub_app(latency, vertices), host="127.0.0.1", port=port, log_level="warning")
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def create_tables(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    script = (
+        "from db.session import engine\n"
+        "from db.base import Base\n"
+        "import models.company_db, models.manager_db, models.driver_db, models.trip_db, models.trip_trace_db\n"
+        "Base.metadata.create_all(engine)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env, check=True)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+async def run_load(base_url, total, concurrency):
+    latencies = []
+    probe_latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    limits = httpx.Limits(max_connections=concurrency + 5, max_keepalive_connections=concurrency + 5)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+
+        async def one(i):
+            nonlocal errors
+            payload = {
+                "origin": f"Depot {i}",
+                "destination": "Kingdom Centre",
+                "city": "Riyadh",
+                "vehicleType": "Car",
+                "fuelType": "Petrol",
+                "modelYear": 2020,
+            }
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/process_trip", json=payload)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200 or "error" in response.json():
+                    errors += 1
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.1)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return sorted(latencies), sorted(probe_latencies), errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-vertices", type=int, default=300)
+    parser.add_argument("--serve-stub", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        serve_stub(args.port, args.stub_latency, args.stub_vertices)
+        return
+
+    stub_port = free_port()
+    app_port = free_port()
+    db_dir = tempfile.mkdtemp(prefix="greenmile-load-")
+    database_url = f"sqlite:///{os.path.join(db_dir, 'load.db')}"
+
+    create_tables(database_url)
+
+    stub = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve-stub",
+         "--port", str(stub_port),
+         "--stub-latency", str(args.stub_latency),
+         "--stub-vertices", str(args.stub_vertices)],
+        cwd=BACKEND_DIR,
+    )
+
+    app_env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        JWT_SECRET=os.getenv("JWT_SECRET", "load-test-secret"),
+        GOOGLE_DIRECTIONS_KEY="load-test",
+        GOOGLE_ROUTES_URL=f"http://127.0.0.1:{stub_port}/directions/v2:computeRoutes",
+        GOOGLE_ROUTES_MAX_CONNECTIONS=str(args.concurrency),
+        GOOGLE_ROUTES_MAX_CONCURRENCY=str(args.concurrency),
+    )
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app",
+         "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=app_env,
+        stdout=subprocess.DEVNULL,
+    )
+
+    try:
+        wait_until_up(f"http://127.0.0.1:{stub_port}/docs")
+        wait_until_up(f"http://127.0.0.1:{app_port}/")
+
+        latencies, probes, errors, elapsed = asyncio.run(
+            run_load(f"http://127.0.0.1:{app_port}", args.requests, args.concurrency)
+        )
+
+        print(f"requests={args.requests} concurrency={args.concurrency} "
+              f"stub_latency={args.stub_latency}s errors={errors}")
+        print(f"throughput      {args.requests / elapsed:8.1f} req/s  ({elapsed:.2f}s total)")
+        print(f"/process_trip   p50={percentile(latencies, 50) * 1000:7.1f}ms "
+              f"p95={percentile(latencies, 95) * 1000:7.1f}ms "
+              f"p99={percentile(latencies, 99) * 1000:7.1f}ms")
+        print(f"GET / probe     p50={percentile(probes, 50) * 1000:7.1f}ms "
+              f"p99={percentile(probes, 99) * 1000:7.1f}ms  (n={len(probes)})")
+
+        stats = httpx.get(f"http://127.0.0.1:{app_port}/process_trip/stats").json()
+        print(f"routes client   {stats.get('routes_client')}")
+
+    finally:
+        app.terminate()
+        stub.terminate()
+        app.wait()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
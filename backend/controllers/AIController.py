@@ -1,5 +1,9 @@
+import asyncio
 import os
+import queue
 import sys
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any
 from datetime import datetime
 
@@ -7,11 +11,30 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.ai_models.recommendation_engine import GreenMileRecommendationEngine
+from models.ai_models.tree_compiler import CompiledForest
+from fastapi.concurrency import run_in_threadpool
 
 # Controller to handle AI predictions and recommendations.
 class AIController:
  
-    def __init__(self):
+    def __init__(self, prediction_cache_size=0, prediction_cache_ttl_seconds=600, prediction_quantization=None,
+                 use_compiled_models=True, executor=None, worker_statuses=None):
+        # InferenceExecutor that runs compare_and_recommend off the event
+        # loop; a process executor must be set up with init_inference_worker,
+        # passing worker_statuses (a queue) for the workers to report on
+        self.executor = executor
+        self.worker_statuses = worker_statuses
+
+        # With a process executor the workers load the models and serve every
+        # call, so this process loads none: an engine here would be one more
+        # copy of the models in memory that never runs. It keeps each worker's
+        # latest status instead (from its start and its calls), by worker pid.
+        self._workers = OrderedDict()
+        self._workers_lock = threading.Lock()
+        if self._in_workers:
+            self.engine = None
+            return
+
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         models_dir = os.path.join(base_dir, "models", "ai_models", "trained_models")
         
@@ -20,17 +43,102 @@ class AIController:
                 regression_model_path=os.path.join(models_dir, "regression_model.pkl"),
                 classification_model_path=os.path.join(models_dir, "classification_model.pkl"),
                 encoders_path=os.path.join(models_dir, "label_encoders.pkl"),
-                thresholds_path=os.path.join(models_dir, "category_thresholds.pkl")
+                thresholds_path=os.path.join(models_dir, "category_thresholds.pkl"),
+                cache_size=prediction_cache_size,
+                cache_ttl_seconds=prediction_cache_ttl_seconds,
+                cache_quantization=prediction_quantization,
+                # written by `python -m models.ai_models.tree_compiler`
+                compiled_models_dir=os.path.join(models_dir, "compiled") if use_compiled_models else None,
             )
             print("✓ AI models loaded successfully")
         except Exception as e:
             print(f"✗ Failed to load AI models: {e}")
             self.engine = None
     
+    @property
+    def _in_workers(self):
+        return self.executor is not None and self.executor.kind == "process"
+
     # Check if AI models are loaded
     def is_ready(self) -> bool:
-        
+        if self._in_workers:
+            self._drain_worker_statuses()
+            # not ready until every worker has started (see check_workers)
+            # and reported that its models loaded
+            with self._workers_lock:
+                return (
+                    len(self._workers) == self.executor.max_workers
+                    and all(worker["ready"] for worker in self._workers.values())
+                )
+
         return self.engine is not None
+
+    def reload_models(self):
+        """Reload the trained models from disk (also drops cached predictions)."""
+        if self._in_workers:
+            # the worker processes hold the engines; start fresh ones, whose
+            # statuses replace the old workers' as they report
+            self.executor.restart()
+            return
+
+        if not self.engine:
+            raise Exception("AI models not loaded")
+
+        self.engine.load_models()
+
+    def _drain_worker_statuses(self):
+        if self.worker_statuses is None:
+            return
+        while True:
+            try:
+                status = self.worker_statuses.get_nowait()
+            except queue.Empty:
+                return
+            self._record_worker(status)
+
+    def _record_worker(self, status):
+        with self._workers_lock:
+            self._workers[status["pid"]] = status
+            self._workers.move_to_end(status["pid"])
+            # replaced workers (restart, crash) come back under new pids
+            while len(self._workers) > self.executor.max_workers:
+                self._workers.popitem(last=False)
+
+    @staticmethod
+    def _worker_cache_summary(workers):
+        """The workers' prediction caches added up, as of each one's latest call."""
+        caches = [worker["prediction_cache"] for worker in workers if worker["prediction_cache"] is not None]
+
+        summary = {"workers": len(caches)}
+        for key in ("size", "hits", "misses", "evictions", "expirations", "invalidations"):
+            summary[key] = sum(cache[key] for cache in caches)
+        lookups = summary["hits"] + summary["misses"]
+        summary["hit_rate"] = round(summary["hits"] / lookups, 4) if lookups else 0.0
+        return summary
+
+    def get_stats(self) -> Dict[str, Any]:
+        if self._in_workers:
+            self._drain_worker_statuses()
+            with self._workers_lock:
+                workers = list(self._workers.values())
+            latest = workers[-1] if workers else {}
+            return {
+                "model_version": latest.get("model_version"),
+                "compiled_models": latest.get("compiled_models"),
+                "prediction_cache": self._worker_cache_summary(workers),
+                "executor": self.executor.stats(),
+            }
+
+        cache = self.engine.prediction_cache if self.engine else None
+        return {
+            "model_version": self.engine.model_version if self.engine else None,
+            "compiled_models": (
+                isinstance(self.engine.regression_model, CompiledForest)
+                and isinstance(self.engine.classification_model, CompiledForest)
+            ) if self.engine else None,
+            "prediction_cache": cache.stats() if cache is not None else None,
+            "executor": self.executor.stats() if self.executor is not None else None,
+        }
     
     def format_route_for_ai(self, 
                            route_info: Dict[str, Any],
@@ -171,4 +279,56 @@ class AIController:
         if not routes_list:
             raise ValueError("No routes provided")
         
-        return self.engine.compare_routes(routes_list)
\ No newline at end of file
+        return self.engine.compare_routes(routes_list)
+
+    async def compare_and_recommend_async(self, routes_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """compare_and_recommend on the inference executor (raises ExecutorSaturated when it is full)."""
+
+        if self.executor is None:
+            return await run_in_threadpool(self.compare_and_recommend, routes_list)
+
+        if self._in_workers:
+            result, status = await self.executor.submit(compare_in_worker, routes_list)
+            self._record_worker(status)
+            return result
+
+        return await self.executor.submit(self.compare_and_recommend, routes_list)
+
+    async def check_workers(self):
+        """Start all of a process executor's workers; each reports whether its models loaded."""
+
+        # the pool starts a worker per call while none is idle, so max_workers
+        # calls at once start them all; a worker that did not get one of them
+        # reports through worker_statuses when its initializer is done
+        statuses = await asyncio.gather(*(
+            self.executor.submit(worker_status) for _ in range(self.executor.max_workers)
+        ))
+        for status in statuses:
+            self._record_worker(status)
+
+
+# Per-process controller of an AI process executor, created by its initializer
+_worker_controller = None
+
+
+def init_inference_worker(settings, statuses=None):
+    """
+    Process executor initializer: load this worker's models (settings:
+    AIController kwargs) and put its worker_status() on the statuses queue.
+    """
+    global _worker_controller
+    _worker_controller = AIController(**settings)
+    if statuses is not None:
+        statuses.put(worker_status())
+
+
+def worker_status():
+    """This worker's pid, whether its models loaded, and its get_stats()."""
+    stats = _worker_controller.get_stats()
+    del stats["executor"]
+    return {"pid": os.getpid(), "ready": _worker_controller.is_ready(), **stats}
+
+
+def compare_in_worker(routes_list):
+    """compare_and_recommend in this worker, with its worker_status()."""
+    return _worker_controller.compare_and_recommend(routes_list), worker_status()
\ No newline at end of file
@@ -1,16 +1,365 @@
-from models.Navigation import Navigation
+import asyncio
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+
+from models.Navigation import Point
+from models.route_segments import nearest_in_windows
+from utils.navigation_sessions import NavigationSessionStore
+
+
+def require_session_id(session_id):
+    # sessions are never shared: a missing id must not fall back to a common one
+    if not session_id:
+        raise ValueError("Missing session_id (init_route returns one)")
+    return session_id
+
 
 class NavigationController:
-    def __init__(self):
-        # Model instance
-        self.nav = Navigation()
+    def __init__(self, sessions=None, rerouter=None, breadcrumbs=None, routes=None, trip_routes=None):
+        # One Navigation model instance per driver session
+        self.sessions = sessions if sessions is not None else NavigationSessionStore()
+        # Optional Rerouter for drivers who leave their route
+        self.rerouter = rerouter
+        if rerouter is not None:
+            # its per-session back-off goes with sessions that expire
+            self.sessions.on_expire = rerouter.forget
+        # Optional BreadcrumbLog that keeps every accepted ping
+        self.breadcrumbs = breadcrumbs
+        # Optional RouteGeometryCache: route geometry shared by sessions, by route hash
+        self.routes = routes
+        # Optional (trip_id, user) -> (latitudes, longitudes, duration_text) loader for
+        # saved trips; raises PermissionError when the user may not use the trip
+        self.trip_routes = trip_routes
 
     # Controller does NOT calculate anything
-    def init_route(self, coords, duration_text):
-        # Only forwards request to the model
-        return self.nav.init_route(coords, duration_text)
+    def init_route(self, coords, duration_text, session_id=None, trip_id=None, route_hash=None, user=None):
+        """
+        Start (or restart) a session's route. Without coords, the route is taken
+        from the geometry cache by route_hash (returned by an earlier init_route)
+        or loaded from the saved trip trip_id.
+
+        Without a session_id a new session is started; its id is returned as
+        "session_id" and must be sent with the session's location updates.
+
+        A trip_id (which the session's breadcrumbs are filed under) is only
+        accepted if trip_routes lets user use it; it raises PermissionError
+        otherwise.
+        """
+        session_id = session_id or uuid.uuid4().hex
+
+        trip_route = None
+        if trip_id is not None and self.trip_routes is not None:
+            trip_route = self.trip_routes(trip_id, user)
+            if trip_route is None:
+                raise ValueError(f"Trip {trip_id} has no stored route")
+
+        if coords:
+            route = None
+        elif route_hash:
+            route = self.routes.get(route_hash) if self.routes is not None else None
+            if route is None:
+                raise ValueError(f"Unknown route hash '{route_hash}'; send coords")
+        else:
+            route = trip_route
+
+        # Only forwards request to the session's model
+        nav = self.sessions.get_or_create(session_id)
+        if route is None and self.routes is None:
+            result = nav.init_route(coords, duration_text)
+        elif route is None:
+            result = nav.init_route(coords, duration_text, self.routes)
+        elif isinstance(route, tuple):
+            latitudes, longitudes, trip_duration = route
+            result = nav.init_route_arrays(latitudes, longitudes, duration_text or trip_duration, self.routes)
+        else:
+            result = nav.init_route_segments(route, duration_text or "", route_hash)
+        nav.tripId = trip_id
+        self.sessions.save(session_id, nav)
+        return {**result, "session_id": session_id}
 
     # Controller does NOT calculate anything
-    def location_update(self, location, heading, speed_kmh):
-        # Only forwards request to the model
-        return self.nav.update_location(location, heading, speed_kmh)
+    def location_update(self, location, heading, speed_kmh, session_id=None, timestamp=None):
+        session_id = require_session_id(session_id)
+        nav = self.sessions.get(session_id)
+        if nav is None:
+            raise ValueError(f"No active route for session '{session_id}'")
+
+        # Only forwards request to the session's model
+        result = nav.update_location(location, heading, speed_kmh, timestamp)
+        self.sessions.save(session_id, nav)
+        record_breadcrumb(self.breadcrumbs, session_id, nav, timestamp)
+        return result
+
+    def location_update_batch(self, records):
+        """
+        Location fixes for many sessions at once (telematics gateways).
+
+        Each record: {"session_id" (or "driver_id"), "location", "heading",
+        "speed_kmh", "timestamp"}. Fixes for the same session are applied in
+        timestamp order; a fix older than the session's last one is reported as
+        stale and skipped. Returns one result per record, in input order.
+        """
+        results = [None] * len(records)
+        queues = {}
+
+        for i, record in enumerate(records):
+            session_id = (record.get("session_id") or record.get("driver_id")) if isinstance(record, dict) else None
+            if not session_id:
+                results[i] = {"status": "error", "error": "Missing session_id"}
+                continue
+            queues.setdefault(session_id, []).append((record.get("timestamp"), i, record))
+
+        # one round per fix depth, so each session's fixes stay in order
+        rounds = []
+        for session_id, queue in queues.items():
+            queue.sort(key=lambda entry: entry[0] if entry[0] is not None else float("inf"))
+            for depth, (_, i, record) in enumerate(queue):
+                if depth == len(rounds):
+                    rounds.append([])
+                rounds[depth].append((session_id, i, record))
+
+        for round_entries in rounds:
+            self._apply_batch_round(round_entries, results)
+
+        return results
+
+    def _apply_batch_round(self, entries, results):
+        windowed = []
+
+        for session_id, i, record in entries:
+            try:
+                nav = self.sessions.get(session_id)
+                if nav is None or nav.routeSegments is None:
+                    raise ValueError(f"No active route for session '{session_id}'")
+
+                timestamp = record.get("timestamp")
+                if timestamp is not None and nav.lastFixTimestamp is not None and timestamp < nav.lastFixTimestamp:
+                    results[i] = {"session_id": session_id, "status": "stale"}
+                    continue
+
+                location = record["location"]
+                fix = (session_id, i, record, nav, Point(float(location["latitude"]), float(location["longitude"])))
+
+                window = nav.snap_window()
+                if window is None:
+                    self._finish_batch_fix(fix, None, results)
+                else:
+                    windowed.append((fix, window))
+
+            except Exception as e:
+                results[i] = {"session_id": session_id, "status": "error", "error": str(e)}
+
+        snaps = nearest_in_windows([
+            (fix[3].routeSegments, window[0], window[1], fix[4].latitude, fix[4].longitude)
+            for fix, window in windowed
+        ])
+
+        for (fix, window), (idx, t, dist) in zip(windowed, snaps):
+            nav = fix[3]
+            self._finish_batch_fix(fix, (idx, t) if nav.accept_window_snap(idx, dist, window[1]) else None, results)
+
+    def _finish_batch_fix(self, fix, snap, results):
+        session_id, i, record, nav, point = fix
+        try:
+            idx, t = snap if snap is not None else nav.snap_globally(point)
+            result = nav.apply_snap(
+                point,
+                float(record.get("heading") or 0),
+                float(record.get("speed_kmh") or 0),
+                idx,
+                t,
+                record.get("timestamp"),
+            )
+            self.sessions.save(session_id, nav)
+            record_breadcrumb(self.breadcrumbs, session_id, nav, record.get("timestamp"))
+            results[i] = {"session_id": session_id, "status": "ok", **result}
+
+        except Exception as e:
+            results[i] = {"session_id": session_id, "status": "error", "error": str(e)}
+
+    async def reroute(self, session_id=None):
+        """
+        Swap a new route from the driver's position into an off-route session.
+        Returns the new route (summary + coordinates), or None when the session
+        is on route, no rerouter is configured or no route could be fetched.
+        """
+        session_id = require_session_id(session_id)
+        # the session store may do network / disk I/O (shared backends)
+        nav = await run_in_threadpool(self.sessions.get, session_id)
+        if nav is None:
+            raise ValueError(f"No active route for session '{session_id}'")
+
+        if self.rerouter is None or not nav.offRoute or nav.driverLocation is None:
+            return None
+
+        route = await self.rerouter.reroute(session_id, nav.driverLocation, nav.destination)
+        if route is None:
+            return None
+
+        return await run_in_threadpool(self._apply_reroute, session_id, route)
+
+    def _apply_reroute(self, session_id, route):
+        # the driver may have rejoined the route while the fetch was running
+        nav = self.sessions.get(session_id)
+        if nav is None or not nav.offRoute:
+            return None
+
+        summary = nav.reroute(
+            [{"latitude": lat, "longitude": lng} for lat, lng in route["coordinates"]],
+            route["duration"],
+            self.routes,
+        )
+        self.sessions.save(session_id, nav)
+        return {**summary, "coordinates": route["coordinates"]}
+
+    async def reroute_batch(self, results):
+        """Reroute every session left off-route by a batch; attaches "reroute" to its last result."""
+        last = {}
+        for result in results:
+            if result.get("status") == "ok":
+                last[result["session_id"]] = result
+
+        off_route = [result for result in last.values() if result.get("offRoute")]
+        routes = await asyncio.gather(*(self.reroute(result["session_id"]) for result in off_route))
+
+        for result, route in zip(off_route, routes):
+            if route is not None:
+                result["reroute"] = route
+
+        return results
+
+    def end_session(self, session_id=None):
+        session_id = require_session_id(session_id)
+        if self.rerouter is not None:
+            self.rerouter.forget(session_id)
+        return self.sessions.remove(session_id)
+
+    def flush_trace(self, session_id=None):
+        """Commit the session's buffered breadcrumbs (trip end); returns how many were written."""
+        if self.breadcrumbs is None:
+            return 0
+        return self.breadcrumbs.flush_session(require_session_id(session_id))
+
+    def open_channel(self, session_id, user=None):
+        return NavigationChannel(self, require_session_id(session_id), user)
+
+    def get_stats(self):
+        return {
+            "sessions": self.sessions.stats(),
+            "reroute": self.rerouter.stats() if self.rerouter is not None else None,
+            "breadcrumbs": self.breadcrumbs.stats() if self.breadcrumbs is not None else None,
+            "route_geometry": self.routes.stats() if self.routes is not None else None,
+        }
+
+
+def record_breadcrumb(breadcrumbs, session_id, nav, timestamp=None):
+    """Queue the fix nav just accepted (buffer append only, no I/O)."""
+    if breadcrumbs is None or nav.driverLocation is None:
+        return
+    breadcrumbs.record(
+        session_id,
+        nav.driverLocation.latitude,
+        nav.driverLocation.longitude,
+        nav.currentSpeedKmh,
+        nav.heading,
+        timestamp,
+        nav.tripId,
+    )
+
+
+class NavigationChannel:
+    """
+    State for one WebSocket connection, bound to a single navigation session.
+
+    Frames in (JSON):
+      - [lat, lng, heading, speed_kmh, t]                   location (all but lat/lng optional;
+                                                            t = fix time, unix seconds)
+      - {"lat", "lng", "h", "spd", "t"}                     same, as an object
+      - {"type": "init", "coords": [...], "duration_text",  load / replace the route
+         "trip_id", "route_hash"}                           (coords optional with route_hash / trip_id)
+      - {"type": "end"}                                     end the session
+    Frames out:
+      - {"lat", "lng", "km", "eta", "spd"}                  snapped position, remaining km, ETA
+                                                            ("off": true while off-route)
+      - {"type": "route", ...} / {"type": "ended"} / {"type": "error", "error"}
+    """
+
+    def __init__(self, controller, session_id, user=None):
+        self.controller = controller
+        self.user = user
+        self.sessions = controller.sessions
+        self.session_id = session_id
+        self.breadcrumbs = controller.breadcrumbs
+        self.frames = 0
+
+    def handle_frame(self, frame):
+        self.frames += 1
+
+        if isinstance(frame, dict) and "type" in frame:
+            return self.handle_command(frame)
+
+        if isinstance(frame, (list, tuple)):
+            if len(frame) < 2:
+                raise ValueError("Location frame needs at least [lat, lng]")
+            lat, lng = frame[0], frame[1]
+            heading = frame[2] if len(frame) > 2 else 0
+            speed_kmh = frame[3] if len(frame) > 3 else 0
+            timestamp = frame[4] if len(frame) > 4 else None
+        elif isinstance(frame, dict):
+            lat, lng = frame["lat"], frame["lng"]
+            heading = frame.get("h", 0)
+            speed_kmh = frame.get("spd", 0)
+            timestamp = frame.get("t")
+        else:
+            raise ValueError("Unsupported frame")
+
+        nav = self.sessions.get(self.session_id)
+        if nav is None:
+            raise ValueError(f"No active route for session '{self.session_id}'")
+
+        result = nav.update_location(
+            {"latitude": float(lat), "longitude": float(lng)},
+            float(heading or 0),
+            float(speed_kmh or 0),
+            timestamp,
+        )
+        self.sessions.save(self.session_id, nav)
+        record_breadcrumb(self.breadcrumbs, self.session_id, nav, timestamp)
+        snapped = result["snappedLocation"]
+        reply = {
+            "lat": round(snapped["latitude"], 6),
+            "lng": round(snapped["longitude"], 6),
+            "km": round(result["remainingKm"], 3),
+            "eta": result["etaMinutes"],
+            "spd": result["speed"],
+        }
+        if result["offRoute"]:
+            reply["off"] = True
+        return reply
+
+    def handle_command(self, frame):
+        kind = frame["type"]
+
+        if kind == "init":
+            route = self.controller.init_route(
+                frame.get("coords") or [],
+                frame.get("duration_text") or "",
+                self.session_id,
+                frame.get("trip_id"),
+                frame.get("route_hash"),
+                self.user,
+            )
+            return {"type": "route", **route}
+
+        if kind == "end":
+            self.controller.end_session(self.session_id)
+            if self.breadcrumbs is not None:
+                try:
+                    self.breadcrumbs.flush_session(self.session_id)
+                except Exception as e:
+                    # pings stay buffered and are retried by the background flush
+                    return {"type": "ended", "trace_error": str(e)}
+            return {"type": "ended"}
+
+        raise ValueError(f"Unknown frame type '{kind}'")
@@ -1,12 +1,84 @@
+import asyncio
+import itertools
+from fastapi.concurrency import run_in_threadpool
 from models.Trip import Trip
 from models.trip_db import TripDB
+from utils.route_cache import RouteCache
+from utils.singleflight import SingleFlight
+
+BATCH_REQUIRED_FIELDS = ("origin", "destination", "city", "vehicleType", "fuelType", "modelYear")
+
 
 class TripController:
-    def __init__(self, api_key, ghg_data):
+    def __init__(self, api_key, ghg_data, route_cache=None, routes_client=None):
         self.api_key = api_key
         self.ghg_data = ghg_data
+        self.route_cache = route_cache
+        self.routes_client = routes_client
+        # identical in-flight trips share one Google fetch + emissions pass
+        self.singleflight = SingleFlight()
+
+    @staticmethod
+    def make_trip_key(origin, destination, city, vehicleType, fuelType, modelYear):
+        return (
+            RouteCache.normalize_place(origin),
+            RouteCache.normalize_place(destination),
+            RouteCache.normalize_place(city),
+            str(vehicleType).strip(),
+            str(fuelType).strip(),
+            str(modelYear).strip(),
+        )
+
+    async def plan_trip(self, origin, destination, city, vehicleType, fuelType, modelYear):
+        """Ranked routes + emissions for one trip, without saving anything."""
+        trip = Trip(
+            origin,
+            destination,
+            city,
+            vehicleType,
+            fuelType,
+            modelYear,
+            self.ghg_data,
+            self.api_key,
+            route_cache=self.route_cache,
+            routes_client=self.routes_client,
+        )
+
+        trip_key = self.make_trip_key(
+            origin, destination, city, vehicleType, fuelType, modelYear
+        )
+        return await self.singleflight.do(trip_key, trip.get_routes)
 
-    def process_trip(
+    async def fetch_route_between(self, origin, destination):
+        """
+        Google's primary route between two {"latitude", "longitude"} points,
+        for rerouting a driver. Same fetch path as a planned trip, no emissions.
+        """
+        trip = Trip(
+            origin,
+            destination,
+            "",
+            None,
+            None,
+            None,
+            self.ghg_data,
+            self.api_key,
+            routes_client=self.routes_client,
+        )
+
+        google_response = await trip.fetch_routes_from_google()
+        if not google_response.get("routes"):
+            raise ValueError(google_response.get("error") or "Google returned no routes")
+
+        route_entry = google_response["routes"][0]
+        duration_minutes = int(route_entry["duration"].replace("s", "")) // 60
+        return {
+            "coordinates": [list(point) for point in trip.decode_polyline(route_entry["polyline"]["encodedPolyline"])],
+            "duration": f"{duration_minutes} mins",
+            "distance_km": round(route_entry["distanceMeters"] / 1000, 2),
+        }
+
+    async def process_trip(
         self,
         origin,
         destination,
@@ -21,60 +93,267 @@ class TripController:
         driver_id=None
     ):
         try:
-            trip = Trip(
+            trip_result = await self.plan_trip(
+                origin, destination, city, vehicleType, fuelType, modelYear
+            )
+
+            if "error" in trip_result:
+                return trip_result
+
+            # persistence runs once per caller, even for coalesced requests;
+            # blocking DB I/O stays off the event loop
+            return await run_in_threadpool(
+                self.save_trip,
+                db,
+                trip_result,
                 origin,
                 destination,
                 city,
                 vehicleType,
                 fuelType,
                 modelYear,
-                self.ghg_data,
-                self.api_key,
+                saved_by_role,
+                saved_by_id,
+                company_id,
+                driver_id,
             )
 
-            trip_result = trip.get_routes()
+        except Exception as e:
+            return {"error": "Trip processing failed", "details": str(e)}
 
-            if "error" in trip_result:
-                return trip_result
+    def save_trip(
+        self,
+        db,
+        trip_result,
+        origin,
+        destination,
+        city,
+        vehicleType,
+        fuelType,
+        modelYear,
+        saved_by_role,
+        saved_by_id,
+        company_id,
+        driver_id,
+    ):
+        db_trip = self.build_trip_row(
+            trip_result,
+            origin,
+            destination,
+            city,
+            vehicleType,
+            fuelType,
+            modelYear,
+            saved_by_role,
+            saved_by_id,
+            company_id,
+            driver_id,
+        )
 
-            routes = trip_result["routes"]
-            selected_route = routes[0]
-
-            db_trip = TripDB(
-                saved_by_role=saved_by_role,
-                saved_by_id=saved_by_id,
-                company_id=company_id,
-                driver_id=driver_id,
-                origin=origin,
-                destination=destination,
-                city=city,
-                vehicle_type=vehicleType,
-                fuel_type=fuelType,
-                model_year=modelYear,
-                route_summary=selected_route["summary"],
-                distance_km=selected_route["distance_km"],
-                duration_min=selected_route["duration_min"],
-                coordinates=selected_route["coordinates"],
-                co2=selected_route["emissions"]["co2"],
-                ch4=selected_route["emissions"]["ch4"],
-                n2o=selected_route["emissions"]["n2o"],
-                co2e=selected_route["emissions"]["co2e"],
-                color=selected_route["color"],
-                routes_json=trip_result,
-                selected_route_color=selected_route["color"]
-            )
+        db.add(db_trip)
+        db.commit()
+        db.refresh(db_trip)
 
-            db.add(db_trip)
-            db.commit()
-            db.refresh(db_trip)
+        return {
+            "message": "Trip processed and saved successfully",
+            "trip_id": db_trip.id,
+            "selected_route_color": db_trip.selected_route_color,
+            "routes": trip_result["routes"]
+        }
+
+    @staticmethod
+    def build_trip_row(
+        trip_result,
+        origin,
+        destination,
+        city,
+        vehicleType,
+        fuelType,
+        modelYear,
+        saved_by_role,
+        saved_by_id,
+        company_id,
+        driver_id,
+    ):
+        routes = trip_result["routes"]
+        selected_route = routes[0]
+
+        return TripDB(
+            saved_by_role=saved_by_role,
+            saved_by_id=saved_by_id,
+            company_id=company_id,
+            driver_id=driver_id,
+            origin=origin,
+            destination=destination,
+            city=city,
+            vehicle_type=vehicleType,
+            fuel_type=fuelType,
+            model_year=modelYear,
+            route_summary=selected_route["summary"],
+            distance_km=selected_route["distance_km"],
+            duration_min=selected_route["duration_min"],
+            coordinates=selected_route["coordinates"],
+            co2=selected_route["emissions"]["co2"],
+            ch4=selected_route["emissions"]["ch4"],
+            n2o=selected_route["emissions"]["n2o"],
+            co2e=selected_route["emissions"]["co2e"],
+            color=selected_route["color"],
+            routes_json=trip_result,
+            selected_route_color=selected_route["color"]
+        )
 
-            return {
-                "message": "Trip processed and saved successfully",
-                "trip_id": db_trip.id,
-                "selected_route_color": db_trip.selected_route_color,
-                "routes": trip_result["routes"]
+    # ===================== BATCH PLANNING =====================
+
+    async def process_trips_batch(
+        self,
+        trips,
+        db,
+        concurrency=10,
+        saved_by_role="manager",
+        saved_by_id=1,
+        company_id=1,
+        driver_id=None
+    ):
+        """
+        Plan many trips with at most `concurrency` Google fetches in flight.
+
+        Async generator: yields one result per trip as soon as it finishes
+        ({"index", "status": "ok" | "error", ...}), then writes every successful
+        trip in a single bulk insert and yields a final {"status": "saved"}
+        summary mapping each index to its trip_id. A failing trip only produces
+        an error item; it never aborts the batch.
+
+        Only `concurrency` trips are started at a time; if the consumer stops
+        early (client disconnected), the ones still running are cancelled.
+        """
+        window = max(1, int(concurrency))
+
+        async def plan_one(index, trip_input):
+            try:
+                missing = [f for f in BATCH_REQUIRED_FIELDS if trip_input.get(f) in (None, "")]
+                if missing:
+                    raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+                trip_result = await self.plan_trip(
+                    *(trip_input[f] for f in BATCH_REQUIRED_FIELDS)
+                )
+                return index, trip_input, trip_result
+
+            except Exception as e:
+                return index, trip_input, {"error": "Trip processing failed", "details": str(e)}
+
+        remaining = enumerate(trips)
+        in_flight = set()
+
+        def start_more():
+            for index, trip_input in itertools.islice(remaining, window - len(in_flight)):
+                in_flight.add(asyncio.ensure_future(
+                    plan_one(index, trip_input if isinstance(trip_input, dict) else {})
+                ))
+
+        planned = []
+        failed = 0
+
+        try:
+            start_more()
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight -= done
+                start_more()
+
+                for task in done:
+                    index, trip_input, trip_result = task.result()
+
+                    if "error" in trip_result:
+                        failed += 1
+                        yield {"index": index, "status": "error", **trip_result}
+                        continue
+
+                    planned.append((index, trip_input, trip_result))
+                    yield {"index": index, "status": "ok", "routes": trip_result["routes"]}
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+        try:
+            trip_ids = await run_in_threadpool(
+                self.save_trips_bulk,
+                db,
+                planned,
+                saved_by_role,
+                saved_by_id,
+                company_id,
+                driver_id,
+            )
+            yield {
+                "status": "saved",
+                "saved": len(trip_ids),
+                "failed": failed,
+                "trip_ids": trip_ids,
             }
 
         except Exception as e:
-            return {"error": "Trip processing failed", "details": str(e)}
+            yield {"status": "error", "error": "Batch save failed", "details": str(e)}
+
+    def save_trips_bulk(self, db, planned, saved_by_role, saved_by_id, company_id, driver_id):
+        """One INSERT round-trip + one commit for every planned trip."""
+        if not planned:
+            return {}
+
+        rows = [
+            self.build_trip_row(
+                trip_result,
+                *(trip_input[f] for f in BATCH_REQUIRED_FIELDS),
+                saved_by_role,
+                saved_by_id,
+                company_id,
+                driver_id,
+            )
+            for _, trip_input, trip_result in planned
+        ]
+
+        try:
+            db.add_all(rows)
+            db.flush()
+            # read ids before commit expires the rows
+            trip_ids = {index: row.id for (index, _, _), row in zip(planned, rows)}
+            db.commit()
+            return trip_ids
+
+        except Exception:
+            db.rollback()
+            raise
+
+    @staticmethod
+    def get_trip_route(db, trip_id, user):
+        """
+        (latitudes, longitudes, duration_text) of a saved trip's selected
+        route, or None. Raises PermissionError unless user (as returned by
+        get_current_user) may drive the trip: same company and, for a driver,
+        a trip assigned to them or to no one.
+        """
+        trip = db.get(TripDB, int(trip_id))
+        if trip is None or not trip.coordinates:
+            return None
+
+        if user is None:
+            raise PermissionError("Sign in to navigate a saved trip")
+        if trip.company_id != user["company_id"] or (
+            user["role"] == "driver" and trip.driver_id not in (None, user["id"])
+        ):
+            raise PermissionError(f"Not allowed to navigate trip {trip_id}")
+
+        # stored as [lng, lat] pairs
+        longitudes = [float(point[0]) for point in trip.coordinates]
+        latitudes = [float(point[1]) for point in trip.coordinates]
+        return latitudes, longitudes, f"{trip.duration_min} mins"
+
+    def get_stats(self):
+        return {
+            "route_cache": self.route_cache.stats() if self.route_cache is not None else None,
+            "routes_client": self.routes_client.stats() if self.routes_client is not None else None,
+            "singleflight": self.singleflight.stats(),
+        }
         
\ No newline at end of file
@@ -5,6 +5,7 @@ from models.company_db import CompanyDB
 from models.manager_db import ManagerDB
 from models.driver_db import DriverDB
 from models.trip_db import TripDB
+from models.trip_trace_db import TripTracePointDB
 
 Base.metadata.create_all(bind=engine)
 print("Tables created successfully!")
\ No newline at end of file
@@ -1,24 +1,37 @@
 # main.py
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 import json
+from contextlib import aclosing
+import multiprocessing
 import os
 import random
-from datetime import datetime, timedelta
-from db.session import get_db
+import time
+from db.session import get_db, SessionLocal
 from controllers import DashboardController
 from controllers.TripController import TripController
 from controllers.NavigationController import NavigationController
-from controllers.AIController import AIController
+from controllers.AIController import AIController, init_inference_worker
 from controllers.AuthController import AuthController
 from controllers.AIAgentController import router as ai_agent_router
 from utils.email_sender import send_otp_email
 from controllers.MyTripsController import router as my_trips_router
-from utils.auth_dep import get_current_user
+from utils.auth_dep import get_current_user, get_optional_user, user_from_token
 from db.session import get_db
 from models.trip_db import TripDB
+from models.ghg_index import GHGFactorIndex
+from utils.route_cache import RouteCache
+from utils.routes_client import GoogleRoutesClient, GOOGLE_ROUTES_URL
+from utils.navigation_sessions import NavigationSessionStore, SharedNavigationSessionStore
+from utils.reroute import Rerouter
+from utils.route_geometry_cache import RouteGeometryCache
+from utils.breadcrumbs import BreadcrumbLog
+from utils.inference_executor import InferenceExecutor, ExecutorSaturated
+from utils.state_store import MemoryStateStore, StateNamespace, create_state_store
 from schemas.auth_schemas import ManagerSignUp, DriverSignUp, SignIn
 
 load_dotenv()
@@ -31,6 +44,9 @@ GHG_DATA_PATH = os.path.join(BASE_DIR, "models", "ghg_factors.json")
 with open(GHG_DATA_PATH, "r", encoding="utf-8") as file:
     GHG_DATA = json.load(file)
 
+# Compiled once; every Trip shares this index instead of scanning the raw JSON
+GHG_INDEX = GHGFactorIndex(GHG_DATA)
+
 app = FastAPI(debug=True)
 
 app.add_middleware(
@@ -41,13 +57,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Google Routes responses reused across trips with the same endpoints
+route_cache = RouteCache(
+    ttl_seconds=int(os.getenv("ROUTE_CACHE_TTL_SECONDS", "900")),
+    max_entries=int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "1024")),
+    bucket_minutes=int(os.getenv("ROUTE_CACHE_BUCKET_MINUTES", "15")),
+)
+
+# One pooled, timeout-bounded async client for every Google Routes call
+routes_client = GoogleRoutesClient(
+    url=os.getenv("GOOGLE_ROUTES_URL", GOOGLE_ROUTES_URL),
+    connect_timeout=float(os.getenv("GOOGLE_ROUTES_CONNECT_TIMEOUT", "3")),
+    read_timeout=float(os.getenv("GOOGLE_ROUTES_READ_TIMEOUT", "10")),
+    max_connections=int(os.getenv("GOOGLE_ROUTES_MAX_CONNECTIONS", "50")),
+    max_concurrency=int(os.getenv("GOOGLE_ROUTES_MAX_CONCURRENCY", "50")),
+)
+
+BATCH_MAX_TRIPS = int(os.getenv("BATCH_MAX_TRIPS", "2000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "20"))
+NAV_BATCH_MAX_RECORDS = int(os.getenv("NAV_BATCH_MAX_RECORDS", "5000"))
+
+NAV_SESSION_TTL_SECONDS = int(os.getenv("NAV_SESSION_TTL_SECONDS", "1800"))
+NAV_MAX_SESSIONS = int(os.getenv("NAV_MAX_SESSIONS", "10000"))
+# Initialized route geometry shared by sessions on the same route (LRU)
+ROUTE_GEOMETRY_CACHE_SIZE = int(os.getenv("ROUTE_GEOMETRY_CACHE_SIZE", "256"))
+SIGNUP_OTP_TTL_SECONDS = 300
+
+# State shared by API workers: memory:// (single process, default),
+# sqlite:///path/state.db (worker processes on one host) or redis://host:port/db
+state_store = create_state_store(os.getenv("STATE_BACKEND_URL", "memory://"))
+
+route_geometry = RouteGeometryCache(max_entries=ROUTE_GEOMETRY_CACHE_SIZE)
+
+# Live navigation state, one session per driver
+if isinstance(state_store, MemoryStateStore):
+    navigation_sessions = NavigationSessionStore(
+        ttl_seconds=NAV_SESSION_TTL_SECONDS,
+        max_sessions=NAV_MAX_SESSIONS,
+    )
+else:
+    navigation_sessions = SharedNavigationSessionStore(
+        state_store,
+        ttl_seconds=NAV_SESSION_TTL_SECONDS,
+        cache_size=NAV_MAX_SESSIONS,
+        routes=route_geometry,
+    )
+
 # Controllers
-trip_controller = TripController(API_KEY, GHG_DATA)
-navigation_controller = NavigationController()
-ai_controller = AIController()
+trip_controller = TripController(
+    API_KEY, GHG_INDEX, route_cache=route_cache, routes_client=routes_client
+)
+# Reroutes for off-route drivers, cached for recurring detours
+rerouter = Rerouter(
+    trip_controller.fetch_route_between,
+    cache=RouteCache(
+        ttl_seconds=int(os.getenv("REROUTE_CACHE_TTL_SECONDS", "900")),
+        max_entries=int(os.getenv("REROUTE_CACHE_MAX_ENTRIES", "1024")),
+    ),
+    retry_seconds=float(os.getenv("REROUTE_RETRY_SECONDS", "15")),
+)
+# Every accepted ping, buffered and bulk-inserted off the request path
+breadcrumbs = BreadcrumbLog(
+    SessionLocal,
+    flush_size=int(os.getenv("BREADCRUMB_FLUSH_SIZE", "1000")),
+    flush_interval=float(os.getenv("BREADCRUMB_FLUSH_SECONDS", "5")),
+    max_buffered=int(os.getenv("BREADCRUMB_MAX_BUFFERED", "200000")),
+)
+def load_trip_route(trip_id, user):
+    # blocking DB query: callers run on the threadpool (sync endpoint / channel frames)
+    db = SessionLocal()
+    try:
+        return trip_controller.get_trip_route(db, trip_id, user)
+    finally:
+        db.close()
+
+
+navigation_controller = NavigationController(
+    navigation_sessions,
+    rerouter=rerouter,
+    breadcrumbs=breadcrumbs,
+    routes=route_geometry,
+    trip_routes=load_trip_route,
+)
+# Memo of model outputs per quantized feature row (0 disables it);
+# AI_PREDICTION_QUANTIZATION is a JSON object of column -> step
+AI_SETTINGS = dict(
+    prediction_cache_size=int(os.getenv("AI_PREDICTION_CACHE_SIZE", "4096")),
+    prediction_cache_ttl_seconds=int(os.getenv("AI_PREDICTION_CACHE_TTL_SECONDS", "600")),
+    prediction_quantization=json.loads(os.getenv("AI_PREDICTION_QUANTIZATION", "null")),
+    # use models compiled by models/ai_models/tree_compiler.py when present
+    use_compiled_models=os.getenv("AI_USE_COMPILED_MODELS", "1") == "1",
+)
+# Route analysis runs on its own bounded pool (AI_EXECUTOR=thread|process),
+# so inference bursts cannot take the threads the other endpoints use
+AI_EXECUTOR = os.getenv("AI_EXECUTOR", "thread")
+# process workers report on this queue once their models are loaded
+ai_worker_statuses = multiprocessing.get_context("spawn").Queue() if AI_EXECUTOR == "process" else None
+ai_executor = InferenceExecutor(
+    kind=AI_EXECUTOR,
+    max_workers=int(os.getenv("AI_EXECUTOR_WORKERS", "2")),
+    max_queue=int(os.getenv("AI_EXECUTOR_MAX_QUEUE", "32")),
+    initializer=init_inference_worker if AI_EXECUTOR == "process" else None,
+    initargs=(AI_SETTINGS, ai_worker_statuses) if AI_EXECUTOR == "process" else (),
+)
+ai_controller = AIController(**AI_SETTINGS, executor=ai_executor, worker_statuses=ai_worker_statuses)
 auth_controller = AuthController()
-pending_manager_signups = {}
-pending_driver_signups = {}
+pending_manager_signups = StateNamespace(state_store, "signup:manager:", ttl_seconds=2 * SIGNUP_OTP_TTL_SECONDS)
+pending_driver_signups = StateNamespace(state_store, "signup:driver:", ttl_seconds=2 * SIGNUP_OTP_TTL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_ai_workers():
+    if AI_EXECUTOR == "process":
+        # load the workers' models now, not on the first analysis request
+        await ai_controller.check_workers()
+
+
+@app.on_event("shutdown")
+async def close_routes_client():
+    await routes_client.aclose()
+    breadcrumbs.close()
+    state_store.close()
+    ai_executor.shutdown(wait=False)
 
 # =========================
 # AUTH ENDPOINTS
@@ -112,7 +243,7 @@ def manager_signup_request_otp(payload: ManagerSignUp, db: Session = Depends(get
             "email": email,
             "password": payload.password,
             "otp": otp,
-            "expires_at": datetime.utcnow() + timedelta(minutes=5),
+            "expires_at": time.time() + SIGNUP_OTP_TTL_SECONDS,
         }
 
         send_otp_email(email, otp)
@@ -135,7 +266,7 @@ def manager_signup_verify_otp(payload: dict, db: Session = Depends(get_db)):
         if not pending:
             raise ValueError("No pending signup found")
 
-        if datetime.utcnow() > pending["expires_at"]:
+        if time.time() > pending["expires_at"]:
             del pending_manager_signups[email]
             raise ValueError("OTP expired. Please request a new one")
 
@@ -181,7 +312,7 @@ def driver_signup_request_otp(payload: DriverSignUp, db: Session = Depends(get_d
             "email": email,
             "password": payload.password,
             "otp": otp,
-            "expires_at": datetime.utcnow() + timedelta(minutes=5),
+            "expires_at": time.time() + SIGNUP_OTP_TTL_SECONDS,
         }
 
         send_otp_email(email, otp)
@@ -204,7 +335,7 @@ def driver_signup_verify_otp(payload: dict, db: Session = Depends(get_db)):
         if not pending:
             raise ValueError("No pending signup found")
 
-        if datetime.utcnow() > pending["expires_at"]:
+        if time.time() > pending["expires_at"]:
             del pending_driver_signups[email]
             raise ValueError("OTP expired. Please request a new one")
 
@@ -235,7 +366,7 @@ def driver_signup_verify_otp(payload: dict, db: Session = Depends(get_db)):
 # =========================
 
 @app.post("/process_trip")
-def process_trip(payload: dict, db: Session = Depends(get_db)):
+async def process_trip(payload: dict, db: Session = Depends(get_db)):
     """
     Receives trip info from TripScreen,
     calculates routes + emissions via Google Directions API + GHG model.
@@ -248,7 +379,7 @@ def process_trip(payload: dict, db: Session = Depends(get_db)):
         fuelType = payload.get("fuelType")
         modelYear = payload.get("modelYear")
 
-        return trip_controller.process_trip(
+        return await trip_controller.process_trip(
     origin=origin,
     destination=destination,
     city=city,
@@ -266,6 +397,60 @@ def process_trip(payload: dict, db: Session = Depends(get_db)):
             "error": "Server error inside /process_trip",
             "details": str(e),
         }
+
+
+@app.get("/process_trip/stats")
+def process_trip_stats():
+    """Route cache, Google client and request coalescing counters for /process_trip."""
+    return trip_controller.get_stats()
+
+
+@app.post("/process_trips/batch")
+async def process_trips_batch(payload: dict):
+    """
+    Plans a list of trips in one request.
+    Streams one NDJSON line per trip as it finishes, then a final
+    {"status": "saved"} line once every successful trip is bulk-inserted.
+    """
+    trips = payload.get("trips")
+
+    if not isinstance(trips, list) or not trips:
+        raise HTTPException(status_code=400, detail="trips must be a non-empty list")
+
+    if len(trips) > BATCH_MAX_TRIPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_TRIPS} trips per batch"
+        )
+
+    try:
+        concurrency = int(payload.get("concurrency") or BATCH_MAX_CONCURRENCY)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="concurrency must be an integer")
+
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+
+    async def stream():
+        # the response outlives this handler (and a request-scoped session),
+        # so the stream opens and closes its own
+        db = SessionLocal()
+        try:
+            # aclosing: a disconnect cancels the trips still being planned
+            async with aclosing(trip_controller.process_trips_batch(
+                trips,
+                db,
+                concurrency=concurrency,
+                saved_by_role="manager",
+                saved_by_id=1,
+                company_id=1,
+                driver_id=None
+            )) as items:
+                async for item in items:
+                    yield json.dumps(item) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
     
 
 # =========================
@@ -273,15 +458,23 @@ def process_trip(payload: dict, db: Session = Depends(get_db)):
 # =========================
 
 @app.post("/navigation/init_route")
-def init_route(payload: dict):
+def init_route(payload: dict, user=Depends(get_optional_user)):
     try:
         coords = payload.get("coords")
         duration_text = payload.get("duration_text")
-        route_data = navigation_controller.init_route(coords, duration_text)
+        session_id = payload.get("session_id") or payload.get("driver_id")
+        # a trip_id needs the bearer token of someone allowed to drive that trip
+        trip_id = payload.get("trip_id")
+        # coords may be left out for a route the server already has:
+        # "route_hash" from an earlier init_route, or a saved "trip_id"
+        route_hash = payload.get("route_hash")
+        route_data = navigation_controller.init_route(coords, duration_text, session_id, trip_id, route_hash, user)
         return {
             "status": "ok",
             "route": route_data
         }
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         return {
             "status": "error",
@@ -291,21 +484,130 @@ def init_route(payload: dict):
 
 
 @app.post("/navigation/location_update")
-def location_update(payload: dict):
+async def location_update(payload: dict):
     """
     Called every 1–2s from NavigationScreen when driver location updates.
+    When the driver is off-route, the response carries the new route as "reroute".
     """
     try:
         location = payload.get("location")
         heading = payload.get("heading")
         speed_kmh = payload.get("speed_kmh")
-        return navigation_controller.location_update(location, heading, speed_kmh)
+        session_id = payload.get("session_id") or payload.get("driver_id")
+        timestamp = payload.get("timestamp")
+        # snapping and the session store's I/O are blocking; only the reroute is awaited here
+        result = await run_in_threadpool(
+            navigation_controller.location_update, location, heading, speed_kmh, session_id, timestamp
+        )
+
+        if result.get("offRoute"):
+            route = await navigation_controller.reroute(session_id)
+            if route is not None:
+                result["reroute"] = route
+
+        return result
     except Exception as e:
         return {
             "error": "Server error inside /navigation/location_update",
             "details": str(e),
         }
 
+
+@app.post("/navigation/location_update/batch")
+async def location_update_batch(payload: dict):
+    """
+    Location pings for many vehicles at once, e.g. from a telematics gateway.
+    Returns one result per record, in the same order.
+    """
+    records = payload.get("records")
+
+    if not isinstance(records, list) or not records:
+        raise HTTPException(status_code=400, detail="records must be a non-empty list")
+
+    if len(records) > NAV_BATCH_MAX_RECORDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {NAV_BATCH_MAX_RECORDS} records per batch"
+        )
+
+    try:
+        # large batches are CPU work; keep them off the event loop
+        results = await run_in_threadpool(navigation_controller.location_update_batch, records)
+        await navigation_controller.reroute_batch(results)
+        return {"status": "ok", "results": results}
+    except Exception as e:
+        return {
+            "error": "Server error inside /navigation/location_update/batch",
+            "details": str(e),
+        }
+
+
+@app.post("/navigation/end_session")
+def end_navigation_session(payload: dict):
+    """
+    Called when the driver finishes or cancels navigation.
+    """
+    session_id = payload.get("session_id") or payload.get("driver_id")
+    if not session_id:
+        raise HTTPException(status_code=400, detail="session_id is required")
+    ended = navigation_controller.end_session(session_id)
+
+    # the trip's breadcrumbs are committed before we answer
+    try:
+        trace_points = navigation_controller.flush_trace(session_id)
+    except Exception as e:
+        return {"status": "ok", "ended": ended, "trace_error": str(e)}
+
+    return {"status": "ok", "ended": ended, "trace_points": trace_points}
+
+
+@app.websocket("/navigation/ws/{session_id}")
+async def navigation_socket(websocket: WebSocket, session_id: str):
+    """
+    Live navigation over one socket per driver session.
+    See NavigationChannel for the frame format. Browsers cannot set headers
+    on a WebSocket, so the bearer token (needed for init frames with a
+    trip_id) comes as ?token=.
+    """
+    token = websocket.query_params.get("token")
+    try:
+        user = user_from_token(token) if token else None
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    channel = navigation_controller.open_channel(session_id, user)
+
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                # session store / DB I/O and route work stay off the event loop
+                reply = await run_in_threadpool(channel.handle_frame, json.loads(message))
+            except Exception as e:
+                reply = {"type": "error", "error": str(e)}
+
+            await websocket.send_text(json.dumps(reply, separators=(",", ":")))
+
+            if reply.get("off"):
+                route = await navigation_controller.reroute(session_id)
+                if route is not None:
+                    await websocket.send_text(json.dumps({"type": "route", **route}, separators=(",", ":")))
+
+            if reply.get("type") == "ended":
+                await websocket.close()
+                return
+
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/navigation/stats")
+def navigation_stats():
+    """Active navigation sessions and eviction counters."""
+    return navigation_controller.get_stats()
+
 # =========================
 # AI ENDPOINTS
 # =========================
@@ -316,12 +618,13 @@ def ai_health_check():
     return {
         "status": "healthy" if ai_controller.is_ready() else "unhealthy",
         "models_loaded": ai_controller.is_ready(),
-        "message": "AI models ready" if ai_controller.is_ready() else "AI models not loaded"
+        "message": "AI models ready" if ai_controller.is_ready() else "AI models not loaded",
+        **ai_controller.get_stats(),
     }
 
 
 @app.post("/ai/analyze_routes")
-def analyze_routes(payload: dict):
+async def analyze_routes(payload: dict):
     """
     Analyze routes with AI and get recommendations.
     Expected payload:
@@ -361,7 +664,14 @@ def analyze_routes(payload: dict):
                 detail="Could not format any routes for AI analysis. Errors: " + "; ".join(errors)
             )
 
-        analysis = ai_controller.compare_and_recommend(formatted_routes)
+        try:
+            analysis = await ai_controller.compare_and_recommend_async(formatted_routes)
+        except ExecutorSaturated:
+            raise HTTPException(
+                status_code=503,
+                detail="AI analysis is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
 
         return {
             "status": "success",
@@ -446,8 +756,14 @@ def root():
             "auth_driver_signup": "/auth/driver/signup",
             "auth_signin": "/auth/signin",
             "trip": "/process_trip",
+            "trip_stats": "/process_trip/stats",
+            "trip_batch": "/process_trips/batch",
             "navigation_init": "/navigation/init_route",
             "navigation_update": "/navigation/location_update",
+            "navigation_update_batch": "/navigation/location_update/batch",
+            "navigation_end": "/navigation/end_session",
+            "navigation_ws": "/navigation/ws/{session_id}",
+            "navigation_stats": "/navigation/stats",
             "ai_health": "/ai/health",
             "ai_analyze": "/ai/analyze_routes"
         }
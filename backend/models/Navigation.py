@@ -1,22 +1,76 @@
+from collections.abc import Sequence
 from dataclasses import dataclass, field
 from typing import List, Optional
 import math
+import time
 
+import numpy as np
 
-@dataclass
+from models.route_segments import RouteSegments, route_hash
+
+
+@dataclass(slots=True)
 class Point:
+    """A lat/lng pair at the API boundary (fixes, snapped location); routes are stored as arrays."""
     latitude: float
     longitude: float
 
 
+class RouteVertices(Sequence):
+    """Read-only sequence view of a route's vertices; Points are made on access."""
+
+    __slots__ = ("segments",)
+
+    def __init__(self, segments: RouteSegments):
+        self.segments = segments
+
+    def __len__(self):
+        return self.segments.vertex_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("route vertex index out of range")
+        return Point(*self.segments.vertex(index))
+
+
 @dataclass
 class Navigation:
-    # Route info
-    coords: List[Point] = field(default_factory=list)
+    # Progress-aware snapping: search this many segments around the last
+    # snapped one before falling back to the whole route
+    SNAP_WINDOW_AHEAD = 20
+    SNAP_WINDOW_BEHIND = 2
+    SNAP_WINDOW_MAX_METERS = 50.0
+
+    # Off-route detection with hysteresis: off after OFF_ROUTE_PINGS consecutive
+    # fixes further than OFF_ROUTE_METERS from the route, back on once a fix is
+    # within ON_ROUTE_METERS (fixes in between keep the current state)
+    OFF_ROUTE_METERS = 60.0
+    ON_ROUTE_METERS = 30.0
+    OFF_ROUTE_PINGS = 3
+
+    # Smoothed speed for ETA: exponentially weighted average of the speed made
+    # good along the route, with a time constant (so irregular ping intervals
+    # weigh correctly), seeded with the route's base average speed and blended
+    # with it. Three floats per session, no history.
+    SPEED_TIME_CONSTANT_SECONDS = 300.0
+    SPEED_MIN_SAMPLE_SECONDS = 0.5
+    SPEED_MAX_KMH = 200.0
+    SPEED_MODEL_WEIGHT = 0.75
+
+    # Route info (geometry and cumulative distances live in routeSegments' arrays;
+    # see the coords / routeDistances views)
     destination: Optional[Point] = None
-    routeDistances: List[float] = field(default_factory=list)
     totalRouteMeters: float = 0.0
     totalRouteKm: float = 0.0
+    routeSegments: Optional[RouteSegments] = field(default=None, repr=False)
+    routeHash: Optional[str] = None
+    # bumped by every init_route (the geometry itself may be a shared cached copy)
+    routeGeneration: int = 0
+    tripId: Optional[int] = None
 
     # Base speed / duration
     baseDurationMinutes: int = 0
@@ -30,6 +84,24 @@ class Navigation:
     remainingKm: float = 0.0
     etaMinutes: int = 0
 
+    # Snapping progress
+    progressSnapping: bool = True
+    lastSnappedIndex: Optional[int] = None
+    windowSnaps: int = 0
+    globalSnaps: int = 0
+    lastFixTimestamp: Optional[float] = None
+
+    # Off-route state
+    lastSnapMeters: float = 0.0
+    offRoute: bool = False
+    offRoutePings: int = 0
+    reroutes: int = 0
+
+    # Speed model (see SPEED_* above)
+    smoothedSpeedKmh: Optional[float] = None
+    lastProgressMeters: Optional[float] = None
+    lastProgressTime: Optional[float] = None
+
     # ===================== HELPERS (MATH ONLY) =====================
 
     @staticmethod
@@ -76,6 +148,11 @@ class Navigation:
             return 40.0  # fallback speed
         return total_km / (base_minutes / 60)
 
+    @staticmethod
+    def ewma_alpha(dt_seconds: float) -> float:
+        """Weight of a new speed sample taken dt_seconds after the previous one."""
+        return 1.0 - math.exp(-dt_seconds / Navigation.SPEED_TIME_CONSTANT_SECONDS)
+
     @staticmethod
     def compute_eta(remaining_km: float, current_speed: float, base_speed: float) -> int:
         """ETA in minutes."""
@@ -84,32 +161,59 @@ class Navigation:
             return 0
         return round((remaining_km / speed) * 60)
 
+    # ===================== ROUTE VIEWS =====================
+
+    @property
+    def coords(self) -> Sequence:
+        """Route vertices as Points (built on access; empty before init_route)."""
+        return () if self.routeSegments is None else RouteVertices(self.routeSegments)
+
+    @property
+    def routeDistances(self) -> np.ndarray:
+        """Cumulative metres at each route vertex (a view on the route's arrays)."""
+        if self.routeSegments is None:
+            return np.zeros(0)
+        return self.routeSegments.vertex_distances
+
     # ===================== ROUTE INITIALIZATION =====================
 
-    def init_route(self, coords: List[dict], duration_text: str):
-        """Store route points + compute static route data."""
-        # Convert dict → Point
-        self.coords = [Point(c["latitude"], c["longitude"]) for c in coords]
+    def init_route(self, coords: List[dict], duration_text: str, routes=None):
+        """Store route points + compute static route data.
+        routes: optional RouteGeometryCache shared by sessions."""
+        count = len(coords)
+        latitudes = np.fromiter((c["latitude"] for c in coords), dtype=np.float64, count=count)
+        longitudes = np.fromiter((c["longitude"] for c in coords), dtype=np.float64, count=count)
+        return self.init_route_arrays(latitudes, longitudes, duration_text, routes)
 
-        if not self.coords:
+    def init_route_arrays(self, latitudes, longitudes, duration_text: str, routes=None):
+        """init_route from parallel latitude / longitude arrays."""
+        if len(latitudes) == 0:
             raise ValueError("Route has no coordinates")
 
-        self.destination = self.coords[-1]
+        if routes is not None:
+            key, segments = routes.get_or_build(latitudes, longitudes)
+        else:
+            # Project once; cumulative distances come from the projected segments
+            key, segments = route_hash(latitudes, longitudes), RouteSegments.from_arrays(latitudes, longitudes)
 
-        # Compute cumulative route distances
-        self.routeDistances = []
-        total = 0.0
+        return self.init_route_segments(segments, duration_text, key)
 
-        for i, p in enumerate(self.coords):
-            if i == 0:
-                self.routeDistances.append(0.0)
-            else:
-                d = Navigation.haversine_meters(self.coords[i-1], p)
-                total += d
-                self.routeDistances.append(total)
+    def init_route_segments(self, segments: RouteSegments, duration_text: str, key: Optional[str] = None):
+        """init_route on already-built (possibly shared, read-only) route geometry."""
+        self.routeSegments = segments
+        self.routeHash = key
+        self.routeGeneration += 1
 
-        self.totalRouteMeters = total
-        self.totalRouteKm = total / 1000
+        self.destination = Point(*self.routeSegments.vertex(self.routeSegments.vertex_count - 1))
+        self.lastSnappedIndex = None
+        self.offRoute = False
+        self.offRoutePings = 0
+        self.smoothedSpeedKmh = None
+        self.lastProgressMeters = None
+        self.lastProgressTime = None
+
+        self.totalRouteMeters = self.routeSegments.total_meters
+        self.totalRouteKm = self.totalRouteMeters / 1000
 
         # base duration + speed
         self.baseDurationMinutes = Navigation.get_base_duration_minutes(duration_text)
@@ -121,35 +225,155 @@ class Navigation:
         return {
             "total_km": self.totalRouteKm,
             "base_duration": self.baseDurationMinutes,
-            "base_avg_speed": self.baseAvgSpeedKmh
+            "base_avg_speed": self.baseAvgSpeedKmh,
+            "route_hash": self.routeHash,
         }
 
+    # ===================== SHARED STATE =====================
+
+    # live fields copied between workers on every update
+    LIVE_FIELDS = (
+        "heading", "currentSpeedKmh", "remainingKm", "etaMinutes",
+        "progressSnapping", "lastSnappedIndex", "windowSnaps", "globalSnaps",
+        "lastFixTimestamp", "lastSnapMeters", "offRoute", "offRoutePings", "reroutes",
+        "smoothedSpeedKmh", "lastProgressMeters", "lastProgressTime",
+    )
+
+    def route_state(self) -> dict:
+        """JSON-safe route definition, without the vertices: from_state rebuilds
+        the same route from it plus route_coords_list() (or the routeHash's
+        cached geometry)."""
+        return {
+            "routeHash": self.routeHash,
+            "baseDurationMinutes": self.baseDurationMinutes,
+            "tripId": self.tripId,
+        }
+
+    def route_coords_list(self) -> List[List[float]]:
+        if self.routeSegments is None:
+            return []
+        n = self.routeSegments.vertex_count
+        return np.column_stack((self.routeSegments.lat[:n], self.routeSegments.lng[:n])).tolist()
+
+    def live_state(self) -> dict:
+        """JSON-safe live navigation state (small; written after every fix)."""
+        state = {name: getattr(self, name) for name in Navigation.LIVE_FIELDS}
+        for name in ("driverLocation", "snappedLocation"):
+            point = getattr(self, name)
+            state[name] = None if point is None else [point.latitude, point.longitude]
+        return state
+
+    def apply_live_state(self, state: dict):
+        for name in Navigation.LIVE_FIELDS:
+            if name in state:
+                setattr(self, name, state[name])
+        for name in ("driverLocation", "snappedLocation"):
+            point = state.get(name)
+            setattr(self, name, None if point is None else Point(point[0], point[1]))
+
+    @classmethod
+    def from_state(cls, route: Optional[dict], live: Optional[dict] = None, routes=None,
+                   segments: Optional[RouteSegments] = None) -> "Navigation":
+        """route: route_state(), with "coords" unless segments (or routes) already hold them."""
+        nav = cls()
+        if route and (segments is not None or route.get("coords")):
+            duration_text = f"{route.get('baseDurationMinutes', 0)} mins"
+            if segments is None and routes is not None and route.get("routeHash"):
+                segments = routes.get(route["routeHash"])
+            if segments is not None:
+                nav.init_route_segments(segments, duration_text, route.get("routeHash"))
+            else:
+                coords = np.asarray(route["coords"], dtype=np.float64)
+                nav.init_route_arrays(coords[:, 0], coords[:, 1], duration_text, routes)
+            nav.tripId = route.get("tripId")
+        if live:
+            nav.apply_live_state(live)
+        return nav
+
     # ===================== LIVE LOCATION UPDATES =====================
 
-    def update_location(self, location: dict, heading: float, speed_kmh: float):
+    def snap_window(self):
+        """(start, stop) segment range to search first, or None for a whole-route search."""
+        if not self.progressSnapping or self.lastSnappedIndex is None or self.routeSegments is None:
+            return None
+
+        last = self.lastSnappedIndex
+        return (
+            max(0, last - Navigation.SNAP_WINDOW_BEHIND),
+            min(self.routeSegments.count, last + Navigation.SNAP_WINDOW_AHEAD + 1),
+        )
+
+    def accept_window_snap(self, idx: int, dist: float, stop: int) -> bool:
+        """Keep a windowed result unless it is too far off or on the window's leading edge."""
+        # a hit on the leading edge means the driver may be further on
+        at_edge = idx == stop - 1 and stop < self.routeSegments.count
+        if dist > Navigation.SNAP_WINDOW_MAX_METERS or at_edge:
+            return False
+
+        self.windowSnaps += 1
+        self.lastSnappedIndex = idx
+        self.lastSnapMeters = dist
+        return True
+
+    def snap_globally(self, point: Point):
+        idx, t, dist = self.routeSegments.nearest(point.latitude, point.longitude)
+        self.globalSnaps += 1
+        self.lastSnapMeters = dist
+        self.lastSnappedIndex = idx
+        return idx, t
+
+    def snap_to_route(self, point: Point):
+        """(segment index, t along it) of the closest point on the route,
+        searching forward from the last snap first."""
+        if self.routeSegments is None:
+            raise ValueError("Route not initialized")
+
+        window = self.snap_window()
+        if window is not None:
+            idx, t, dist = self.routeSegments.nearest(point.latitude, point.longitude, *window)
+            if self.accept_window_snap(idx, dist, window[1]):
+                return idx, t
+
+        return self.snap_globally(point)
+
+    def update_location(self, location: dict, heading: float, speed_kmh: float, timestamp: Optional[float] = None):
         """Compute snapped location, ETA, remaining distance."""
-        self.driverLocation = Point(location["latitude"], location["longitude"])
-        self.heading = heading
-        self.currentSpeedKmh = speed_kmh
+        point = Point(location["latitude"], location["longitude"])
 
-        # nearest vertex index
-        idx = Navigation.find_nearest_point_index(self.driverLocation, self.coords)
-        self.snappedLocation = self.coords[idx]
+        # projection onto the nearest route segment
+        idx, t = self.snap_to_route(point)
+        return self.apply_snap(point, heading, speed_kmh, idx, t, timestamp)
 
+    def apply_snap(self, point: Point, heading: float, speed_kmh: float, idx: int, t: float,
+                   timestamp: Optional[float] = None):
+        """Record a fix snapped to (segment idx, t) and recompute remaining distance + ETA.
+        timestamp is the fix time in unix seconds (now if not given)."""
+        self.driverLocation = point
+        self.heading = heading
+        self.currentSpeedKmh = speed_kmh
+        self.snappedLocation = Point(*self.routeSegments.point_at(idx, t))
         # remaining distance
-        remaining_meters = max(
-            0,
-            self.totalRouteMeters - self.routeDistances[idx]
-        )
+        along_meters = self.routeSegments.distance_along(idx, t)
+        remaining_meters = max(0, self.totalRouteMeters - along_meters)
         self.remainingKm = remaining_meters / 1000
 
+        self.update_speed_model(
+            along_meters,
+            time.time() if timestamp is None else timestamp,
+            on_route=self.lastSnapMeters <= Navigation.OFF_ROUTE_METERS,
+        )
+
         # ETA
         self.etaMinutes = Navigation.compute_eta(
             self.remainingKm,
-            self.currentSpeedKmh,
+            self.estimated_speed_kmh(),
             self.baseAvgSpeedKmh
         )
 
+        self.track_off_route(self.lastSnapMeters)
+        if timestamp is not None:
+            self.lastFixTimestamp = timestamp
+
         return {
             "snappedLocation": {
                 "latitude": self.snappedLocation.latitude,
@@ -158,4 +382,63 @@ class Navigation:
             "remainingKm": self.remainingKm,
             "etaMinutes": self.etaMinutes,
             "speed": self.currentSpeedKmh,
+            "smoothedSpeedKmh": round(self.smoothedSpeedKmh, 1),
+            "offRoute": self.offRoute,
+            "offRouteMeters": round(self.lastSnapMeters, 1),
         }
+
+    def update_speed_model(self, along_meters: float, now: float, on_route: bool = True):
+        """Fold the progress since the previous sample into the smoothed speed (O(1))."""
+        if self.smoothedSpeedKmh is None:
+            self.smoothedSpeedKmh = self.baseAvgSpeedKmh
+
+        # off the route, progress along it means nothing: restart from the next fix
+        if not on_route:
+            self.lastProgressMeters = None
+            self.lastProgressTime = None
+            return
+
+        if self.lastProgressTime is None or now < self.lastProgressTime:
+            self.lastProgressMeters = along_meters
+            self.lastProgressTime = now
+            return
+
+        dt = now - self.lastProgressTime
+        # pings closer together than this are folded into the next sample
+        if dt < Navigation.SPEED_MIN_SAMPLE_SECONDS:
+            return
+
+        sample_kmh = max(0.0, along_meters - self.lastProgressMeters) / dt * 3.6
+        sample_kmh = min(sample_kmh, Navigation.SPEED_MAX_KMH)
+        self.smoothedSpeedKmh += Navigation.ewma_alpha(dt) * (sample_kmh - self.smoothedSpeedKmh)
+
+        self.lastProgressMeters = along_meters
+        self.lastProgressTime = now
+
+    def estimated_speed_kmh(self) -> float:
+        """Speed used for the ETA: the smoothed speed blended with the route's base average."""
+        if self.smoothedSpeedKmh is None:
+            return self.baseAvgSpeedKmh
+        weight = Navigation.SPEED_MODEL_WEIGHT
+        return weight * self.smoothedSpeedKmh + (1 - weight) * self.baseAvgSpeedKmh
+
+    def track_off_route(self, meters: float) -> bool:
+        """Update the off-route state with one fix's distance from the route."""
+        if meters > Navigation.OFF_ROUTE_METERS:
+            self.offRoutePings += 1
+            if self.offRoutePings >= Navigation.OFF_ROUTE_PINGS:
+                self.offRoute = True
+        elif meters <= Navigation.ON_ROUTE_METERS:
+            self.offRoutePings = 0
+            self.offRoute = False
+
+        return self.offRoute
+
+    def reroute(self, coords: List[dict], duration_text: str, routes=None):
+        """Swap in a new route starting at the driver; progress restarts on it,
+        the driver's smoothed speed carries over."""
+        smoothed = self.smoothedSpeedKmh
+        result = self.init_route(coords, duration_text, routes)
+        self.smoothedSpeedKmh = smoothed
+        self.reroutes += 1
+        return result
@@ -1,15 +1,23 @@
-import requests 
+import httpx
+from models.ghg_index import GHGFactorIndex
+from utils.routes_client import get_default_routes_client
+from utils.polyline import decode_polyline, decode_polylines, LNG_LAT
 
 class Trip:
-    def __init__(self, origin, destination, city, vehicleType, fuelType, modelYear, ghg_data, api_key):
+    def __init__(self, origin, destination, city, vehicleType, fuelType, modelYear, ghg_data, api_key, route_cache=None, routes_client=None):
         self.origin = origin
         self.destination = destination
         self.city = city
         self.vehicleType = vehicleType
         self.fuelType = fuelType
         self.modelYear = modelYear
-        self.ghg = ghg_data
+        # Shared, precompiled factor index (raw JSON is compiled on the fly)
+        self.ghg = GHGFactorIndex.ensure(ghg_data)
         self.api_key = api_key
+        # Optional RouteCache shared across trips (raw Google payloads)
+        self.route_cache = route_cache
+        # Pooled async HTTP client shared by all trips
+        self.routes_client = routes_client or get_default_routes_client()
 
 
     def map_vehicle_category(self, vehicle):
@@ -26,7 +34,7 @@ class Trip:
    
     def get_fuel_consumption_rate(self, category):
         try:
-            return float(self.ghg["fuel_consumption"][category])
+            return float(self.ghg.get_fuel_consumption(category))
         except Exception:
             raise ValueError(f"Fuel consumption rate missing for category '{category}'")
     
@@ -39,45 +47,14 @@ class Trip:
             if year is None:
                 raise ValueError("Model year is missing")
 
-            category_norm = str(category).strip().lower()
-            fuel_norm = str(fuel).strip().lower()
-            year_norm = str(year).strip()
-
-            for factor_row in self.ghg["factors"]:
-                row_vehicle = str(factor_row.get("vehicle_type", "")).strip().lower()
-                row_fuel = str(factor_row.get("fuel_type", "")).strip().lower()
-                row_year = str(factor_row.get("model_year_range", "")).strip()
-
-                if (
-                    row_vehicle == category_norm
-                    and row_fuel == fuel_norm
-                    and row_year == year_norm
-                ):
-                    return factor_row
-
-            return None
+            return self.ghg.lookup_exact(category, fuel, year)
 
         except Exception as e:
             raise ValueError(f"Error in get_emissions_factors: {str(e)}")
 
     def get_closest_emissions_factors(self, category, fuel, year):
         try:
-            category_norm = str(category).strip().lower()
-            fuel_norm = str(fuel).strip().lower()
-
-            matching = [
-                row for row in self.ghg["factors"]
-                if str(row.get("vehicle_type", "")).strip().lower() == category_norm
-                and str(row.get("fuel_type", "")).strip().lower() == fuel_norm
-            ]
-
-            if not matching:
-                return None
-
-            return min(
-                matching,
-                key=lambda row: abs(int(row.get("model_year_range", 0)) - int(year))
-            )
+            return self.ghg.lookup_closest(category, fuel, year)
 
         except Exception as e:
             raise ValueError(f"Error selecting closest emission factor: {str(e)}")
@@ -85,55 +62,29 @@ class Trip:
     
     def decode_polyline(self, polyline):
         try:
-            decoded_points = []
-            polyline_index = 0
-            accumulated_latitude = 0
-            accumulated_longitude = 0
-
-            while polyline_index < len(polyline):
-                result = 0
-                shift_amount = 0
-
-                while True:
-                    current_character = ord(polyline[polyline_index]) - 63
-                    polyline_index += 1
-                    result |= (current_character & 0x1F) << shift_amount
-                    shift_amount += 5
-                    if current_character < 32:
-                        break
-
-                delta_latitude = ~(result >> 1) if (result & 1) else (result >> 1)
-                accumulated_latitude += delta_latitude
-
-                result = 0
-                shift_amount = 0
-
-                while True:
-                    current_character = ord(polyline[polyline_index]) - 63
-                    polyline_index += 1
-                    result |= (current_character & 0x1F) << shift_amount
-                    shift_amount += 5
-                    if current_character < 32:
-                        break
-
-                delta_longitude = ~(result >> 1) if (result & 1) else (result >> 1)
-                accumulated_longitude += delta_longitude
-
-                decoded_points.append(
-                    (accumulated_latitude / 1e5, accumulated_longitude / 1e5)
-                )
-
-            return decoded_points
+            return [tuple(point) for point in decode_polyline(polyline).tolist()]
 
         except Exception:
             raise ValueError("Failed to decode polyline — Google returned invalid shape data")
 
-    def fetch_routes_from_google(self):
-        url = "https://routes.googleapis.com/directions/v2:computeRoutes"
+    def decode_route_polylines(self, google_routes_list):
+        """Decode every route shape in one vectorized pass, as [lng, lat] pairs."""
+        try:
+            points, offsets = decode_polylines(
+                [route_entry["polyline"]["encodedPolyline"] for route_entry in google_routes_list],
+                order=LNG_LAT,
+            )
+            coordinate_pairs = points.tolist()
+            return [
+                coordinate_pairs[offsets[i]:offsets[i + 1]]
+                for i in range(len(google_routes_list))
+            ]
 
-        request_body = {
-            "origin": {"address": f"{self.origin}, {self.city}, Saudi Arabia"},
-            "destination": {"address": f"{self.destination}, {self.city}, Saudi Arabia"},
+        except Exception:
+            raise ValueError("Failed to decode polyline — Google returned invalid shape data")
+
+    def get_routing_options(self):
+        return {
             "travelMode": "DRIVE",
             "computeAlternativeRoutes": True,
             "routingPreference": "TRAFFIC_AWARE_OPTIMAL",
@@ -146,6 +97,37 @@ class Trip:
             "regionCode": "SA",
         }
 
+    def make_waypoint(self, place):
+        """Routes API waypoint: a {"latitude", "longitude"} dict or an address in the trip's city."""
+        if isinstance(place, dict):
+            return {
+                "location": {
+                    "latLng": {
+                        "latitude": float(place["latitude"]),
+                        "longitude": float(place["longitude"]),
+                    }
+                }
+            }
+        return {"address": f"{place}, {self.city}, Saudi Arabia"}
+
+    async def fetch_routes_from_google(self):
+        routing_options = self.get_routing_options()
+
+        cache_key = None
+        if self.route_cache is not None:
+            cache_key = self.route_cache.make_key(
+                self.origin, self.destination, self.city, routing_options
+            )
+            cached_response = self.route_cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        request_body = {
+            "origin": self.make_waypoint(self.origin),
+            "destination": self.make_waypoint(self.destination),
+            **routing_options,
+        }
+
         request_headers = {
             "Content-Type": "application/json",
             "X-Goog-Api-Key": self.api_key,
@@ -158,17 +140,30 @@ class Trip:
         }
 
         try:
-            response = requests.post(url, json=request_body, headers=request_headers)
-            response.raise_for_status()
-            return response.json()
+            google_response = await self.routes_client.compute_routes(
+                request_body, request_headers
+            )
 
-        except requests.exceptions.RequestException as e:
-            return {"error": "Failed to contact Google Directions API", "details": str(e)}
+            # only successful route lists are worth reusing
+            if cache_key is not None and "routes" in google_response:
+                self.route_cache.put(cache_key, google_response)
 
-    def get_routes(self):
+            return google_response
+
+        except httpx.HTTPError as e:
+            return {"error": "Failed to contact Google Directions API", "details": str(e) or type(e).__name__}
+
+    async def get_routes(self):
         try:
-            google_response = self.fetch_routes_from_google()
+            google_response = await self.fetch_routes_from_google()
+            return self.build_routes(google_response)
+
+        except Exception as e:
+            return {"error": "Unexpected backend failure", "details": str(e)}
 
+    def build_routes(self, google_response):
+        """Emissions + decoded shapes for a raw Google response (no network)."""
+        try:
             if "error" in google_response:
                 return google_response
 
@@ -200,8 +195,9 @@ class Trip:
             n2o_factor = emission_factors["n2o_factor"]
 
             processed_routes = []
+            decoded_routes = self.decode_route_polylines(google_routes_list)
 
-            for route_entry in google_routes_list:
+            for route_entry, coordinate_pairs in zip(google_routes_list, decoded_routes):
                 distance_kilometers = route_entry["distanceMeters"] / 1000
                 fuel_used = distance_kilometers * fuel_consumption_rate
                 duration_minutes = int(route_entry["duration"].replace("s", "")) // 60
@@ -212,14 +208,6 @@ class Trip:
                 emission_n2o = distance_kilometers * n2o_factor
                 emission_co2e = emission_co2 + emission_ch4 * 25 + emission_n2o * 298
 
-                decoded_coordinates = self.decode_polyline(
-                    route_entry["polyline"]["encodedPolyline"]
-                )
-
-                coordinate_pairs = [
-                    [lng, lat] for (lat, lng) in decoded_coordinates
-                ]
-
                 processed_routes.append(
                     {
         "summary": route_entry.get("description", "Route"),
@@ -1,12 +1,25 @@
 # recommendation_engine.py
 
+import os
+import numpy as np
 import pandas as pd
 import joblib
 from datetime import datetime
 from typing import Dict, List, Any, Tuple
 
+from utils.prediction_cache import PredictionCache
+from models.ai_models.tree_compiler import load_compiled
+
 
 class GreenMileRecommendationEngine:
+
+    CATEGORICAL_COLUMNS = [
+        "Vehicle Type",
+        "Fuel Type",
+        "Road Type",
+        "Traffic Conditions",
+        "City",
+    ]
     
     # Fuel consumption factors (kg CO2e per liter of fuel)
     FUEL_CO2_FACTORS = {
@@ -32,12 +45,22 @@ class GreenMileRecommendationEngine:
         classification_model_path="classification_model.pkl",
         encoders_path="label_encoders.pkl",
         thresholds_path="category_thresholds.pkl",
+        cache_size=0,
+        cache_ttl_seconds=600,
+        cache_quantization=None,
+        compiled_models_dir=None,
     ):
 
-        self.regression_model = joblib.load(regression_model_path)
-        self.classification_model = joblib.load(classification_model_path)
-        self.label_encoders = joblib.load(encoders_path)
-        self.thresholds = joblib.load(thresholds_path)
+        self.model_paths = (
+            regression_model_path,
+            classification_model_path,
+            encoders_path,
+            thresholds_path,
+        )
+
+        # Directory of models compiled by tree_compiler; used in place of the
+        # regression / classification .pkl files when compiled from them
+        self.compiled_models_dir = compiled_models_dir
 
         self.feature_columns = [
             "Distance_km", "Speed", "TrafficIndexLive", "JamsCount",
@@ -47,8 +70,51 @@ class GreenMileRecommendationEngine:
             "Road Type_encoded", "Traffic Conditions_encoded", "City_encoded"
         ]
 
+        # Optional memo of model outputs per (quantized) feature row;
+        # cache_size=0 disables it
+        self.prediction_cache = (
+            PredictionCache(
+                self.feature_columns,
+                quantization=cache_quantization,
+                ttl_seconds=cache_ttl_seconds,
+                max_entries=cache_size,
+            )
+            if cache_size > 0 else None
+        )
+
+        self.model_version = 0
+        self.load_models()
+
+    # -----------------------------
+    # Model loading
+    # -----------------------------
+    def load_models(self):
+        """(Re)load the models and encoders from model_paths; cached predictions are dropped."""
+
+        regression_model_path, classification_model_path, encoders_path, thresholds_path = self.model_paths
+
+        self.regression_model = self._load_model(regression_model_path)
+        self.classification_model = self._load_model(classification_model_path)
+        self.label_encoders = joblib.load(encoders_path)
+        self.thresholds = joblib.load(thresholds_path)
+
         self.class_labels = list(self.classification_model.classes_)
 
+        self._compile_feature_encoder()
+
+        self.model_version += 1
+        if self.prediction_cache is not None:
+            self.prediction_cache.clear()
+
+    def _load_model(self, path):
+        if self.compiled_models_dir:
+            name = os.path.splitext(os.path.basename(path))[0]
+            compiled = load_compiled(os.path.join(self.compiled_models_dir, name), source_path=path)
+            if compiled is not None:
+                return compiled
+
+        return joblib.load(path)
+
     # -----------------------------
     # Fuel Calculations
     # -----------------------------
@@ -99,62 +165,168 @@ class GreenMileRecommendationEngine:
         except:
             return 0, f"Unknown value '{value}' for {col_name}"
 
-    # -----------------------------
-    # Feature preparation
-    # -----------------------------
-    def prepare_trip_features(self, trip_data):
+    def _compile_feature_encoder(self):
+        """
+        Precompute everything feature encoding needs per route: the column
+        position of each input, and a value -> code dict per categorical
+        column taken from its LabelEncoder's classes_ (a LabelEncoder's code
+        is the value's index there). Values missing from a dict go through
+        _safe_encode, so unknown values warn exactly as before.
+        """
 
-        warnings = []
-        trip_encoded = dict(trip_data)
+        positions = {name: i for i, name in enumerate(self.feature_columns)}
+        encoded_columns = {f"{col}_encoded" for col in self.CATEGORICAL_COLUMNS}
 
-        categorical_cols = [
-            "Vehicle Type",
-            "Fuel Type",
-            "Road Type",
-            "Traffic Conditions",
-            "City",
+        # (position, name) of columns copied straight from the route dict
+        self._passthrough_columns = [
+            (positions[name], name)
+            for name in self.feature_columns
+            if name not in encoded_columns
         ]
 
-        for col in categorical_cols:
+        # (column, position of its code or None, value -> code)
+        self._categorical_codes = []
 
-            if col in trip_encoded:
+        for col in self.CATEGORICAL_COLUMNS:
 
-                encoded, warn = self._safe_encode(
-                    col,
-                    trip_encoded[col],
-                )
+            encoder = self.label_encoders.get(col)
+            classes = getattr(encoder, "classes_", None)
 
-                trip_encoded[f"{col}_encoded"] = encoded
+            codes = {}
+            if isinstance(classes, (list, tuple, np.ndarray)):
+                codes = {value: code for code, value in enumerate(classes)}
 
-                if warn:
-                    warnings.append(warn)
+            self._categorical_codes.append(
+                (col, positions.get(f"{col}_encoded"), codes)
+            )
+
+    def _encode_value(self, col, codes, value):
+
+        try:
+            code = codes.get(value)
+        except TypeError:  # unhashable value
+            code = None
 
-        for f in self.feature_columns:
+        if code is not None:
+            return code, ""
+
+        return self._safe_encode(col, value)
+
+    def encode_features(self, routes_list):
+        """
+        Feature matrix (one row per route, feature_columns order) written
+        straight into a preallocated float array, plus each route's warnings.
+        Missing features are 0, as in prepare_trip_features.
+        """
 
-            if f not in trip_encoded:
-                trip_encoded[f] = 0
+        features = np.zeros((len(routes_list), len(self.feature_columns)))
+        all_warnings = []
 
-        features_df = pd.DataFrame([trip_encoded])[self.feature_columns]
+        for row, trip_data in enumerate(routes_list):
 
-        return features_df, warnings
+            warnings = []
+
+            for position, name in self._passthrough_columns:
+                value = trip_data.get(name)
+                if value is not None:
+                    features[row, position] = value
+
+            for col, position, codes in self._categorical_codes:
+
+                if col in trip_data:
+
+                    encoded, warn = self._encode_value(col, codes, trip_data[col])
+
+                    if position is not None:
+                        features[row, position] = encoded
+
+                    if warn:
+                        warnings.append(warn)
+
+                elif position is not None:
+                    # an already-encoded value passed through as is
+                    features[row, position] = trip_data.get(f"{col}_encoded") or 0
+
+            all_warnings.append(warnings)
+
+        return features, all_warnings
+
+    def prepare_trip_features(self, trip_data):
+
+        features, warnings = self.encode_features([trip_data])
+
+        features_df = pd.DataFrame(features, columns=self.feature_columns)
+
+        return features_df, warnings[0]
+
+    def _model_input(self, features):
+        # models fitted on a DataFrame check the column names (and warn on a
+        # bare array); wrap the array once for both models only if needed
+        for model in (self.regression_model, self.classification_model):
+            if getattr(model, "feature_names_in_", None) is not None:
+                return pd.DataFrame(features, columns=self.feature_columns)
+        return features
 
     # -----------------------------
     # Prediction
     # -----------------------------
+    def predict_routes(self, routes_list):
+        """
+        Predictions for many routes in one pass: one feature matrix, one
+        regression call and one predict_proba call (the category is the
+        most probable class, as classification_model.predict would pick).
+        """
+
+        features, warnings = self.encode_features(routes_list)
+
+        predicted_co2, proba = self._predict_features(features)
+
+        return [
+            self._build_prediction(route_data, float(co2), row, route_warnings)
+            for route_data, co2, row, route_warnings
+            in zip(routes_list, predicted_co2, proba, warnings, strict=True)
+        ]
+
+    def _predict_features(self, features):
+        """(CO2e per row, class probabilities per row), from the cache where possible."""
+
+        cache = self.prediction_cache
+
+        if cache is None:
+            model_input = self._model_input(features)
+            return (
+                self.regression_model.predict(model_input),
+                self.classification_model.predict_proba(model_input),
+            )
+
+        version = self.model_version
+        keys = cache.make_keys(features)
+        outputs = [cache.get(key) for key in keys]
+        missing = [i for i, output in enumerate(outputs) if output is None]
+
+        if missing:
+            model_input = self._model_input(features[missing])
+            predicted_co2 = self.regression_model.predict(model_input)
+            proba = self.classification_model.predict_proba(model_input)
+
+            for i, co2, row in zip(missing, predicted_co2, proba, strict=True):
+                outputs[i] = (float(co2), np.array(row))
+                # skip outputs of models replaced while predicting
+                if self.model_version == version:
+                    cache.put(keys[i], outputs[i])
+
+        return [co2 for co2, _ in outputs], [row for _, row in outputs]
+
     def predict_single_route(self, route_data):
 
-        features, warnings = self.prepare_trip_features(route_data)
+        return self.predict_routes([route_data])[0]
 
-        predicted_co2 = float(
-            self.regression_model.predict(features)[0]
-        )
+    def _build_prediction(self, route_data, predicted_co2, proba, warnings):
 
         predicted_category = str(
-            self.classification_model.predict(features)[0]
+            self.class_labels[int(np.argmax(proba))]
         )
 
-        proba = self.classification_model.predict_proba(features)[0]
-
         category_probs = {
             cls: float(p)
             for cls, p in zip(self.class_labels, proba)
@@ -202,10 +374,7 @@ class GreenMileRecommendationEngine:
     # -----------------------------
     def compare_routes(self, routes_list):
 
-        predictions = [
-            self.predict_single_route(r)
-            for r in routes_list
-        ]
+        predictions = self.predict_routes(routes_list)
 
         predictions_sorted = sorted(
             predictions,
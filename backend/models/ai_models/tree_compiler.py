@@ -0,0 +1,331 @@
+"""
+Offline compiler for the trained tree ensembles.
+
+The regression and classification models are scikit-learn tree ensembles
+(random forests). compile_forest() flattens every tree of a fitted
+ensemble into one set of node arrays:
+
+    feature[node]    feature index tested at the node
+    threshold[node]  go left when x[feature] <= threshold
+    left / right     child node indices (global across trees)
+    value[node]      output at the node: the regression target, or the
+                     normalized class probabilities
+    roots[tree]      index of each tree's root node
+
+Leaves point both children at themselves, so CompiledForest evaluates all
+trees for all rows together with a fixed number (max_depth) of vectorized
+steps and no per-node Python or per-call estimator overhead. Trees are
+summed in estimator order and divided by their count, as sklearn does, so
+outputs match predict / predict_proba to floating-point tolerance (exactly,
+for models fitted with n_jobs=1).
+
+Compiled models are saved as a directory of .npy files plus meta.json and
+loaded memory-mapped, so startup does not unpickle the ensembles. Compile
+the trained models with:
+
+    python -m models.ai_models.tree_compiler [--models-dir DIR] [--out DIR]
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import joblib
+import numpy as np
+
+FORMAT_VERSION = 1
+
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+MODEL_FILES = ("regression_model.pkl", "classification_model.pkl")
+
+
+class CompiledForest:
+    """
+    A tree ensemble as flat node arrays; a drop-in for the fitted model's
+    predict (regressors) or predict_proba / predict / classes_ (classifiers).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features, classes=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.classes_ = None if classes is None else np.asarray(classes)
+
+    @property
+    def is_classifier(self):
+        return self.classes_ is not None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    # -----------------------------
+    # Evaluation
+    # -----------------------------
+    def _check_input(self, X):
+        # sklearn evaluates trees on float32 features; comparing the float32
+        # value with the float64 threshold is what keeps the splits identical
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has shape {X.shape}, expected (n_rows, {self.n_features_in_})"
+            )
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity")
+        return X
+
+    def _leaf_values(self, X):
+        """value at the leaf each tree sends each row to: (n_trees, n_rows, n_outputs)."""
+
+        X = self._check_input(X)
+        rows = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+
+        # leaves are fixed points, so every row is at its leaf after max_depth steps
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes]
+
+    def _average(self, X):
+        # summing over the tree axis adds trees one after another, in the
+        # same order as sklearn's forest accumulation
+        return self._leaf_values(X).sum(axis=0) / self.n_trees
+
+    def predict(self, X):
+        if self.is_classifier:
+            return self.classes_[np.argmax(self._average(X), axis=1)]
+        return self._average(X)[:, 0]
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._average(X)
+
+    # -----------------------------
+    # Storage
+    # -----------------------------
+    def save(self, directory, source_sha256=None):
+        """Write the node arrays (.npy) and meta.json to directory."""
+
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "max_depth": self.max_depth,
+            "n_features": self.n_features_in_,
+            "classes": None if self.classes_ is None else self.classes_.tolist(),
+            "source_sha256": source_sha256,
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a saved forest; arrays are memory-mapped read-only unless mmap=False."""
+
+        meta = read_meta(directory)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format: {meta.get('format_version')}")
+
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in ARRAYS
+        }
+        return cls(
+            max_depth=meta["max_depth"],
+            n_features=meta["n_features"],
+            classes=meta["classes"],
+            **arrays,
+        )
+
+
+def _trees(model):
+    """The fitted sklearn trees of a single tree or an averaging forest."""
+
+    if hasattr(model, "tree_"):
+        return [model]
+
+    estimators = getattr(model, "estimators_", None)
+    # forests hold a flat list of trees; boosting holds an array of them
+    # (and adds rather than averages), which this compiler does not support
+    if isinstance(estimators, list) and estimators and all(hasattr(e, "tree_") for e in estimators):
+        return estimators
+
+    raise TypeError(f"Cannot compile {type(model).__name__}: expected a decision tree or an averaging forest")
+
+
+def compile_forest(model):
+    """Flatten a fitted decision tree / random forest / extra-trees model."""
+
+    trees = _trees(model)
+    classes = getattr(model, "classes_", None)
+
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise TypeError("Multi-output models are not supported")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in trees:
+        tree = estimator.tree_
+        count = tree.node_count
+        index = np.arange(offset, offset + count, dtype=np.int32)
+        leaf = tree.children_left < 0
+
+        # leaves: any feature, children pointing back at the leaf itself
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(leaf, 0.0, tree.threshold))
+        lefts.append(np.where(leaf, index, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(leaf, index, tree.children_right + offset).astype(np.int32))
+
+        value = np.asarray(tree.value[:, 0, :], dtype=np.float64)
+        if classes is not None:
+            # per-tree class probabilities, normalized as DecisionTreeClassifier.predict_proba does
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        values.append(value)
+
+        roots.append(offset)
+        offset += count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int32),
+        max_depth=max_depth,
+        n_features=model.n_features_in_,
+        classes=classes,
+    )
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_meta(directory):
+    with open(os.path.join(directory, "meta.json")) as f:
+        return json.load(f)
+
+
+def load_compiled(directory, source_path=None):
+    """
+    The compiled model in directory, memory-mapped, or None when there is
+    none or it was compiled from a different file than source_path (a
+    missing source file is not checked).
+    """
+
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+
+    if source_path is not None and os.path.exists(source_path):
+        if read_meta(directory).get("source_sha256") != file_sha256(source_path):
+            return None
+
+    return CompiledForest.load(directory)
+
+
+def sample_rows(compiled, count, seed=0):
+    """Random rows spanning each feature's split thresholds, for verification."""
+
+    rng = np.random.default_rng(seed)
+    internal = np.asarray(compiled.left) != np.arange(compiled.n_nodes)
+    feature = np.asarray(compiled.feature)[internal]
+    threshold = np.asarray(compiled.threshold)[internal]
+
+    X = np.zeros((count, compiled.n_features_in_))
+    for column in range(compiled.n_features_in_):
+        splits = threshold[feature == column]
+        if len(splits):
+            low, high = splits.min(), splits.max()
+            margin = max(high - low, 1.0) * 0.1
+            X[:, column] = rng.uniform(low - margin, high + margin, count)
+    return X
+
+
+def verify(model, compiled, X, rtol=1e-9, atol=1e-12):
+    """Largest absolute difference from the sklearn model on X (raises if out of tolerance)."""
+
+    if compiled.is_classifier:
+        expected, actual = model.predict_proba(X), compiled.predict_proba(X)
+    else:
+        expected, actual = model.predict(X), compiled.predict(X)
+
+    np.testing.assert_allclose(actual, expected, rtol=rtol, atol=atol)
+    return float(np.max(np.abs(actual - expected), initial=0.0))
+
+
+def compile_file(source_path, directory, verify_rows=2000):
+    """Compile one .pkl model into directory, checked against sklearn on sample rows."""
+
+    model = joblib.load(source_path)
+    compiled = compile_forest(model)
+
+    if verify_rows:
+        # the models are fitted on a DataFrame; compare with the same input
+        X = sample_rows(compiled, verify_rows)
+        names = getattr(model, "feature_names_in_", None)
+        if names is not None:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=names)
+        max_error = verify(model, compiled, X)
+    else:
+        max_error = None
+
+    compiled.save(directory, source_sha256=file_sha256(source_path))
+    return compiled, max_error
+
+
+def main():
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trained_models")
+
+    parser = argparse.ArgumentParser(description="Compile the trained tree ensembles to memory-mappable arrays")
+    parser.add_argument("--models-dir", default=default_dir)
+    parser.add_argument("--out", default=None, help="output directory (default: <models-dir>/compiled)")
+    parser.add_argument("--verify-rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(args.models_dir, "compiled")
+
+    for filename in MODEL_FILES:
+        name = os.path.splitext(filename)[0]
+        compiled, max_error = compile_file(
+            os.path.join(args.models_dir, filename),
+            os.path.join(out, name),
+            verify_rows=args.verify_rows,
+        )
+        print(
+            f"✓ {name}: {compiled.n_trees} trees, {compiled.n_nodes} nodes, "
+            f"depth {compiled.max_depth}, {compiled.nbytes / 1e6:.1f} MB, max |error| {max_error}"
+        )
+
+
+if __name__ == "__main__":
+    main()
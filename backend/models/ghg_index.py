@@ -0,0 +1,86 @@
+from bisect import bisect_left
+
+
+class GHGFactorIndex:
+    """
+    Precompiled lookup tables over ghg_factors.json.
+
+    Built once at startup and shared by every Trip:
+      - exact:  (category, fuel, year) -> factor row        O(1)
+      - years:  (category, fuel) -> sorted model years      O(log n) via bisect
+    Keys are normalized the same way Trip used to normalize on every row
+    (str().strip().lower() for names, str().strip() for the year).
+    """
+
+    def __init__(self, ghg_data):
+        self.data = ghg_data
+        self.fuel_consumption = dict(ghg_data.get("fuel_consumption", {}))
+
+        self.exact = {}
+        self.years = {}
+        self.rows_by_year = {}
+
+        # first occurrence wins, matching the old linear scan
+        nearest_candidates = {}
+
+        for position, row in enumerate(ghg_data.get("factors", [])):
+            category_norm = self.normalize_name(row.get("vehicle_type", ""))
+            fuel_norm = self.normalize_name(row.get("fuel_type", ""))
+            year_norm = str(row.get("model_year_range", "")).strip()
+
+            self.exact.setdefault((category_norm, fuel_norm, year_norm), row)
+
+            try:
+                year_value = int(row.get("model_year_range", 0))
+            except (TypeError, ValueError):
+                continue
+
+            per_pair = nearest_candidates.setdefault((category_norm, fuel_norm), {})
+            per_pair.setdefault(year_value, (position, row))
+
+        for pair_key, by_year in nearest_candidates.items():
+            sorted_years = sorted(by_year)
+            self.years[pair_key] = sorted_years
+            self.rows_by_year[pair_key] = [by_year[y] for y in sorted_years]
+
+    @staticmethod
+    def normalize_name(value):
+        return str(value).strip().lower()
+
+    @classmethod
+    def ensure(cls, ghg_data):
+        """Return ghg_data unchanged if it is already an index, otherwise compile it."""
+        if isinstance(ghg_data, cls):
+            return ghg_data
+        return cls(ghg_data)
+
+    def get_fuel_consumption(self, category):
+        return self.fuel_consumption[category]
+
+    def lookup_exact(self, category, fuel, year):
+        key = (
+            self.normalize_name(category),
+            self.normalize_name(fuel),
+            str(year).strip(),
+        )
+        return self.exact.get(key)
+
+    def lookup_closest(self, category, fuel, year):
+        """Row with the nearest model year; ties go to the row listed first in the JSON."""
+        pair_key = (self.normalize_name(category), self.normalize_name(fuel))
+        sorted_years = self.years.get(pair_key)
+
+        if not sorted_years:
+            return None
+
+        target = int(year)
+        rows = self.rows_by_year[pair_key]
+        i = bisect_left(sorted_years, target)
+
+        candidates = []
+        if i < len(sorted_years):
+            candidates.append((abs(sorted_years[i] - target), rows[i][0], rows[i][1]))
+        if i > 0:
+            candidates.append((abs(sorted_years[i - 1] - target), rows[i - 1][0], rows[i - 1][1]))
+
+        return min(candidates, key=lambda c: (c[0], c[1]))[2]
@@ -0,0 +1,75 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEG_LAT = EARTH_RADIUS_M * math.pi / 180
+
+
+class LocalProjection:
+    """
+    Equirectangular projection around a route, in metres.
+
+        x = (lng - lng0) * METERS_PER_DEG_LAT * cos(lat0)
+        y = (lat - lat0) * METERS_PER_DEG_LAT
+
+    (lat0, lng0) is the centre of the route's bounding box, which keeps the
+    largest latitude offset as small as possible. After the one cos() here,
+    projecting a point is two subtractions and two multiplications.
+
+    Error bound vs haversine (same sphere): north-south distances are exact,
+    east-west ones are scaled by cos(lat0) / cos(lat) instead of 1, so any
+    short distance inside the route's latitude band is off by at most
+
+        max_relative_error = max |cos(lat0) / cos(lat) - 1|  over the band
+                           ~= tan(lat0) * half the band's height (radians)
+
+    Saudi examples: a city-scale route spanning 0.5 deg of latitude (~55 km)
+    has a band half-height of 0.0044 rad. With tan(lat0) between 0.39 at
+    Jeddah (21.5 N) and 0.62 at the far north (32 N), the bound is 0.17-0.27%,
+    i.e. under 3 m per km. A Riyadh-Dammam style intercity route (about 2 deg)
+    stays around 1%. Haversine itself is about 0.5% off the WGS84 ellipsoid,
+    so city-scale projection error is below the model error we already accept.
+    """
+
+    def __init__(self, lat0, lng0):
+        self.lat0 = float(lat0)
+        self.lng0 = float(lng0)
+        self.cos_lat0 = math.cos(math.radians(self.lat0))
+        self.meters_per_deg_lat = METERS_PER_DEG_LAT
+        self.meters_per_deg_lng = METERS_PER_DEG_LAT * self.cos_lat0
+
+        self.lat_min = self.lat0
+        self.lat_max = self.lat0
+
+    @classmethod
+    def around(cls, lat, lng):
+        """Projection centred on the bounding box of degree arrays lat/lng."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        if lat.size == 0:
+            raise ValueError("Route has no coordinates")
+
+        projection = cls((lat.min() + lat.max()) / 2, (lng.min() + lng.max()) / 2)
+        projection.lat_min = float(lat.min())
+        projection.lat_max = float(lat.max())
+        return projection
+
+    def to_xy(self, latitude, longitude):
+        return (
+            (longitude - self.lng0) * self.meters_per_deg_lng,
+            (latitude - self.lat0) * self.meters_per_deg_lat,
+        )
+
+    def to_xy_arrays(self, lat, lng):
+        return (
+            (np.asarray(lng, dtype=np.float64) - self.lng0) * self.meters_per_deg_lng,
+            (np.asarray(lat, dtype=np.float64) - self.lat0) * self.meters_per_deg_lat,
+        )
+
+    @property
+    def max_relative_error(self):
+        """Worst-case relative distance error inside the route's latitude band."""
+        return max(
+            abs(self.cos_lat0 / math.cos(math.radians(lat)) - 1)
+            for lat in (self.lat_min, self.lat_max)
+        )
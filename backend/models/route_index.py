@@ -0,0 +1,195 @@
+import math
+import numpy as np
+
+
+class RouteSegmentIndex:
+    """
+    Uniform grid over a route's segments for whole-route nearest-segment queries.
+
+    Built by RouteSegments on the first whole-route search of a long route:
+      - each segment is registered in every square cell its bounding box
+        overlaps (in the route's projected metres); the cell size starts at a
+        few mean segment lengths and doubles until that costs at most
+        REGISTRATIONS_PER_SEGMENT entries per segment, so a handful of long
+        highway segments cannot blow the grid up;
+      - occupied cells are a sorted key array with offsets into one array of
+        segment ids (ascending within each cell), plus a key -> range dict
+        for the few cells looked up around the driver;
+      - a query projects the driver onto the segments in rings of cells
+        around it and is done as soon as the best distance is shorter than
+        the way out of the rings searched; after NEAR_RINGS it takes every
+        occupied cell that could still hold something closer.
+    Candidates are projected with the same arithmetic as RouteSegments.nearest
+    and ties go to the lowest segment index, so results equal the full scan.
+    """
+
+    # rings of cells around the driver's cell searched one by one
+    NEAR_RINGS = 3
+
+    MIN_CELL_METERS = 10.0
+    SEGMENTS_PER_CELL = 8
+    REGISTRATIONS_PER_SEGMENT = 4
+
+    # slack for rounding in the bounding boxes and the pruning test
+    EPSILON_METERS = 1e-6
+
+    def __init__(self, segments):
+        self.segments = segments
+        count = segments.count
+
+        x0 = np.minimum(segments.ax, segments.ax + segments.dx) - self.EPSILON_METERS
+        x1 = np.maximum(segments.ax, segments.ax + segments.dx) + self.EPSILON_METERS
+        y0 = np.minimum(segments.ay, segments.ay + segments.dy) - self.EPSILON_METERS
+        y1 = np.maximum(segments.ay, segments.ay + segments.dy) + self.EPSILON_METERS
+
+        cell = max(self.MIN_CELL_METERS, segments.total_meters / count * self.SEGMENTS_PER_CELL)
+        while True:
+            cx0, cx1 = np.floor(x0 / cell).astype(np.int64), np.floor(x1 / cell).astype(np.int64)
+            cy0, cy1 = np.floor(y0 / cell).astype(np.int64), np.floor(y1 / cell).astype(np.int64)
+            heights = cy1 - cy0 + 1
+            per_segment = (cx1 - cx0 + 1) * heights
+            # a segment shorter than a cell overlaps at most 2 x 2 cells, so this ends
+            if per_segment.sum() <= self.REGISTRATIONS_PER_SEGMENT * count:
+                break
+            cell *= 2
+        self.cell_meters = cell
+
+        self.x_min, self.y_min = int(cx0.min()), int(cy0.min())
+        self.height = int(cy1.max()) - self.y_min + 1
+        self.width = int(cx1.max()) - self.x_min + 1
+
+        # one (cell, segment) entry per overlapped cell
+        total = int(per_segment.sum())
+        segment_ids = np.repeat(np.arange(count, dtype=np.int64), per_segment)
+        k = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(per_segment) - per_segment, per_segment)
+        h = heights[segment_ids]
+        gx = cx0[segment_ids] + k // h
+        gy = cy0[segment_ids] + k % h
+        keys = (gx - self.x_min) * self.height + (gy - self.y_min)
+
+        # stable sort keeps the segment ids ascending within each cell
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self.members = segment_ids[order].astype(np.int32)
+        self.cell_keys, self.cell_start = np.unique(keys, return_index=True)
+        self.cell_stop = np.append(self.cell_start[1:], total)
+
+        self.cell_x0 = (self.cell_keys // self.height + self.x_min) * cell
+        self.cell_y0 = (self.cell_keys % self.height + self.y_min) * cell
+
+        self.cells = dict(zip(self.cell_keys.tolist(), zip(self.cell_start.tolist(), self.cell_stop.tolist())))
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (
+            self.members, self.cell_keys, self.cell_start, self.cell_stop, self.cell_x0, self.cell_y0,
+        ))
+
+    @staticmethod
+    def _ring(cx, cy, r):
+        if r == 0:
+            yield cx, cy
+            return
+        for i in range(-r, r + 1):
+            yield cx + i, cy - r
+            yield cx + i, cy + r
+        for j in range(-r + 1, r):
+            yield cx - r, cy + j
+            yield cx + r, cy + j
+
+    def _members_in_ring(self, cx, cy, r, seen):
+        """Ascending ids of the segments registered in ring r around (cx, cy) and not in seen (updated)."""
+        found = set()
+        members, cells = self.members, self.cells
+        x_max = self.x_min + self.width - 1
+        y_max = self.y_min + self.height - 1
+
+        for gx, gy in self._ring(cx, cy, r):
+            if self.x_min <= gx <= x_max and self.y_min <= gy <= y_max:
+                span = cells.get((gx - self.x_min) * self.height + gy - self.y_min)
+                if span is not None:
+                    found.update(members[span[0]:span[1]].tolist())
+
+        found -= seen
+        seen |= found
+        return sorted(found)
+
+    def _members_of(self, cells):
+        if len(cells) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate([
+            self.members[a:b] for a, b in zip(self.cell_start[cells].tolist(), self.cell_stop[cells].tolist())
+        ]))
+
+    def _closest(self, px, py, candidates, best):
+        """best (dist2, index, t) updated with the given ascending segment ids."""
+        if len(candidates) == 0:
+            return best
+        if len(candidates) <= self.segments.SCALAR_WINDOW:
+            return self._closest_scalar(px, py, candidates, best)
+
+        s = self.segments
+        ax = s.ax[candidates]
+        ay = s.ay[candidates]
+        dx = s.dx[candidates]
+        dy = s.dy[candidates]
+
+        rx = px - ax
+        ry = py - ay
+        t = np.clip((rx * dx + ry * dy) * s.inv_length2[candidates], 0.0, 1.0)
+        ex = rx - t * dx
+        ey = ry - t * dy
+        dist2 = ex * ex + ey * ey
+
+        k = int(np.argmin(dist2))
+        found = (float(dist2[k]), int(candidates[k]), float(t[k]))
+        return min(best, found)
+
+    def _closest_scalar(self, px, py, candidates, best):
+        # same operations, in the same order, as _closest and RouteSegments.nearest
+        rows = self.segments.segments[candidates].tolist()
+
+        for i, (ax, ay, dx, dy, inv_length2) in zip(candidates, rows):
+            rx = px - ax
+            ry = py - ay
+            t = (rx * dx + ry * dy) * inv_length2
+            t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+            ex = rx - t * dx
+            ey = ry - t * dy
+            dist2 = ex * ex + ey * ey
+            if dist2 < best[0] or (dist2 == best[0] and i < best[1]):
+                best = (dist2, int(i), t)
+
+        return best
+
+    def nearest(self, px, py):
+        """(segment index, t, metres) of the closest point to projected (px, py)."""
+        cell = self.cell_meters
+        cx, cy = math.floor(px / cell), math.floor(py / cell)
+
+        best = (float("inf"), self.segments.count, 0.0)
+        seen = set()
+        for r in range(self.NEAR_RINGS + 1):
+            best = self._closest(px, py, self._members_in_ring(cx, cy, r, seen), best)
+
+            # anything not registered within r rings is at least this far away
+            way_out = min(
+                px - (cx - r) * cell, (cx + r + 1) * cell - px,
+                py - (cy - r) * cell, (cy + r + 1) * cell - py,
+            ) - self.EPSILON_METERS
+            if best[0] < way_out * way_out:
+                return best[1], best[2], math.sqrt(best[0])
+
+        # every occupied cell that could hold a segment at least as close
+        gap_x = np.maximum(np.maximum(self.cell_x0 - px, px - (self.cell_x0 + cell)), 0.0)
+        gap_y = np.maximum(np.maximum(self.cell_y0 - py, py - (self.cell_y0 + cell)), 0.0)
+        lower = np.hypot(gap_x, gap_y)
+
+        if best[1] == self.segments.count:
+            best = self._closest(px, py, self._members_of(np.flatnonzero(lower == lower.min())), best)
+
+        reach = math.sqrt(best[0]) + self.EPSILON_METERS
+        candidates = np.setdiff1d(self._members_of(np.flatnonzero(lower <= reach)), list(seen))
+        best = self._closest(px, py, candidates, best)
+
+        return best[1], best[2], math.sqrt(best[0])
@@ -0,0 +1,245 @@
+import hashlib
+import math
+import numpy as np
+
+from models.local_projection import LocalProjection
+from models.route_index import RouteSegmentIndex
+
+
+class RouteSegments:
+    """
+    A route polyline as NumPy segment arrays, for point-to-segment snapping.
+
+    Built once per route in Navigation.init_route:
+      - vertices are projected to local metres with a LocalProjection
+        (equirectangular around the route's bounding-box centre; see there
+        for the error bound);
+      - each segment i keeps its start (ax, ay), direction (dx, dy) and
+        1 / squared length in one (count, 5) array, so projecting a driver onto
+        a range of segments is a handful of vectorized array operations (or,
+        for windows too small to amortize NumPy's per-call overhead, a plain
+        loop over that slice);
+      - cumulative distances are the projected segment lengths, so distance
+        along the route at (segment, t) needs no trigonometry either;
+      - whole-route searches on long routes go through a RouteSegmentIndex
+        grid, built on the first such search.
+    A single-vertex route is treated as one zero-length segment.
+
+    These arrays are the only copy of the route Navigation keeps: 64 bytes
+    per vertex (lat, lng, the 5 segment columns and cumulative), against
+    ~190 for a list of Point objects plus a list of float distances.
+    """
+
+    def __init__(self, points):
+        self._build(
+            np.array([p.latitude for p in points], dtype=np.float64),
+            np.array([p.longitude for p in points], dtype=np.float64),
+        )
+
+    @classmethod
+    def from_arrays(cls, latitudes, longitudes):
+        """Build from parallel latitude / longitude arrays (no per-vertex objects)."""
+        segments = cls.__new__(cls)
+        segments._build(
+            np.ascontiguousarray(latitudes, dtype=np.float64),
+            np.ascontiguousarray(longitudes, dtype=np.float64),
+        )
+        return segments
+
+    def _build(self, lat, lng):
+        if len(lat) == 0:
+            raise ValueError("Route has no coordinates")
+        if len(lat) != len(lng):
+            raise ValueError("Latitude and longitude arrays differ in length")
+
+        # vertices as given; a single vertex is stored twice (one zero-length segment)
+        self.vertex_count = len(lat)
+        if self.vertex_count == 1:
+            lat, lng = np.repeat(lat, 2), np.repeat(lng, 2)
+
+        self.lat = lat
+        self.lng = lng
+        self.projection = LocalProjection.around(lat, lng)
+
+        x, y = self.projection.to_xy_arrays(lat, lng)
+
+        self.count = len(x) - 1
+        self.segments = np.empty((self.count, 5), dtype=np.float64)
+        self.ax, self.ay, self.dx, self.dy, self.inv_length2 = (self.segments[:, k] for k in range(5))
+
+        self.ax[:] = x[:-1]
+        self.ay[:] = y[:-1]
+        self.dx[:] = np.diff(x)
+        self.dy[:] = np.diff(y)
+
+        length2 = self.dx * self.dx + self.dy * self.dy
+        np.divide(1.0, length2, out=self.inv_length2, where=length2 > 0)
+        self.inv_length2[length2 == 0] = 0.0
+
+        self.cumulative = np.zeros(len(x), dtype=np.float64)
+        np.cumsum(np.sqrt(length2), out=self.cumulative[1:])
+
+        self._index = None
+
+    @property
+    def total_meters(self):
+        return float(self.cumulative[-1])
+
+    @property
+    def vertex_distances(self):
+        """Cumulative metres at each vertex (a view, one entry per given vertex)."""
+        return self.cumulative[:self.vertex_count]
+
+    def vertex(self, index):
+        """(latitude, longitude) of vertex index."""
+        return float(self.lat[index]), float(self.lng[index])
+
+    def freeze(self):
+        """Make the arrays read-only, so one instance can back many sessions."""
+        for array in (self.lat, self.lng, self.segments, self.cumulative):
+            array.flags.writeable = False
+        return self
+
+    @property
+    def nbytes(self):
+        index = self._index.nbytes if self._index is not None else 0
+        return self.lat.nbytes + self.lng.nbytes + self.segments.nbytes + self.cumulative.nbytes + index
+
+    @property
+    def spatial_index(self):
+        """RouteSegmentIndex over all segments, built on first use."""
+        # concurrent first uses on a shared instance may both build; either result is the same
+        if self._index is None:
+            self._index = RouteSegmentIndex(self)
+        return self._index
+
+    def project(self, latitude, longitude):
+        return self.projection.to_xy(latitude, longitude)
+
+    # windows up to this many segments are scanned in Python, not NumPy
+    SCALAR_WINDOW = 48
+
+    # whole-route searches over at least this many segments use the grid
+    INDEX_MIN_SEGMENTS = 256
+
+    def nearest(self, latitude, longitude, start=0, stop=None):
+        """
+        Closest point on segments [start, stop) to (latitude, longitude).
+
+        Returns (segment index, t in [0, 1] along it, distance in metres);
+        ties go to the lowest segment index.
+        """
+        start = max(0, start)
+        stop = self.count if stop is None else min(self.count, stop)
+        px, py = self.project(latitude, longitude)
+
+        if stop - start <= self.SCALAR_WINDOW:
+            return self._nearest_scalar(px, py, start, stop)
+        if start == 0 and stop == self.count and self.count >= self.INDEX_MIN_SEGMENTS:
+            return self.spatial_index.nearest(px, py)
+
+        ax = self.ax[start:stop]
+        ay = self.ay[start:stop]
+        dx = self.dx[start:stop]
+        dy = self.dy[start:stop]
+
+        rx = px - ax
+        ry = py - ay
+        t = np.clip((rx * dx + ry * dy) * self.inv_length2[start:stop], 0.0, 1.0)
+        ex = rx - t * dx
+        ey = ry - t * dy
+        dist2 = ex * ex + ey * ey
+
+        k = int(np.argmin(dist2))
+        return start + k, float(t[k]), math.sqrt(float(dist2[k]))
+
+    def _nearest_scalar(self, px, py, start, stop):
+        # same operations, in the same order, as the vectorized path
+        best = (float("inf"), start, 0.0)
+
+        for k, (ax, ay, dx, dy, inv_length2) in enumerate(self.segments[start:stop].tolist()):
+            rx = px - ax
+            ry = py - ay
+            t = (rx * dx + ry * dy) * inv_length2
+            t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+            ex = rx - t * dx
+            ey = ry - t * dy
+            dist2 = ex * ex + ey * ey
+            if dist2 < best[0]:
+                best = (dist2, start + k, t)
+
+        return best[1], best[2], math.sqrt(best[0])
+
+    def point_at(self, index, t):
+        """(latitude, longitude) at fraction t along segment index."""
+        if t <= 0.0:
+            return float(self.lat[index]), float(self.lng[index])
+        if t >= 1.0:
+            return float(self.lat[index + 1]), float(self.lng[index + 1])
+        return (
+            float(self.lat[index] + t * (self.lat[index + 1] - self.lat[index])),
+            float(self.lng[index] + t * (self.lng[index + 1] - self.lng[index])),
+        )
+
+    def distance_along(self, index, t):
+        """Metres from the route start to fraction t along segment index."""
+        start = self.cumulative[index]
+        return float(start + t * (self.cumulative[index + 1] - start))
+
+
+def route_hash(latitudes, longitudes):
+    """Content hash of a route's vertices (hex); equal coordinates give equal hashes."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(latitudes, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(longitudes, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:32]
+
+
+def nearest_in_windows(queries):
+    """
+    Many RouteSegments.nearest calls in one vectorized pass.
+
+    queries: list of (segments, start, stop, latitude, longitude), each range
+    non-empty and possibly on a different route. The window slices are
+    concatenated, every projection is computed at once and the per-query
+    minimum is taken with reduceat. Returns [(segment index, t, metres)] in
+    query order, with the same tie-breaking as nearest().
+    """
+    if not queries:
+        return []
+
+    lengths = np.array([stop - start for _, start, stop, _, _ in queries], dtype=np.int64)
+    if (lengths <= 0).any():
+        raise ValueError("Empty segment window")
+
+    offsets = np.zeros(len(queries), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+
+    ax = np.concatenate([seg.ax[a:b] for seg, a, b, _, _ in queries])
+    ay = np.concatenate([seg.ay[a:b] for seg, a, b, _, _ in queries])
+    dx = np.concatenate([seg.dx[a:b] for seg, a, b, _, _ in queries])
+    dy = np.concatenate([seg.dy[a:b] for seg, a, b, _, _ in queries])
+    inv_length2 = np.concatenate([seg.inv_length2[a:b] for seg, a, b, _, _ in queries])
+
+    projected = np.array([seg.project(lat, lng) for seg, _, _, lat, lng in queries])
+    px = np.repeat(projected[:, 0], lengths)
+    py = np.repeat(projected[:, 1], lengths)
+
+    rx = px - ax
+    ry = py - ay
+    t = np.clip((rx * dx + ry * dy) * inv_length2, 0.0, 1.0)
+    ex = rx - t * dx
+    ey = ry - t * dy
+    dist2 = ex * ex + ey * ey
+
+    minima = np.minimum.reduceat(dist2, offsets)
+    positions = np.arange(len(dist2))
+    first = np.minimum.reduceat(
+        np.where(dist2 == np.repeat(minima, lengths), positions, len(dist2)),
+        offsets,
+    )
+
+    return [
+        (start + int(pos - offset), float(t[pos]), math.sqrt(float(best)))
+        for (_, start, _, _, _), pos, offset, best in zip(queries, first, offsets, minima)
+    ]
@@ -0,0 +1,24 @@
+#models/trip_trace_db.py
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Index
+from db.base import Base
+
+class TripTracePointDB(Base):
+    """One GPS breadcrumb. Append-only; written in bulk by utils.breadcrumbs.BreadcrumbLog."""
+    __tablename__ = "trip_trace_points"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+
+    session_id = Column(String(100), nullable=False)
+    # plain column, not a FK: the log must accept pings even for trips deleted later
+    trip_id = Column(Integer, nullable=True, index=True)
+
+    # pings of a session are ordered by recorded_at, then id (insertion order)
+    recorded_at = Column(Float, nullable=False)  # unix seconds
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    speed_kmh = Column(Float, nullable=True)
+    heading = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_trip_trace_points_session_time", "session_id", "recorded_at", "id"),
+    )
@@ -51,6 +51,7 @@ from models.company_db import CompanyDB   # noqa: F401
 from models.manager_db import ManagerDB   # noqa: F401
 from models.driver_db  import DriverDB    # noqa: F401
 from models.trip_db    import TripDB      # noqa: F401  — needs JSONB patch above
+from models.trip_trace_db import TripTracePointDB  # noqa: F401
 
 
 # ===========================================================================
@@ -0,0 +1,122 @@
+import json
+import os
+import pytest
+from models.ghg_index import GHGFactorIndex
+from backend.models.Trip import Trip
+
+
+GHG_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "..", "models", "ghg_factors.json"
+)
+
+
+@pytest.fixture(scope="module")
+def real_ghg_data():
+    with open(GHG_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def small_ghg_data():
+    return {
+        "fuel_consumption": {"Passenger Cars": 0.08},
+        "factors": [
+            {"vehicle_type": "Passenger Cars", "fuel_type": "Petrol", "model_year_range": "2010", "co2_factor": 1.0, "ch4_factor": 0.1, "n2o_factor": 0.1},
+            {"vehicle_type": "Passenger Cars", "fuel_type": "Petrol", "model_year_range": "2014", "co2_factor": 2.0, "ch4_factor": 0.2, "n2o_factor": 0.2},
+            {"vehicle_type": "Passenger Cars", "fuel_type": "Petrol", "model_year_range": "2012", "co2_factor": 3.0, "ch4_factor": 0.3, "n2o_factor": 0.3},
+            {"vehicle_type": " passenger cars ", "fuel_type": "PETROL", "model_year_range": "2012", "co2_factor": 9.0, "ch4_factor": 0.9, "n2o_factor": 0.9},
+        ],
+    }
+
+
+def _linear_exact(ghg, category, fuel, year):
+    for row in ghg["factors"]:
+        if (
+            str(row.get("vehicle_type", "")).strip().lower() == str(category).strip().lower()
+            and str(row.get("fuel_type", "")).strip().lower() == str(fuel).strip().lower()
+            and str(row.get("model_year_range", "")).strip() == str(year).strip()
+        ):
+            return row
+    return None
+
+
+def _linear_closest(ghg, category, fuel, year):
+    matching = [
+        row for row in ghg["factors"]
+        if str(row.get("vehicle_type", "")).strip().lower() == str(category).strip().lower()
+        and str(row.get("fuel_type", "")).strip().lower() == str(fuel).strip().lower()
+    ]
+    if not matching:
+        return None
+    return min(matching, key=lambda row: abs(int(row.get("model_year_range", 0)) - int(year)))
+
+
+class TestGHGFactorIndex:
+    def test_exact_lookup_is_normalized(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        row = index.lookup_exact("  PASSENGER cars", "petrol ", 2014)
+        assert row["co2_factor"] == 2.0
+
+    def test_exact_lookup_first_row_wins_on_duplicates(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        assert index.lookup_exact("Passenger Cars", "Petrol", "2012")["co2_factor"] == 3.0
+
+    def test_exact_lookup_miss_returns_none(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        assert index.lookup_exact("Passenger Cars", "Diesel", 2012) is None
+
+    def test_closest_uses_nearest_year(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        assert index.lookup_closest("Passenger Cars", "Petrol", 2015)["model_year_range"] == "2014"
+        assert index.lookup_closest("Passenger Cars", "Petrol", 1990)["model_year_range"] == "2010"
+
+    def test_closest_tie_goes_to_first_listed_row(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        # 2011 is equidistant from 2010 and 2012; 2010 is listed first
+        assert index.lookup_closest("Passenger Cars", "Petrol", 2011)["model_year_range"] == "2010"
+        # 2013 is equidistant from 2014 and 2012; 2014 is listed first
+        assert index.lookup_closest("Passenger Cars", "Petrol", 2013)["model_year_range"] == "2014"
+
+    def test_closest_unknown_pair_returns_none(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        assert index.lookup_closest("Motorcycles", "Petrol", 2020) is None
+
+    def test_closest_non_numeric_year_raises(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        with pytest.raises(ValueError):
+            index.lookup_closest("Passenger Cars", "Petrol", "abc")
+
+    def test_ensure_returns_same_index(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        assert GHGFactorIndex.ensure(index) is index
+        assert isinstance(GHGFactorIndex.ensure(small_ghg_data), GHGFactorIndex)
+
+    def test_fuel_consumption(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        assert index.get_fuel_consumption("Passenger Cars") == 0.08
+        with pytest.raises(KeyError):
+            index.get_fuel_consumption("Boats")
+
+    def test_matches_linear_scan_on_real_data(self, real_ghg_data):
+        index = GHGFactorIndex(real_ghg_data)
+        pairs = {(r["vehicle_type"], r["fuel_type"]) for r in real_ghg_data["factors"]}
+        pairs.add(("Passenger Cars", "CNG"))
+
+        for category, fuel in pairs:
+            for year in range(1950, 2035):
+                assert index.lookup_exact(category, fuel, year) is _linear_exact(real_ghg_data, category, fuel, year)
+                assert index.lookup_closest(category, fuel, year) is _linear_closest(real_ghg_data, category, fuel, year)
+
+
+class TestTripUsesSharedIndex:
+    def test_trip_reuses_prebuilt_index(self, small_ghg_data):
+        index = GHGFactorIndex(small_ghg_data)
+        t1 = Trip("A", "B", "Riyadh", "Car", "Petrol", 2012, index, "key")
+        t2 = Trip("C", "D", "Jeddah", "Car", "Petrol", 2014, index, "key")
+        assert t1.ghg is index
+        assert t2.ghg is index
+
+    def test_trip_compiles_raw_data(self, small_ghg_data):
+        t = Trip("A", "B", "Riyadh", "Car", "Petrol", 2012, small_ghg_data, "key")
+        assert isinstance(t.ghg, GHGFactorIndex)
+        assert t.get_emissions_factors("Passenger Cars", "Petrol", 2012)["co2_factor"] == 3.0
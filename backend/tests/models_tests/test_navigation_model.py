@@ -1,5 +1,5 @@
 import pytest
-from backend.models.Navigation import Navigation
+from backend.models.Navigation import Navigation, Point
 
 
 
@@ -172,4 +172,284 @@ def test_update_location_before_init():
 
     # Expect failure because coords not initialized
     with pytest.raises(Exception):
-        nav.update_location(location, 0, 40)
\ No newline at end of file
+        nav.update_location(location, 0, 40)
+
+
+def _straight_route(n, start_lat=24.7000, step=0.0002):
+    return [{"latitude": start_lat + i * step, "longitude": 46.6753} for i in range(n)]
+
+
+def test_route_is_stored_in_arrays_with_point_views():
+    nav = Navigation()
+    route = _straight_route(500)
+    nav.init_route(route, "10 mins")
+
+    assert len(nav.coords) == 500
+    assert nav.coords[0] == Point(route[0]["latitude"], route[0]["longitude"])
+    assert nav.coords[-1] == nav.destination
+    assert [p.latitude for p in nav.coords[:3]] == [c["latitude"] for c in route[:3]]
+    assert nav.routeDistances[0] == 0.0
+    assert nav.routeDistances[-1] == pytest.approx(nav.totalRouteMeters)
+    # a view on the segment arrays, not a copy
+    assert nav.routeDistances.base is nav.routeSegments.cumulative
+    assert not hasattr(nav.coords[0], "__dict__")
+
+    assert "coords" not in nav.route_state()
+    restored = Navigation.from_state({**nav.route_state(), "coords": nav.route_coords_list()})
+    assert (restored.routeSegments.segments == nav.routeSegments.segments).all()
+    assert Navigation.from_state(nav.route_state(), segments=nav.routeSegments).routeSegments is nav.routeSegments
+
+
+def test_progress_snapping_uses_window_while_driving_forward():
+    nav = Navigation()
+    route = _straight_route(200)
+    nav.init_route(route, "10 mins")
+
+    for point in route[:150]:
+        result = nav.update_location(point, 0, 40)
+        assert result["snappedLocation"] == point
+
+    assert nav.globalSnaps == 1
+    assert nav.windowSnaps == 149
+    assert nav.lastSnappedIndex in (148, 149)
+
+
+def test_progress_snapping_does_not_jump_back_on_looping_route():
+    nav = Navigation()
+    outbound = _straight_route(20)
+    # return leg runs ~1 m beside the outbound leg
+    inbound = [{"latitude": p["latitude"], "longitude": p["longitude"] + 0.00001} for p in reversed(outbound)]
+    nav.init_route(outbound + inbound, "10 mins")
+
+    for point in outbound + inbound[:5]:
+        nav.update_location(point, 0, 40)
+
+    # GPS noise puts the driver exactly on the outbound vertex beside them
+    result = nav.update_location(outbound[14], 0, 40)
+
+    # still on the return leg (segments 20+), not the outbound one
+    assert nav.lastSnappedIndex >= 20
+    assert result["remainingKm"] < nav.totalRouteKm / 2
+
+
+def test_progress_snapping_falls_back_to_global_search_when_window_misses():
+    nav = Navigation()
+    route = _straight_route(500)
+    nav.init_route(route, "10 mins")
+
+    nav.update_location(route[0], 0, 40)
+    result = nav.update_location(route[400], 0, 40)
+
+    assert result["snappedLocation"] == route[400]
+    assert nav.globalSnaps == 2
+
+
+def test_progress_snapping_disabled_matches_global_search():
+    nav = Navigation(progressSnapping=False)
+    route = _straight_route(50)
+    nav.init_route(route, "10 mins")
+
+    for point in route[:10]:
+        nav.update_location(point, 0, 40)
+
+    assert nav.windowSnaps == 0
+    assert nav.globalSnaps == 10
+
+
+def test_init_route_resets_progress():
+    nav = Navigation()
+    route = _straight_route(50)
+    nav.init_route(route, "10 mins")
+    nav.update_location(route[30], 0, 40)
+
+    nav.init_route(route, "10 mins")
+
+    assert nav.lastSnappedIndex is None
+
+
+def test_snapping_projects_onto_segment_between_sparse_vertices():
+    nav = Navigation()
+    # two highway vertices ~11 km apart
+    route = [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.80, "longitude": 46.60}]
+    nav.init_route(route, "10 mins")
+
+    result = nav.update_location({"latitude": 24.75, "longitude": 46.6005}, 0, 80)
+
+    assert result["snappedLocation"]["latitude"] == pytest.approx(24.75, abs=1e-6)
+    assert result["snappedLocation"]["longitude"] == pytest.approx(46.60, abs=1e-9)
+    assert result["remainingKm"] == pytest.approx(nav.totalRouteKm / 2, rel=1e-3)
+
+
+def test_remaining_distance_is_continuous_along_a_segment():
+    nav = Navigation(progressSnapping=False)
+    route = [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.80, "longitude": 46.60}]
+    nav.init_route(route, "10 mins")
+
+    remaining = [
+        nav.update_location({"latitude": 24.70 + i * 0.01, "longitude": 46.60}, 0, 80)["remainingKm"]
+        for i in range(11)
+    ]
+
+    assert remaining == sorted(remaining, reverse=True)
+    assert len(set(round(r, 3) for r in remaining)) == 11
+    assert remaining[-1] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_single_point_route_snaps_to_that_point():
+    nav = Navigation()
+    nav.init_route([{"latitude": 24.7, "longitude": 46.6}], "1 min")
+
+    result = nav.update_location({"latitude": 24.71, "longitude": 46.61}, 0, 30)
+
+    assert result["snappedLocation"] == {"latitude": 24.7, "longitude": 46.6}
+    assert result["remainingKm"] == 0
+
+
+def _beside(point, meters):
+    # ~meters east of point at Riyadh's latitude
+    return {"latitude": point["latitude"], "longitude": point["longitude"] + meters / 101000}
+
+
+def test_off_route_needs_consecutive_far_pings():
+    nav = Navigation()
+    route = _straight_route(50)
+    nav.init_route(route, "10 mins")
+
+    results = [nav.update_location(_beside(route[i], 150), 0, 40) for i in range(1, 4)]
+
+    assert [r["offRoute"] for r in results] == [False, False, True]
+    assert results[-1]["offRouteMeters"] == pytest.approx(150, rel=0.05)
+
+
+def test_single_far_ping_does_not_trigger_off_route():
+    nav = Navigation()
+    route = _straight_route(50)
+    nav.init_route(route, "10 mins")
+
+    nav.update_location(_beside(route[1], 150), 0, 40)
+    nav.update_location(_beside(route[2], 150), 0, 40)
+    nav.update_location(route[3], 0, 40)
+    result = nav.update_location(_beside(route[4], 150), 0, 40)
+
+    assert result["offRoute"] is False
+    assert nav.offRoutePings == 1
+
+
+def test_off_route_hysteresis_between_thresholds():
+    nav = Navigation()
+    route = _straight_route(50)
+    nav.init_route(route, "10 mins")
+
+    for i in range(1, 4):
+        nav.update_location(_beside(route[i], 150), 0, 40)
+
+    # between ON_ROUTE_METERS and OFF_ROUTE_METERS: still off-route
+    assert nav.update_location(_beside(route[5], 45), 0, 40)["offRoute"] is True
+    # back within ON_ROUTE_METERS: on route again
+    assert nav.update_location(_beside(route[6], 10), 0, 40)["offRoute"] is False
+
+
+def test_reroute_swaps_route_and_clears_off_route_state():
+    nav = Navigation()
+    route = _straight_route(50)
+    nav.init_route(route, "10 mins")
+    for i in range(1, 4):
+        nav.update_location(_beside(route[i], 150), 0, 40)
+
+    detour = [_beside(route[3], 150), _beside(route[30], 150), route[49]]
+    nav.reroute(detour, "4 mins")
+
+    assert nav.offRoute is False
+    assert nav.reroutes == 1
+    assert nav.baseDurationMinutes == 4
+    result = nav.update_location(_beside(route[10], 150), 0, 40)
+    assert result["offRoute"] is False
+    assert result["offRouteMeters"] < 5
+
+
+def _drive(nav, lat, seconds, speed_kmh, start_time, interval=2.0, lng=46.6753):
+    """Ping every interval seconds while moving north at speed_kmh; returns (lat, time, results)."""
+    results = []
+    step = speed_kmh / 3.6 * interval / 111195.0
+    t = start_time
+    for _ in range(int(seconds / interval)):
+        lat += step
+        t += interval
+        results.append(nav.update_location({"latitude": lat, "longitude": lng}, 0, speed_kmh, timestamp=t))
+    return lat, t, results
+
+
+def test_smoothed_speed_converges_to_progress_speed():
+    nav = Navigation()
+    nav.init_route(_straight_route(1000), "30 mins")
+
+    _, _, results = _drive(nav, 24.7, 1200, 60, start_time=1000.0)
+
+    assert nav.smoothedSpeedKmh == pytest.approx(60, rel=0.03)
+    assert results[-1]["smoothedSpeedKmh"] == pytest.approx(60, rel=0.03)
+
+
+def test_eta_stays_stable_through_a_traffic_light():
+    nav = Navigation()
+    nav.init_route(_straight_route(1000), "30 mins")
+    lat, t, results = _drive(nav, 24.7, 600, 60, start_time=1000.0)
+    before = results[-1]["etaMinutes"]
+
+    # 40 s at a red light: instantaneous speed drops to 0
+    _, _, stopped = _drive(nav, lat, 40, 0, start_time=t)
+    swing = max(abs(r["etaMinutes"] - before) for r in stopped)
+
+    # what the instantaneous-speed ETA did: 60 km/h, then the base speed at 0 km/h
+    remaining = stopped[-1]["remainingKm"]
+    instantaneous_swing = abs(
+        Navigation.compute_eta(remaining, 0, nav.baseAvgSpeedKmh)
+        - Navigation.compute_eta(remaining, 60, nav.baseAvgSpeedKmh)
+    )
+
+    assert swing <= 2
+    assert swing < instantaneous_swing
+
+
+def test_speed_model_keeps_constant_state():
+    nav = Navigation()
+    nav.init_route(_straight_route(1000), "30 mins")
+    _drive(nav, 24.7, 10, 50, start_time=0.0)
+    fields = dict(vars(nav))
+
+    _drive(nav, 24.71, 1000, 50, start_time=100.0)
+
+    assert vars(nav).keys() == fields.keys()
+    assert not any(isinstance(value, list) for value in vars(nav).values())
+
+
+def test_ewma_alpha_is_consistent_across_ping_intervals():
+    one = Navigation.ewma_alpha(1.0)
+    two = Navigation.ewma_alpha(2.0)
+
+    # two 1 s samples of the same speed weigh the same as one 2 s sample
+    assert 1 - (1 - one) ** 2 == pytest.approx(two)
+
+
+def test_fast_pings_are_folded_into_the_next_sample():
+    nav = Navigation()
+    nav.init_route(_straight_route(1000), "30 mins")
+    nav.update_location({"latitude": 24.7, "longitude": 46.6753}, 0, 0, timestamp=100.0)
+    seeded = nav.smoothedSpeedKmh
+
+    nav.update_location({"latitude": 24.7001, "longitude": 46.6753}, 0, 0, timestamp=100.1)
+
+    assert nav.smoothedSpeedKmh == seeded
+    assert nav.lastProgressTime == 100.0
+
+
+def test_reroute_keeps_smoothed_speed():
+    nav = Navigation()
+    route = _straight_route(1000)
+    nav.init_route(route, "30 mins")
+    _drive(nav, 24.7, 300, 70, start_time=0.0)
+    smoothed = nav.smoothedSpeedKmh
+
+    nav.reroute(route[500:], "10 mins")
+
+    assert nav.smoothedSpeedKmh == smoothed
+    assert nav.lastProgressTime is None
@@ -0,0 +1,100 @@
+import random
+import numpy as np
+import pytest
+from models.Navigation import Point
+from models.route_index import RouteSegmentIndex
+from models.route_segments import RouteSegments
+
+
+def _random_route(n, seed, step=0.0005):
+    rng = random.Random(seed)
+    lat, lng = 24.7136, 46.6753
+    points = []
+    for _ in range(n):
+        lat += rng.uniform(-step, step)
+        lng += rng.uniform(-step, step)
+        points.append(Point(lat, lng))
+    return points
+
+
+def _full_scan(segments, latitude, longitude):
+    px, py = segments.project(latitude, longitude)
+    rx = px - segments.ax
+    ry = py - segments.ay
+    t = np.clip((rx * segments.dx + ry * segments.dy) * segments.inv_length2, 0.0, 1.0)
+    ex = rx - t * segments.dx
+    ey = ry - t * segments.dy
+    dist2 = ex * ex + ey * ey
+    k = int(np.argmin(dist2))
+    return k, float(t[k]), float(np.sqrt(dist2[k]))
+
+
+@pytest.mark.parametrize("n, seed", [(2, 1), (50, 2), (2000, 3), (5000, 4)])
+def test_matches_full_scan_near_route(n, seed):
+    coords = _random_route(n, seed)
+    segments = RouteSegments(coords)
+    index = RouteSegmentIndex(segments)
+    rng = random.Random(seed + 100)
+
+    for _ in range(200):
+        base = coords[rng.randrange(n)]
+        lat = base.latitude + rng.uniform(-0.003, 0.003)
+        lng = base.longitude + rng.uniform(-0.003, 0.003)
+        assert index.nearest(*segments.project(lat, lng)) == _full_scan(segments, lat, lng)
+
+
+def test_matches_full_scan_off_route_and_far_away():
+    segments = RouteSegments(_random_route(3000, 7))
+    index = RouteSegmentIndex(segments)
+    rng = random.Random(8)
+
+    queries = [(24.7136 + rng.uniform(-0.5, 0.5), 46.6753 + rng.uniform(-0.5, 0.5)) for _ in range(100)]
+    queries += [(21.5, 39.2), (26.4, 50.1), (0.0, 0.0)]
+
+    for lat, lng in queries:
+        assert index.nearest(*segments.project(lat, lng)) == _full_scan(segments, lat, lng)
+
+
+def test_long_segments_grow_the_cells_instead_of_the_registrations():
+    # a dense city stretch followed by a few 20 km highway legs
+    coords = _random_route(1000, 5, step=0.0001)
+    last = coords[-1]
+    coords += [Point(last.latitude + 0.18 * k, last.longitude + 0.18 * k) for k in range(1, 6)]
+    segments = RouteSegments(coords)
+    index = RouteSegmentIndex(segments)
+
+    assert len(index.members) <= RouteSegmentIndex.REGISTRATIONS_PER_SEGMENT * segments.count
+    for k in range(0, len(coords), 37):
+        lat, lng = coords[k].latitude + 0.0002, coords[k].longitude - 0.0003
+        assert index.nearest(*segments.project(lat, lng)) == _full_scan(segments, lat, lng)
+
+
+def test_route_that_loops_back_on_itself_picks_the_lowest_segment():
+    out_and_back = _random_route(500, 9, step=0.0002)
+    segments = RouteSegments(out_and_back + list(reversed(out_and_back)))
+    index = RouteSegmentIndex(segments)
+
+    for p in out_and_back[1::25]:
+        idx, t, dist = index.nearest(*segments.project(p.latitude, p.longitude))
+        assert (idx, t, dist) == _full_scan(segments, p.latitude, p.longitude)
+        assert idx < 499 and dist == 0.0
+
+
+def test_whole_route_nearest_uses_the_index_only_on_long_routes():
+    short = RouteSegments(_random_route(100, 10))
+    long = RouteSegments(_random_route(RouteSegments.INDEX_MIN_SEGMENTS + 100, 11))
+
+    short.nearest(24.7136, 46.6753)
+    long.nearest(24.7136, 46.6753, 0, long.count - 1)
+    assert short._index is None and long._index is None
+
+    before = long.nbytes
+    assert long.nearest(24.7136, 46.6753) == _full_scan(long, 24.7136, 46.6753)
+    assert isinstance(long._index, RouteSegmentIndex)
+    assert long.nbytes == before + long._index.nbytes
+
+
+def test_index_works_on_frozen_segments():
+    segments = RouteSegments(_random_route(1000, 12)).freeze()
+
+    assert segments.nearest(24.72, 46.68) == _full_scan(segments, 24.72, 46.68)
@@ -0,0 +1,153 @@
+import random
+import pytest
+from models.Navigation import Navigation, Point
+from models.route_segments import RouteSegments, nearest_in_windows
+
+
+def _route(points):
+    return [Point(lat, lng) for lat, lng in points]
+
+
+def test_nearest_projects_onto_interior_of_segment():
+    coords = _route([(24.70, 46.60), (24.70, 46.70), (24.80, 46.70)])
+    segments = RouteSegments(coords)
+
+    idx, t, dist = segments.nearest(24.701, 46.65)
+
+    assert idx == 0
+    assert t == pytest.approx(0.5, abs=1e-3)
+    assert dist == pytest.approx(111.2, rel=0.01)
+    assert segments.point_at(idx, t)[0] == pytest.approx(24.70)
+
+
+def test_nearest_clamps_to_endpoints():
+    coords = _route([(24.70, 46.60), (24.70, 46.70)])
+    segments = RouteSegments(coords)
+
+    assert segments.nearest(24.70, 46.50)[:2] == (0, 0.0)
+    assert segments.nearest(24.70, 46.80)[:2] == (0, 1.0)
+
+
+def test_range_restricts_search():
+    coords = _route([(24.70, 46.60), (24.70, 46.70), (24.80, 46.70), (24.80, 46.60)])
+    segments = RouteSegments(coords)
+
+    assert segments.nearest(24.70, 46.65)[0] == 0
+    assert segments.nearest(24.70, 46.65, start=1)[0] in (1, 2)
+
+
+def test_matches_scalar_projection_on_random_routes():
+    rng = random.Random(5)
+    points = [(24.7 + rng.uniform(-0.05, 0.05), 46.6 + rng.uniform(-0.05, 0.05)) for _ in range(300)]
+    coords = _route(points)
+    segments = RouteSegments(coords)
+
+    for _ in range(50):
+        lat, lng = 24.7 + rng.uniform(-0.06, 0.06), 46.6 + rng.uniform(-0.06, 0.06)
+        px, py = segments.project(lat, lng)
+
+        best = None
+        for i in range(segments.count):
+            ax, ay = segments.project(coords[i].latitude, coords[i].longitude)
+            bx, by = segments.project(coords[i + 1].latitude, coords[i + 1].longitude)
+            dx, dy = bx - ax, by - ay
+            length2 = dx * dx + dy * dy
+            t = 0.0 if length2 == 0 else min(1.0, max(0.0, ((px - ax) * dx + (py - ay) * dy) / length2))
+            d = ((px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2) ** 0.5
+            if best is None or d < best[1] - 1e-9:
+                best = (i, d)
+
+        idx, _, dist = segments.nearest(lat, lng)
+        assert dist == pytest.approx(best[1], abs=1e-6)
+
+
+def test_distance_along_interpolates_cumulative_distances():
+    coords = _route([(24.70, 46.60), (24.80, 46.60), (24.80, 46.70)])
+    segments = RouteSegments(coords)
+    first_leg = segments.cumulative[1]
+
+    assert segments.distance_along(0, 0.0) == 0.0
+    assert segments.distance_along(0, 0.25) == pytest.approx(first_leg / 4)
+    assert segments.distance_along(1, 1.0) == pytest.approx(segments.total_meters)
+
+
+def test_projected_lengths_stay_within_documented_error_bound():
+    rng = random.Random(13)
+    for lat0, lng0 in [(24.71, 46.68), (21.54, 39.17), (26.42, 50.09), (31.5, 38.0)]:
+        points = [(lat0 + rng.uniform(-0.25, 0.25), lng0 + rng.uniform(-0.25, 0.25)) for _ in range(200)]
+        coords = _route(points)
+        segments = RouteSegments(coords)
+
+        haversine = sum(Navigation.haversine_meters(a, b) for a, b in zip(coords, coords[1:]))
+        bound = segments.projection.max_relative_error
+
+        assert bound < 0.003
+        assert abs(segments.total_meters - haversine) / haversine <= bound + 1e-6
+
+
+def test_empty_route_raises():
+    with pytest.raises(ValueError):
+        RouteSegments([])
+
+
+def test_nearest_in_windows_matches_nearest_per_query():
+    rng = random.Random(9)
+    routes = []
+    for _ in range(5):
+        points = [(24.7 + rng.uniform(-0.02, 0.02), 46.6 + rng.uniform(-0.02, 0.02)) for _ in range(60)]
+        routes.append(RouteSegments(_route(points)))
+
+    queries = []
+    for _ in range(40):
+        seg = rng.choice(routes)
+        start = rng.randrange(seg.count)
+        stop = min(seg.count, start + rng.randint(1, 25))
+        queries.append((seg, start, stop, 24.7 + rng.uniform(-0.02, 0.02), 46.6 + rng.uniform(-0.02, 0.02)))
+
+    batched = nearest_in_windows(queries)
+
+    for (seg, start, stop, lat, lng), result in zip(queries, batched):
+        assert result == seg.nearest(lat, lng, start, stop)
+
+
+def test_nearest_in_windows_empty_and_invalid():
+    coords = _route([(24.70, 46.60), (24.70, 46.70)])
+    segments = RouteSegments(coords)
+
+    assert nearest_in_windows([]) == []
+    with pytest.raises(ValueError):
+        nearest_in_windows([(segments, 1, 1, 24.7, 46.6)])
+
+
+def test_scalar_window_path_matches_vectorized_path():
+    rng = random.Random(21)
+    points = [(24.7 + rng.uniform(-0.01, 0.01), 46.6 + rng.uniform(-0.01, 0.01)) for _ in range(100)]
+    scalar = RouteSegments(_route(points))
+    vectorized = RouteSegments(_route(points))
+    vectorized.SCALAR_WINDOW = 0
+
+    for _ in range(50):
+        start = rng.randrange(90)
+        lat, lng = 24.7 + rng.uniform(-0.01, 0.01), 46.6 + rng.uniform(-0.01, 0.01)
+        assert scalar.nearest(lat, lng, start, start + 10) == vectorized.nearest(lat, lng, start, start + 10)
+
+
+def test_from_arrays_matches_point_construction():
+    rng = random.Random(9)
+    points = [(24.7 + rng.uniform(0, 0.05), 46.6 + rng.uniform(0, 0.05)) for _ in range(50)]
+
+    from_points = RouteSegments(_route(points))
+    from_arrays = RouteSegments.from_arrays([p[0] for p in points], [p[1] for p in points])
+
+    assert from_arrays.vertex_count == 50
+    assert (from_arrays.segments == from_points.segments).all()
+    assert (from_arrays.vertex_distances == from_points.vertex_distances).all()
+    assert from_arrays.vertex(49) == points[49]
+    assert from_arrays.nbytes == 50 * 64 - 40
+
+
+def test_single_vertex_keeps_one_vertex_distance():
+    segments = RouteSegments.from_arrays([24.7], [46.6])
+
+    assert segments.count == 1
+    assert segments.vertex_distances.tolist() == [0.0]
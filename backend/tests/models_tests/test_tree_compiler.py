@@ -0,0 +1,136 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from models.ai_models.recommendation_engine import GreenMileRecommendationEngine
+from models.ai_models.tree_compiler import (
+    CompiledForest,
+    compile_file,
+    compile_forest,
+    load_compiled,
+)
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 6))
+    y = 3 * X[:, 0] + X[:, 1] ** 2 + rng.normal(scale=0.3, size=600)
+    labels = np.where(y < 0, "Green", np.where(y < 3, "Yellow", "Red"))
+    return X, y, labels, rng.normal(size=(200, 6))
+
+
+@pytest.fixture(scope="module")
+def regressor(data):
+    X, y, _, _ = data
+    return RandomForestRegressor(n_estimators=15, random_state=0, n_jobs=1).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def classifier(data):
+    X, _, labels, _ = data
+    return RandomForestClassifier(n_estimators=15, min_samples_leaf=3, random_state=0, n_jobs=1).fit(X, labels)
+
+
+def test_regressor_matches_sklearn(regressor, data):
+    compiled = compile_forest(regressor)
+    X_test = data[3]
+
+    assert compiled.n_trees == 15
+    np.testing.assert_allclose(compiled.predict(X_test), regressor.predict(X_test), rtol=1e-12)
+
+
+def test_classifier_matches_sklearn(classifier, data):
+    compiled = compile_forest(classifier)
+    X_test = data[3]
+
+    assert list(compiled.classes_) == list(classifier.classes_)
+    np.testing.assert_allclose(compiled.predict_proba(X_test), classifier.predict_proba(X_test), rtol=1e-12)
+    assert (compiled.predict(X_test) == classifier.predict(X_test)).all()
+
+
+def test_single_tree_and_values_on_the_threshold(data):
+    X, y, _, _ = data
+    tree = DecisionTreeRegressor(max_depth=6, random_state=0).fit(X, y)
+    compiled = compile_forest(tree)
+
+    # rows sitting exactly on split thresholds go left, as in sklearn
+    internal = tree.tree_.children_left >= 0
+    X_edge = np.tile(X[:1], (internal.sum(), 1))
+    X_edge[np.arange(len(X_edge)), tree.tree_.feature[internal]] = tree.tree_.threshold[internal]
+
+    np.testing.assert_array_equal(compiled.predict(X_edge), tree.predict(X_edge))
+
+
+def test_save_and_memory_mapped_load(classifier, data, tmp_path):
+    compiled = compile_forest(classifier)
+    compiled.save(tmp_path / "classification_model")
+
+    loaded = CompiledForest.load(tmp_path / "classification_model")
+
+    assert isinstance(loaded.value, np.memmap)
+    assert loaded.nbytes == compiled.nbytes
+    np.testing.assert_array_equal(loaded.predict_proba(data[3]), compiled.predict_proba(data[3]))
+
+
+def test_load_compiled_skips_missing_and_stale_models(regressor, classifier, tmp_path):
+    source = tmp_path / "regression_model.pkl"
+    joblib.dump(regressor, source)
+    compile_file(source, tmp_path / "compiled", verify_rows=100)
+
+    assert load_compiled(tmp_path / "missing", source) is None
+    assert isinstance(load_compiled(tmp_path / "compiled", source), CompiledForest)
+
+    joblib.dump(classifier, source)  # retrained since compiling
+    assert load_compiled(tmp_path / "compiled", source) is None
+
+
+def test_rejects_unsupported_models_and_bad_input(regressor, data):
+    X, y, _, _ = data
+    with pytest.raises(TypeError):
+        compile_forest(GradientBoostingRegressor(n_estimators=3).fit(X, y))
+
+    compiled = compile_forest(regressor)
+    with pytest.raises(ValueError):
+        compiled.predict(X[:, :3])
+    with pytest.raises(ValueError):
+        compiled.predict(np.full((1, 6), np.nan))
+    with pytest.raises(AttributeError):
+        compiled.predict_proba(X)
+
+
+def test_engine_uses_compiled_models(tmp_path):
+    columns = [
+        "Distance_km", "Speed", "TrafficIndexLive", "JamsCount",
+        "Hour", "DayOfWeek", "Month", "IsWeekend", "IsPeakHour",
+        "Temperature", "Humidity", "Wind Speed",
+        "Vehicle Type_encoded", "Fuel Type_encoded",
+        "Road Type_encoded", "Traffic Conditions_encoded", "City_encoded",
+    ]
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.uniform(0, 50, size=(300, len(columns))), columns=columns)
+    y = X["Distance_km"] * 0.2
+
+    paths = [tmp_path / name for name in (
+        "regression_model.pkl", "classification_model.pkl", "label_encoders.pkl", "category_thresholds.pkl",
+    )]
+    joblib.dump(RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y), paths[0])
+    joblib.dump(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, np.where(y < 5, "Green", "Red")), paths[1])
+    joblib.dump({}, paths[2])
+    joblib.dump({}, paths[3])
+    for path in paths[:2]:
+        compile_file(path, tmp_path / "compiled" / os.path.splitext(path.name)[0], verify_rows=100)
+
+    route = {"name": "A", "Distance_km": 30.0, "Speed": 60, "Fuel Type": "Diesel"}
+    sklearn_engine = GreenMileRecommendationEngine(*paths)
+    compiled_engine = GreenMileRecommendationEngine(*paths, compiled_models_dir=tmp_path / "compiled")
+
+    assert isinstance(compiled_engine.regression_model, CompiledForest)
+    assert isinstance(compiled_engine.classification_model, CompiledForest)
+    assert compiled_engine.class_labels == sklearn_engine.class_labels
+    assert compiled_engine.predict_single_route(route) == sklearn_engine.predict_single_route(route)
@@ -1,6 +1,7 @@
+import asyncio
+import httpx
 import pytest
-import requests
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from backend.models.Trip import Trip
 
 
@@ -101,7 +102,7 @@ class TestTripUnit:
 
 
 class TestTripIntegration:
-    @patch("backend.models.Trip.requests.post")
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
     def test_fetch_routes_from_google_success(self, mock_post, mock_ghg_data):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -119,24 +120,37 @@ class TestTripIntegration:
         mock_post.return_value = mock_response
 
         t = Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, mock_ghg_data, "fake_key")
-        result = t.fetch_routes_from_google()
+        result = asyncio.run(t.fetch_routes_from_google())
 
         assert mock_post.called
         assert "routes" in result
         assert len(result["routes"]) == 1
 
-    @patch("backend.models.Trip.requests.post")
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
     def test_fetch_routes_from_google_failure(self, mock_post, mock_ghg_data):
-        mock_post.side_effect = requests.exceptions.RequestException("Connection failed")
+        mock_post.side_effect = httpx.ConnectError("Connection failed")
 
         t = Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, mock_ghg_data, "fake_key")
-        result = t.fetch_routes_from_google()
+        result = asyncio.run(t.fetch_routes_from_google())
 
         assert "error" in result
         assert "Failed to contact Google Directions API" in result["error"]
         assert "Connection failed" in result["details"]
 
-    @patch("backend.models.Trip.requests.post")
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    def test_fetch_routes_from_google_invalid_json(self, mock_post, mock_ghg_data):
+        mock_response = Mock()
+        mock_response.raise_for_status = Mock()
+        mock_response.json.side_effect = ValueError("Expecting value: line 1 column 1")
+        mock_post.return_value = mock_response
+
+        t = Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, mock_ghg_data, "fake_key")
+        result = asyncio.run(t.get_routes())
+
+        assert "Failed to contact Google Directions API" in result["error"]
+        assert "Invalid JSON" in result["details"]
+
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
     def test_get_routes_complete_flow(self, mock_post, mock_ghg_data):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -166,7 +180,7 @@ class TestTripIntegration:
         mock_post.return_value = mock_response
 
         t = Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, mock_ghg_data, "key")
-        result = t.get_routes()
+        result = asyncio.run(t.get_routes())
 
         assert "routes" in result
         assert len(result["routes"]) == 3
@@ -189,7 +203,7 @@ class TestTripIntegration:
         assert result["routes"][0]["emissions"]["co2e"] < result["routes"][1]["emissions"]["co2e"]
         assert result["routes"][1]["emissions"]["co2e"] < result["routes"][2]["emissions"]["co2e"]
 
-    @patch("backend.models.Trip.requests.post")
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
     def test_get_routes_unsupported_fuel_type(self, mock_post, mock_ghg_data):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -207,12 +221,12 @@ class TestTripIntegration:
         mock_post.return_value = mock_response
 
         t = Trip("A", "B", "Riyadh", "Car", "CNG", 2020, mock_ghg_data, "key")
-        result = t.get_routes()
+        result = asyncio.run(t.get_routes())
 
         assert "error" in result
         assert "does not support fuel type" in result["error"]
 
-    @patch("backend.models.Trip.requests.post")
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
     def test_get_routes_returns_google_error_when_routes_missing(self, mock_post, mock_ghg_data):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -221,11 +235,11 @@ class TestTripIntegration:
         mock_post.return_value = mock_response
 
         t = Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, mock_ghg_data, "key")
-        result = t.get_routes()
+        result = asyncio.run(t.get_routes())
 
         assert result["error"] == "Google returned no routes"
 
-    @patch("backend.models.Trip.requests.post")
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
     def test_emission_calculation_accuracy(self, mock_post, mock_ghg_data):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -243,7 +257,7 @@ class TestTripIntegration:
         mock_post.return_value = mock_response
 
         t = Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, mock_ghg_data, "key")
-        result = t.get_routes()
+        result = asyncio.run(t.get_routes())
 
         route = result["routes"][0]
         emissions = route["emissions"]
@@ -1,7 +1,7 @@
 import pytest
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 import json
 
 
@@ -49,7 +49,7 @@ def test_root_endpoint(client):
 
 # Process Trip - Test the complete trip processing workflow end-to-end
 
-@patch('backend.models.Trip.requests.post')
+@patch('httpx.AsyncClient.post', new_callable=AsyncMock)
 def test_process_trip_success(mock_post, client):
     mock_response = Mock()
     mock_response.status_code = 200
@@ -92,7 +92,7 @@ def test_process_trip_success(mock_post, client):
 
 
 # Test resilience when external API fails
-@patch('backend.models.Trip.requests.post')
+@patch('httpx.AsyncClient.post', new_callable=AsyncMock)
 def test_process_trip_google_api_failure(mock_post, client):
     mock_post.side_effect = Exception("Connection timeout")
 
@@ -126,6 +126,24 @@ def test_navigation_init_route_success(client):
     assert response.status_code == 200
     assert "status" in response.json() or "route" in response.json()
 
+def test_navigation_init_route_by_route_hash(client):
+    coords = [{"latitude": 24.61, "longitude": 46.71}, {"latitude": 24.65, "longitude": 46.75}]
+    first = client.post("/navigation/init_route", json={
+        "session_id": "hash-driver-1", "coords": coords, "duration_text": "9 mins"
+    }).json()
+
+    second = client.post("/navigation/init_route", json={
+        "session_id": "hash-driver-2", "route_hash": first["route"]["route_hash"], "duration_text": "9 mins"
+    }).json()
+    unknown = client.post("/navigation/init_route", json={
+        "session_id": "hash-driver-3", "route_hash": "missing", "duration_text": "9 mins"
+    }).json()
+
+    assert second["status"] == "ok"
+    assert second["route"]["total_km"] == pytest.approx(first["route"]["total_km"])
+    assert unknown["status"] == "error"
+
+
 # Test error handling for invalid navigation data
 def test_navigation_init_route_empty_coords(client):
     payload = {
@@ -137,6 +155,124 @@ def test_navigation_init_route_empty_coords(client):
     assert response.status_code == 200
 
 
+# Navigation sessions - two drivers must not overwrite each other's route
+
+def test_navigation_sessions_are_isolated_per_driver(client):
+    client.post("/navigation/init_route", json={
+        "session_id": "api-driver-1",
+        "coords": [{"latitude": 24.80, "longitude": 46.60}, {"latitude": 24.90, "longitude": 46.60}],
+        "duration_text": "10 mins"
+    })
+    client.post("/navigation/init_route", json={
+        "session_id": "api-driver-2",
+        "coords": [{"latitude": 24.60, "longitude": 46.60}, {"latitude": 24.50, "longitude": 46.60}],
+        "duration_text": "10 mins"
+    })
+
+    response = client.post("/navigation/location_update", json={
+        "session_id": "api-driver-1",
+        "location": {"latitude": 24.81, "longitude": 46.60},
+        "heading": 0,
+        "speed_kmh": 40
+    })
+
+    assert response.json()["snappedLocation"]["latitude"] == pytest.approx(24.81)
+
+    ended = client.post("/navigation/end_session", json={"session_id": "api-driver-1"})
+    assert ended.json()["ended"] is True
+
+    stats = client.get("/navigation/stats").json()
+    assert "sessions" in stats
+
+
+def test_navigation_websocket_streams_snapped_updates(client):
+    route = [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.80, "longitude": 46.60}]
+
+    with client.websocket_connect("/navigation/ws/ws-api-driver") as ws:
+        ws.send_text(json.dumps({"type": "init", "coords": route, "duration_text": "10 mins"}))
+        assert ws.receive_json()["type"] == "route"
+
+        ws.send_text("[24.75, 46.6001, 0, 50]")
+        update = ws.receive_json()
+        assert update["lat"] == pytest.approx(24.75)
+        assert update["km"] > 0
+
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+
+        ws.send_text(json.dumps({"type": "end"}))
+        assert ws.receive_json() == {"type": "ended"}
+
+
+def test_navigation_trip_id_requires_an_allowed_user(client):
+    from backend.main import navigation_controller
+
+    def trip_routes(trip_id, user):
+        if user is None:
+            raise PermissionError("Sign in to navigate a saved trip")
+        return None
+
+    with patch.object(navigation_controller, "trip_routes", trip_routes):
+        response = client.post("/navigation/init_route", json={"session_id": "someone", "trip_id": 7})
+    assert response.status_code == 403
+
+    from starlette.websockets import WebSocketDisconnect
+
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/navigation/ws/someone?token=not-a-jwt") as ws:
+            ws.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_navigation_location_update_reroutes_off_route_driver(client):
+    from backend.main import rerouter
+
+    detour = {"coordinates": [[24.75, 46.61], [24.80, 46.60]], "duration": "6 mins", "distance_km": 5.6}
+    client.post("/navigation/init_route", json={
+        "session_id": "detour-driver",
+        "coords": [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.80, "longitude": 46.60}],
+        "duration_text": "10 mins"
+    })
+
+    with patch.object(rerouter, "fetch_route", AsyncMock(return_value=detour)) as fetch_route:
+        responses = [
+            client.post("/navigation/location_update", json={
+                "session_id": "detour-driver",
+                "location": {"latitude": lat, "longitude": 46.61},
+                "speed_kmh": 40
+            }).json()
+            for lat in (24.740, 24.745, 24.750)
+        ]
+
+    assert "reroute" not in responses[0]
+    assert responses[-1]["offRoute"] is True
+    assert responses[-1]["reroute"]["coordinates"] == detour["coordinates"]
+    assert fetch_route.await_count == 1
+
+
+def test_navigation_location_update_batch(client):
+    route = [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.80, "longitude": 46.60}]
+    for session_id in ("gw-1", "gw-2"):
+        client.post("/navigation/init_route", json={
+            "session_id": session_id, "coords": route, "duration_text": "10 mins"
+        })
+
+    response = client.post("/navigation/location_update/batch", json={"records": [
+        {"session_id": "gw-1", "location": {"latitude": 24.75, "longitude": 46.60}, "speed_kmh": 60, "timestamp": 1},
+        {"session_id": "gw-2", "location": {"latitude": 24.72, "longitude": 46.60}, "speed_kmh": 60, "timestamp": 1},
+        {"session_id": "gw-unknown", "location": {"latitude": 24.72, "longitude": 46.60}},
+    ]})
+
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["ok", "ok", "error"]
+    assert results[0]["remainingKm"] < results[1]["remainingKm"]
+
+
+def test_navigation_location_update_batch_rejects_empty(client):
+    response = client.post("/navigation/location_update/batch", json={"records": []})
+    assert response.status_code == 400
+
+
 # Navigation Update - Test real-time location tracking through API
 
 def test_navigation_location_update_success(client):
@@ -147,9 +283,10 @@ def test_navigation_location_update_success(client):
         ],
         "duration_text": "10 mins"
     }
-    client.post("/navigation/init_route", json=init_payload)
+    init = client.post("/navigation/init_route", json=init_payload).json()
 
     update_payload = {
+        "session_id": init["route"]["session_id"],
         "location": {"latitude": 24.7140, "longitude": 46.6755},
         "heading": 45.0,
         "speed_kmh": 50.0
@@ -160,10 +297,22 @@ def test_navigation_location_update_success(client):
     assert "snappedLocation" in response.json() or "remainingKm" in response.json()
 
 
+def test_navigation_location_update_requires_session_id(client):
+    response = client.post("/navigation/location_update", json={
+        "location": {"latitude": 24.7140, "longitude": 46.6755},
+        "heading": 0,
+        "speed_kmh": 50.0
+    })
+    assert "session_id" in response.json()["details"]
+
+    ended = client.post("/navigation/end_session", json={})
+    assert ended.status_code == 400
+
+
 
 # End-to-End Flow -Test complete user workflow from start to finish
 
-@patch('backend.models.Trip.requests.post')
+@patch('httpx.AsyncClient.post', new_callable=AsyncMock)
 def test_complete_trip_navigation_flow(mock_post, client):
     mock_response = Mock()
     mock_response.status_code = 200
@@ -518,6 +667,52 @@ def test_analyze_routes_ai_not_ready(client):
         ai_controller.is_ready = original
 
 
+def test_analyze_routes_runs_on_ai_executor(client):
+    """analyze_routes runs the comparison on the AI executor and reports its metrics."""
+    from backend.main import ai_controller
+    orig_ready = ai_controller.is_ready
+    orig_format = ai_controller.format_route_for_ai
+    orig_recommend = ai_controller.compare_and_recommend
+    ai_controller.is_ready = lambda: True
+    ai_controller.format_route_for_ai = lambda route, meta: {"formatted": True}
+    ai_controller.compare_and_recommend = lambda routes: {"best_route": "Route A"}
+    try:
+        before = ai_controller.executor.stats()["completed"]
+        response = client.post("/ai/analyze_routes", json={"routes": [{"summary": "Route A"}]})
+        assert response.status_code == 200
+
+        executor = client.get("/ai/health").json()["executor"]
+        assert executor["completed"] == before + 1
+        assert executor["execution"]["count"] >= 1
+    finally:
+        ai_controller.is_ready = orig_ready
+        ai_controller.format_route_for_ai = orig_format
+        ai_controller.compare_and_recommend = orig_recommend
+
+
+def test_analyze_routes_busy_returns_503(client):
+    """analyze_routes sheds load with 503 + Retry-After when the AI executor is full."""
+    from backend.main import ai_controller, ExecutorSaturated
+
+    async def saturated(routes):
+        raise ExecutorSaturated("Inference queue is full")
+
+    orig_ready = ai_controller.is_ready
+    orig_format = ai_controller.format_route_for_ai
+    ai_controller.is_ready = lambda: True
+    ai_controller.format_route_for_ai = lambda route, meta: {"formatted": True}
+    ai_controller.compare_and_recommend_async = saturated
+    try:
+        response = client.post("/ai/analyze_routes", json={"routes": [{"summary": "Route A"}]})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert "busy" in response.json()["detail"].lower()
+    finally:
+        ai_controller.is_ready = orig_ready
+        ai_controller.format_route_for_ai = orig_format
+        del ai_controller.compare_and_recommend_async
+
+
 @patch('backend.controllers.AIController.AIController.is_ready')
 def test_analyze_routes_empty_routes(mock_ready, client):
     """analyze_routes returns 400 when routes list is empty."""
@@ -715,4 +910,56 @@ def test_save_selected_trip_model_year_coerced_to_int(client):
             assert isinstance(captured["trip"].model_year, int)
             assert captured["trip"].model_year == 2022
     finally:
-        app.dependency_overrides.clear()
\ No newline at end of file
+        app.dependency_overrides.clear()
+
+# Batch trip planning - streamed NDJSON, one line per trip plus a save summary
+
+@patch('httpx.AsyncClient.post', new_callable=AsyncMock)
+def test_process_trips_batch_streams_ndjson(mock_post, client):
+    mock_response = Mock()
+    mock_response.json.return_value = {
+        "routes": [
+            {
+                "distanceMeters": 10000,
+                "duration": "600s",
+                "description": "Route via Main Street",
+                "polyline": {"encodedPolyline": "_p~iF~ps|U_ulLnnqC"}
+            }
+        ]
+    }
+    mock_response.raise_for_status = Mock()
+    mock_post.return_value = mock_response
+
+    trip = {
+        "destination": "Olaya Street",
+        "city": "Riyadh",
+        "vehicleType": "Car",
+        "fuelType": "Petrol",
+        "modelYear": 2020
+    }
+    payload = {
+        "trips": [
+            {**trip, "origin": "Batch Origin A"},
+            {**trip, "origin": "Batch Origin B"},
+            {**trip, "origin": ""},
+        ],
+        "concurrency": 2
+    }
+
+    response = client.post("/process_trips/batch", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    per_trip = {line["index"]: line for line in lines[:-1]}
+
+    assert per_trip[0]["status"] == "ok"
+    assert per_trip[1]["status"] == "ok"
+    assert per_trip[2]["status"] == "error"
+    assert lines[-1]["status"] == "saved"
+    assert lines[-1]["saved"] == 2
+
+
+def test_process_trips_batch_rejects_empty_list(client):
+    response = client.post("/process_trips/batch", json={"trips": []})
+    assert response.status_code == 400
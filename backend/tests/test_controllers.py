@@ -1,9 +1,12 @@
+import asyncio
+import queue
 import pytest
 import numpy as np
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
 from backend.controllers.TripController import TripController
 from backend.controllers.NavigationController import NavigationController
 from controllers.AIController import AIController
+from utils.reroute import Rerouter
 
 
 _AI_ENGINE_CLASS = "controllers.AIController.GreenMileRecommendationEngine"
@@ -41,6 +44,7 @@ def test_trip_controller_process_trip_success(mock_ghg_data, mock_db):
     with patch("backend.controllers.TripController.Trip") as MockTrip, \
          patch("backend.controllers.TripController.TripDB") as MockTripDB:
         mock_trip_instance = Mock()
+        mock_trip_instance.get_routes = AsyncMock()
         mock_trip_instance.get_routes.return_value = {
             "routes": [
                 {
@@ -67,7 +71,7 @@ def test_trip_controller_process_trip_success(mock_ghg_data, mock_db):
         mock_db_trip.selected_route_color = "green"
         MockTripDB.return_value = mock_db_trip
 
-        result = controller.process_trip(
+        result = asyncio.run(controller.process_trip(
             origin="LocationA",
             destination="LocationB",
             city="Riyadh",
@@ -75,7 +79,7 @@ def test_trip_controller_process_trip_success(mock_ghg_data, mock_db):
             fuelType="Petrol",
             modelYear=2020,
             db=mock_db
-        )
+        ))
 
         MockTrip.assert_called_once()
         mock_trip_instance.get_routes.assert_called_once()
@@ -95,10 +99,11 @@ def test_trip_controller_handles_model_exception(mock_ghg_data, mock_db):
 
     with patch("backend.controllers.TripController.Trip") as MockTrip:
         mock_trip_instance = Mock()
+        mock_trip_instance.get_routes = AsyncMock()
         mock_trip_instance.get_routes.side_effect = Exception("Model failure")
         MockTrip.return_value = mock_trip_instance
 
-        result = controller.process_trip(
+        result = asyncio.run(controller.process_trip(
             origin="A",
             destination="B",
             city="Riyadh",
@@ -106,7 +111,7 @@ def test_trip_controller_handles_model_exception(mock_ghg_data, mock_db):
             fuelType="Petrol",
             modelYear=2020,
             db=mock_db
-        )
+        ))
 
         assert "error" in result
         assert "Trip processing failed" in result["error"]
@@ -118,10 +123,11 @@ def test_trip_controller_passes_all_parameters(mock_ghg_data, mock_db):
 
     with patch("backend.controllers.TripController.Trip") as MockTrip:
         mock_trip_instance = Mock()
+        mock_trip_instance.get_routes = AsyncMock()
         mock_trip_instance.get_routes.return_value = {"error": "stop after constructor"}
         MockTrip.return_value = mock_trip_instance
 
-        controller.process_trip(
+        asyncio.run(controller.process_trip(
             origin="Point A",
             destination="Point B",
             city="Jeddah",
@@ -129,7 +135,7 @@ def test_trip_controller_passes_all_parameters(mock_ghg_data, mock_db):
             fuelType="Diesel",
             modelYear=2018,
             db=mock_db
-        )
+        ))
 
         MockTrip.assert_called_once_with(
             "Point A",
@@ -139,14 +145,16 @@ def test_trip_controller_passes_all_parameters(mock_ghg_data, mock_db):
             "Diesel",
             2018,
             mock_ghg_data,
-            "secret_key"
+            "secret_key",
+            route_cache=None,
+            routes_client=None
         )
 
 
 def test_navigation_controller_init_route():
     controller = NavigationController()
 
-    with patch.object(controller.nav, "init_route") as mock_init:
+    with patch.object(controller.sessions.get_or_create("driver-1"), "init_route") as mock_init:
         mock_init.return_value = {"status": "initialized"}
 
         coords = [
@@ -155,16 +163,17 @@ def test_navigation_controller_init_route():
         ]
         duration_text = "15 mins"
 
-        result = controller.init_route(coords, duration_text)
+        result = controller.init_route(coords, duration_text, session_id="driver-1")
 
         mock_init.assert_called_once_with(coords, duration_text)
         assert result["status"] == "initialized"
+        assert result["session_id"] == "driver-1"
 
 
 def test_navigation_controller_location_update():
     controller = NavigationController()
 
-    with patch.object(controller.nav, "update_location") as mock_update:
+    with patch.object(controller.sessions.get_or_create("driver-1"), "update_location") as mock_update:
         mock_update.return_value = {
             "snappedLocation": {"latitude": 24.7136, "longitude": 46.6753},
             "remainingKm": 5.2,
@@ -175,9 +184,9 @@ def test_navigation_controller_location_update():
         heading = 45.0
         speed_kmh = 60.0
 
-        result = controller.location_update(location, heading, speed_kmh)
+        result = controller.location_update(location, heading, speed_kmh, session_id="driver-1")
 
-        mock_update.assert_called_once_with(location, heading, speed_kmh)
+        mock_update.assert_called_once_with(location, heading, speed_kmh, None)
         assert "snappedLocation" in result
         assert result["remainingKm"] == 5.2
 
@@ -185,23 +194,23 @@ def test_navigation_controller_location_update():
 def test_navigation_controller_init_route_error():
     controller = NavigationController()
 
-    with patch.object(controller.nav, "init_route") as mock_init:
+    with patch.object(controller.sessions.get_or_create("driver-1"), "init_route") as mock_init:
         mock_init.side_effect = Exception("Invalid route data")
 
         with pytest.raises(Exception, match="Invalid route data"):
-            controller.init_route([], "10 mins")
+            controller.init_route([], "10 mins", session_id="driver-1")
 
 
 def test_navigation_controller_location_update_error():
     controller = NavigationController()
 
-    with patch.object(controller.nav, "update_location") as mock_update:
+    with patch.object(controller.sessions.get_or_create("driver-1"), "update_location") as mock_update:
         mock_update.side_effect = Exception("GPS signal lost")
 
         location = {"latitude": 24.7136, "longitude": 46.6753}
 
         with pytest.raises(Exception, match="GPS signal lost"):
-            controller.location_update(location, 0, 40)
+            controller.location_update(location, 0, 40, session_id="driver-1")
 
 
 def test_trip_controller_initialization(mock_ghg_data):
@@ -215,9 +224,29 @@ def test_trip_controller_initialization(mock_ghg_data):
 def test_navigation_controller_initialization():
     controller = NavigationController()
 
-    assert controller.nav is not None
-    assert hasattr(controller.nav, "init_route")
-    assert hasattr(controller.nav, "update_location")
+    nav = controller.sessions.get_or_create("driver-1")
+    assert nav is not None
+    assert hasattr(nav, "init_route")
+    assert hasattr(nav, "update_location")
+
+
+def test_navigation_controller_requires_or_issues_session_ids():
+    controller = NavigationController()
+    route = [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.80, "longitude": 46.60}]
+
+    first = controller.init_route(route, "10 mins")
+    second = controller.init_route(route, "10 mins")
+
+    assert first["session_id"] != second["session_id"]
+    assert len(controller.sessions) == 2
+
+    with pytest.raises(ValueError, match="session_id"):
+        controller.location_update({"latitude": 24.75, "longitude": 46.60}, 0, 40)
+
+    result = controller.location_update(
+        {"latitude": 24.75, "longitude": 46.60}, 0, 40, session_id=first["session_id"]
+    )
+    assert result["remainingKm"] > 0
 
 
 def test_trip_controller_returns_error_result_without_db_save(mock_ghg_data, mock_db):
@@ -227,12 +256,13 @@ def test_trip_controller_returns_error_result_without_db_save(mock_ghg_data, moc
         model_response = {"error": "Trip failed upstream"}
 
         mock_trip_instance = Mock()
+        mock_trip_instance.get_routes = AsyncMock()
         mock_trip_instance.get_routes.return_value = model_response
         MockTrip.return_value = mock_trip_instance
 
-        result = controller.process_trip(
+        result = asyncio.run(controller.process_trip(
             "A", "B", "Riyadh", "Car", "Petrol", 2020, db=mock_db
-        )
+        ))
 
         assert result == model_response
         mock_db.add.assert_not_called()
@@ -707,6 +737,66 @@ class TestAICompareAndRecommend:
         ai_controller.compare_and_recommend([two_routes[0]])
         ai_controller.engine.compare_routes.assert_called_once()
 
+    @pytest.mark.unit
+    def test_process_executor_reports_the_workers_prediction_caches(self, ai_controller, two_routes):
+        def worker(pid, hits, misses):
+            cache = {"size": misses, "hits": hits, "misses": misses, "evictions": 0,
+                     "expirations": 0, "invalidations": 0}
+            return {"pid": pid, "ready": True, "model_version": "v1", "compiled_models": True,
+                    "prediction_cache": cache}
+
+        ai_controller.executor = Mock(kind="process", max_workers=2)
+        ai_controller.executor.submit = AsyncMock(side_effect=[
+            ({"best": 1}, worker(101, 0, 2)),
+            ({"best": 2}, worker(102, 3, 1)),
+            ({"best": 3}, worker(101, 2, 2)),
+            ({"best": 4}, worker(103, 1, 1)),  # 102 was replaced
+        ])
+
+        assert asyncio.run(ai_controller.compare_and_recommend_async(two_routes)) == {"best": 1}
+        for _ in range(2):
+            asyncio.run(ai_controller.compare_and_recommend_async(two_routes))
+        cache = ai_controller.get_stats()["prediction_cache"]
+        assert cache["workers"] == 2
+        assert (cache["hits"], cache["misses"], cache["hit_rate"]) == (5, 3, 0.625)
+
+        asyncio.run(ai_controller.compare_and_recommend_async(two_routes))
+        cache = ai_controller.get_stats()["prediction_cache"]
+        assert (cache["workers"], cache["hits"], cache["misses"]) == (2, 3, 3)
+        ai_controller.engine.prediction_cache.stats.assert_not_called()
+
+    @pytest.mark.unit
+    def test_process_executor_leaves_the_models_to_the_workers(self):
+        def worker(pid, ready=True):
+            return {"pid": pid, "ready": ready, "model_version": f"v{pid}", "compiled_models": True,
+                    "prediction_cache": None}
+
+        executor = Mock(kind="process", max_workers=2)
+        statuses = queue.Queue()
+        with patch(_AI_ENGINE_CLASS) as engine_class:
+            ctrl = AIController(executor=executor, worker_statuses=statuses)
+        engine_class.assert_not_called()
+        assert ctrl.engine is None
+        assert ctrl.is_ready() is False
+        assert ctrl.get_stats()["model_version"] is None
+
+        # both probes answered by the same worker
+        executor.submit = AsyncMock(return_value=worker(7))
+        asyncio.run(ctrl.check_workers())
+        assert executor.submit.await_count == 2
+        assert ctrl.is_ready() is False
+
+        # the other one reports from its initializer
+        statuses.put(worker(8))
+        assert ctrl.is_ready() is True
+        assert ctrl.get_stats()["model_version"] == "v8"
+
+        ctrl.reload_models()
+        executor.restart.assert_called_once()
+        statuses.put(worker(9, ready=False))
+        assert ctrl.is_ready() is False
+        assert ctrl.get_stats()["prediction_cache"]["workers"] == 0
+
 
 def _make_label_encoder(classes):
     enc = MagicMock()
@@ -716,12 +806,13 @@ def _make_label_encoder(classes):
 
 @pytest.fixture
 def integrated_ai_controller():
+    # one output row per feature row, like the real models
     reg_model = MagicMock()
-    reg_model.predict = MagicMock(return_value=np.array([5.0]))
+    reg_model.predict = MagicMock(side_effect=lambda X: np.full(len(X), 5.0))
 
     clf_model = MagicMock()
-    clf_model.predict = MagicMock(return_value=np.array(["Green"]))
-    clf_model.predict_proba = MagicMock(return_value=np.array([[0.8, 0.15, 0.05]]))
+    clf_model.predict = MagicMock(side_effect=lambda X: np.array(["Green"] * len(X)))
+    clf_model.predict_proba = MagicMock(side_effect=lambda X: np.tile([0.8, 0.15, 0.05], (len(X), 1)))
     clf_model.classes_ = np.array(["Green", "Yellow", "Red"])
 
     label_encoders = {
@@ -808,13 +899,7 @@ class TestAIIntegration:
 
     @pytest.mark.integration
     def test_compare_savings_non_negative(self, integrated_ai_controller, int_trip_metadata):
-        call_count = [0]
-
-        def vary(features):
-            call_count[0] += 1
-            return np.array([5.0]) if call_count[0] == 1 else np.array([10.0])
-
-        integrated_ai_controller._reg_model.predict = vary
+        integrated_ai_controller._reg_model.predict = lambda features: np.array([5.0, 10.0])
 
         fmt_a = integrated_ai_controller.format_route_for_ai(
             {"summary": "Highway 40", "distance": "30 km", "duration": "20 mins"},
@@ -847,4 +932,508 @@ class TestAIIntegration:
 
         result = integrated_ai_controller.predict_single_route(formatted)
         assert "predicted_co2e_kg" in result
-        assert result["predicted_co2e_kg"] >= 0
\ No newline at end of file
+        assert result["predicted_co2e_kg"] >= 0
+
+def test_trip_controller_coalesces_identical_concurrent_trips(mock_ghg_data):
+    controller = TripController(api_key="key", ghg_data=mock_ghg_data)
+    routes_result = {
+        "routes": [{
+            "summary": "Route A",
+            "distance_km": 10.0,
+            "duration_min": 15,
+            "coordinates": [[46.6753, 24.7136]],
+            "emissions": {"co2": 1.8, "ch4": 0.001, "n2o": 0.001, "co2e": 2.5},
+            "color": "green",
+        }]
+    }
+    upstream_calls = []
+
+    async def slow_get_routes():
+        upstream_calls.append(1)
+        await asyncio.sleep(0.02)
+        return routes_result
+
+    with patch("backend.controllers.TripController.Trip") as MockTrip, \
+         patch("backend.controllers.TripController.TripDB") as MockTripDB:
+        MockTrip.return_value.get_routes = slow_get_routes
+        MockTripDB.side_effect = lambda **kwargs: Mock(id=len(upstream_calls), selected_route_color="green")
+        dbs = [Mock() for _ in range(5)]
+
+        async def burst():
+            return await asyncio.gather(*(
+                controller.process_trip(" Depot ", "Mall", "riyadh", "Car", "Petrol", 2020, db=db)
+                for db in dbs
+            ))
+
+        results = asyncio.run(burst())
+
+    assert len(upstream_calls) == 1
+    for db, result in zip(dbs, results):
+        db.add.assert_called_once()
+        db.commit.assert_called_once()
+        assert result["routes"] == routes_result["routes"]
+
+    stats = controller.get_stats()["singleflight"]
+    assert stats["executions"] == 1
+    assert stats["upstream_calls_saved"] == 4
+
+
+def test_trip_controller_does_not_coalesce_different_vehicles(mock_ghg_data):
+    controller = TripController(api_key="key", ghg_data=mock_ghg_data)
+
+    car_key = controller.make_trip_key("A", "B", "Riyadh", "Car", "Petrol", 2020)
+    same_key = controller.make_trip_key(" a ", "B", "RIYADH", "Car", "Petrol", "2020")
+    van_key = controller.make_trip_key("A", "B", "Riyadh", "Van", "Petrol", 2020)
+
+    assert car_key == same_key
+    assert car_key != van_key
+
+
+def _collect(agen):
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+
+def _batch_trip(origin, **overrides):
+    trip = {
+        "origin": origin,
+        "destination": "Mall",
+        "city": "Riyadh",
+        "vehicleType": "Car",
+        "fuelType": "Petrol",
+        "modelYear": 2020,
+    }
+    trip.update(overrides)
+    return trip
+
+
+def test_trip_controller_batch_streams_results_and_bulk_inserts(mock_ghg_data):
+    controller = TripController(api_key="key", ghg_data=mock_ghg_data)
+    routes_result = {"routes": [{"summary": "A", "distance_km": 10.0, "duration_min": 15,
+                                 "coordinates": [], "emissions": {"co2": 1.8, "ch4": 0.001,
+                                 "n2o": 0.001, "co2e": 2.5}, "color": "green"}]}
+    state = {"active": 0, "peak": 0}
+
+    def make_trip(origin, *args, **kwargs):
+        async def get_routes():
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            if origin == "Broken":
+                return {"error": "Failed to contact Google Directions API"}
+            return routes_result
+        return Mock(get_routes=get_routes)
+
+    trips = [_batch_trip(f"Depot {i}") for i in range(6)]
+    trips.append(_batch_trip("Broken"))
+    trips.append(_batch_trip("Depot X", city=None))
+
+    db = Mock()
+    db.add_all.side_effect = lambda rows: [setattr(row, "id", 100 + n) for n, row in enumerate(rows)]
+
+    with patch("backend.controllers.TripController.Trip", side_effect=make_trip), \
+         patch("backend.controllers.TripController.TripDB", side_effect=lambda **kwargs: Mock()):
+        items = _collect(controller.process_trips_batch(trips, db, concurrency=2))
+
+    per_trip, summary = items[:-1], items[-1]
+
+    assert sorted(item["index"] for item in per_trip) == list(range(8))
+    assert [item["status"] for item in per_trip].count("ok") == 6
+    errors = {item["index"]: item for item in per_trip if item["status"] == "error"}
+    assert set(errors) == {6, 7}
+    assert "city" in errors[7]["details"]
+
+    assert state["peak"] == 2
+    db.add_all.assert_called_once()
+    db.commit.assert_called_once()
+    db.add.assert_not_called()
+
+    assert summary["status"] == "saved"
+    assert summary["saved"] == 6
+    assert summary["failed"] == 2
+    assert sorted(summary["trip_ids"]) == list(range(6))
+
+
+def test_trip_controller_batch_cancels_pending_trips_when_consumer_stops(mock_ghg_data):
+    controller = TripController(api_key="key", ghg_data=mock_ghg_data)
+    routes_result = {"routes": []}
+    state = {"started": 0, "cancelled": 0}
+
+    def make_trip(origin, *args, **kwargs):
+        async def get_routes():
+            state["started"] += 1
+            try:
+                await asyncio.sleep(0 if origin == "Depot 0" else 10)
+            except asyncio.CancelledError:
+                state["cancelled"] += 1
+                raise
+            return routes_result
+        return Mock(get_routes=get_routes)
+
+    async def first_then_disconnect():
+        items = controller.process_trips_batch([_batch_trip(f"Depot {i}") for i in range(50)], Mock(), concurrency=3)
+        first = await items.__anext__()
+        await items.aclose()
+        return first
+
+    with patch("backend.controllers.TripController.Trip", side_effect=make_trip):
+        first = asyncio.run(first_then_disconnect())
+
+    assert first["index"] == 0
+    # a 3-wide window (plus the replacement for the finished trip), never all 50
+    assert state["started"] <= 4
+    assert state["cancelled"] == state["started"] - 1
+
+
+def test_trip_controller_batch_reports_save_failure(mock_ghg_data):
+    controller = TripController(api_key="key", ghg_data=mock_ghg_data)
+    routes_result = {"routes": [{"summary": "A", "distance_km": 1.0, "duration_min": 1,
+                                 "coordinates": [], "emissions": {"co2": 1.8, "ch4": 0.001,
+                                 "n2o": 0.001, "co2e": 2.5}, "color": "green"}]}
+
+    db = Mock()
+    db.commit.side_effect = Exception("disk full")
+
+    with patch("backend.controllers.TripController.Trip") as MockTrip, \
+         patch("backend.controllers.TripController.TripDB", side_effect=lambda **kwargs: Mock()):
+        MockTrip.return_value.get_routes = AsyncMock(return_value=routes_result)
+        items = _collect(controller.process_trips_batch([_batch_trip("A")], db))
+
+    assert items[0]["status"] == "ok"
+    assert items[-1] == {"status": "error", "error": "Batch save failed", "details": "disk full"}
+    db.rollback.assert_called_once()
+
+
+def test_navigation_controller_keeps_one_route_per_session():
+    controller = NavigationController()
+    north = [{"latitude": 24.80, "longitude": 46.60}, {"latitude": 24.90, "longitude": 46.60}]
+    south = [{"latitude": 24.60, "longitude": 46.60}, {"latitude": 24.50, "longitude": 46.60}]
+
+    controller.init_route(north, "10 mins", session_id="driver-1")
+    controller.init_route(south, "10 mins", session_id="driver-2")
+
+    result = controller.location_update(
+        {"latitude": 24.81, "longitude": 46.60}, 0, 40, session_id="driver-1"
+    )
+
+    # projected onto driver-1's northern route, not driver-2's southern one
+    assert result["snappedLocation"]["latitude"] == pytest.approx(24.81)
+    assert controller.get_stats()["sessions"]["active"] == 2
+
+
+def test_navigation_controller_unknown_session_raises():
+    controller = NavigationController()
+
+    with pytest.raises(ValueError, match="No active route"):
+        controller.location_update({"latitude": 24.7, "longitude": 46.6}, 0, 40, session_id="ghost")
+
+
+def test_navigation_controller_end_session():
+    controller = NavigationController()
+    controller.init_route([{"latitude": 24.7, "longitude": 46.6}], "5 mins", session_id="d")
+
+    assert controller.end_session("d") is True
+    assert controller.sessions.get("d") is None
+
+
+def test_navigation_channel_handles_init_location_and_end_frames():
+    controller = NavigationController()
+    channel = controller.open_channel("ws-driver")
+    route = [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.80, "longitude": 46.60}]
+
+    assert channel.handle_frame({"type": "init", "coords": route, "duration_text": "10 mins"})["type"] == "route"
+
+    compact = channel.handle_frame([24.75, 46.6001, 90, 60])
+    verbose = channel.handle_frame({"lat": 24.75, "lng": 46.6001, "h": 90, "spd": 60})
+
+    assert compact == verbose
+    assert compact["lat"] == pytest.approx(24.75)
+    assert compact["km"] == pytest.approx(5.56, abs=0.01)
+    assert compact["spd"] == 60.0
+
+    assert channel.handle_frame({"type": "end"}) == {"type": "ended"}
+    assert controller.sessions.get("ws-driver") is None
+
+
+def test_navigation_channel_rejects_location_before_route():
+    channel = NavigationController().open_channel("nobody")
+
+    with pytest.raises(ValueError, match="No active route"):
+        channel.handle_frame([24.7, 46.6])
+    with pytest.raises(ValueError):
+        channel.handle_frame([24.7])
+
+
+def _straight(lat0, n=100, step=0.0005):
+    return [{"latitude": lat0 + i * step, "longitude": 46.60} for i in range(n)]
+
+
+def test_navigation_batch_matches_sequential_updates():
+    batch = NavigationController()
+    sequential = NavigationController()
+    routes = {f"truck-{k}": _straight(24.60 + k * 0.1) for k in range(4)}
+    for controller in (batch, sequential):
+        for session_id, route in routes.items():
+            controller.init_route(route, "20 mins", session_id=session_id)
+
+    records = []
+    for step in range(5):
+        for session_id, route in routes.items():
+            p = route[step * 7]
+            records.append({
+                "session_id": session_id,
+                "location": {"latitude": p["latitude"] + 0.00001, "longitude": p["longitude"] + 0.00002},
+                "heading": 10,
+                "speed_kmh": 50,
+                "timestamp": 1000 + step,
+            })
+
+    # gateway delivers them shuffled
+    shuffled = list(reversed(records))
+    results = batch.location_update_batch(shuffled)
+
+    expected = {}
+    for record in records:
+        expected[(record["session_id"], record["timestamp"])] = sequential.location_update(
+            record["location"], 10, 50, session_id=record["session_id"], timestamp=record["timestamp"]
+        )
+
+    for record, result in zip(shuffled, results):
+        assert result["status"] == "ok"
+        want = expected[(record["session_id"], record["timestamp"])]
+        assert result["snappedLocation"] == pytest.approx(want["snappedLocation"])
+        assert result["remainingKm"] == pytest.approx(want["remainingKm"])
+        assert result["etaMinutes"] == want["etaMinutes"]
+
+    nav = batch.sessions.get("truck-0")
+    assert nav.lastFixTimestamp == 1004
+    assert nav.windowSnaps == 4
+    assert sequential.sessions.get("truck-0").lastFixTimestamp == 1004
+
+
+def test_navigation_batch_reports_per_record_errors_and_stale_fixes():
+    controller = NavigationController()
+    controller.init_route(_straight(24.60), "20 mins", session_id="truck")
+    fix = {"latitude": 24.60, "longitude": 46.60}
+
+    results = controller.location_update_batch([
+        {"session_id": "truck", "location": fix, "timestamp": 10},
+        {"session_id": "ghost", "location": fix, "timestamp": 10},
+        {"location": fix},
+        {"session_id": "truck", "timestamp": 11},
+    ])
+
+    assert results[0]["status"] == "ok"
+    assert "No active route" in results[1]["error"]
+    assert results[2] == {"status": "error", "error": "Missing session_id"}
+    assert results[3]["status"] == "error"
+
+    stale = controller.location_update_batch([{"session_id": "truck", "location": fix, "timestamp": 5}])
+    assert stale == [{"session_id": "truck", "status": "stale"}]
+
+
+def test_single_and_channel_fixes_advance_the_last_fix_timestamp():
+    controller = NavigationController()
+    controller.init_route(_straight(24.60), "20 mins", session_id="truck")
+    fix = {"latitude": 24.60, "longitude": 46.60}
+
+    controller.location_update(fix, 0, 40, session_id="truck", timestamp=20)
+    assert controller.sessions.get("truck").lastFixTimestamp == 20
+
+    controller.open_channel("truck").handle_frame([24.60, 46.60, 0, 40, 30])
+    assert controller.sessions.get("truck").lastFixTimestamp == 30
+
+    # a fix without a time keeps the last one
+    controller.location_update(fix, 0, 40, session_id="truck")
+    assert controller.sessions.get("truck").lastFixTimestamp == 30
+
+    stale = controller.location_update_batch([{"session_id": "truck", "location": fix, "timestamp": 25}])
+    assert stale == [{"session_id": "truck", "status": "stale"}]
+
+
+def _off_route_controller(fetched_route):
+    calls = []
+
+    async def fetch_route(origin, destination):
+        calls.append((origin, destination))
+        return fetched_route
+
+    return NavigationController(rerouter=Rerouter(fetch_route)), calls
+
+
+def test_navigation_controller_reroutes_off_route_driver():
+    detour = {"coordinates": [[24.75, 46.61], [24.80, 46.61], [24.90, 46.60]],
+              "duration": "9 mins", "distance_km": 16.7}
+    controller, calls = _off_route_controller(detour)
+    controller.init_route(
+        [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.90, "longitude": 46.60}],
+        "20 mins", session_id="d",
+    )
+
+    for lat in (24.74, 24.745, 24.75):
+        result = controller.location_update({"latitude": lat, "longitude": 46.61}, 0, 40, session_id="d")
+    assert result["offRoute"] is True
+
+    route = asyncio.run(controller.reroute("d"))
+
+    assert route["coordinates"] == detour["coordinates"]
+    assert route["base_duration"] == 9
+    assert calls[0] == ({"latitude": 24.75, "longitude": 46.61}, {"latitude": 24.90, "longitude": 46.60})
+
+    result = controller.location_update({"latitude": 24.76, "longitude": 46.61}, 0, 40, session_id="d")
+    assert result["offRoute"] is False
+    assert controller.sessions.get("d").reroutes == 1
+
+
+def test_navigation_channel_end_frame_clears_reroute_back_off():
+    async def fetch_route(origin, destination):
+        raise RuntimeError("routes API down")
+
+    controller = NavigationController(rerouter=Rerouter(fetch_route))
+    channel = controller.open_channel("d")
+    channel.handle_frame({"type": "init", "duration_text": "20 mins", "coords": [
+        {"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.90, "longitude": 46.60},
+    ]})
+    for lat in (24.74, 24.745, 24.75):
+        channel.handle_frame([lat, 46.61, 0, 40])
+
+    assert asyncio.run(controller.reroute("d")) is None
+    assert controller.rerouter.stats()["backing_off"] == 1
+
+    assert channel.handle_frame({"type": "end"}) == {"type": "ended"}
+    assert controller.rerouter.stats()["backing_off"] == 0
+    assert controller.sessions.get("d") is None
+
+
+def test_navigation_controller_does_not_reroute_on_route_driver():
+    controller, calls = _off_route_controller(None)
+    controller.init_route(
+        [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.90, "longitude": 46.60}],
+        "20 mins", session_id="d",
+    )
+    controller.location_update({"latitude": 24.75, "longitude": 46.60}, 0, 40, session_id="d")
+
+    assert asyncio.run(controller.reroute("d")) is None
+    assert calls == []
+
+
+def test_trip_controller_fetch_route_between_uses_coordinates(mock_ghg_data):
+    routes_client = Mock()
+    routes_client.compute_routes = AsyncMock(return_value={"routes": [
+        {"distanceMeters": 4200, "duration": "600s", "polyline": {"encodedPolyline": "_p~iF~ps|U_ulLnnqC"}},
+    ]})
+    controller = TripController(api_key="key", ghg_data=mock_ghg_data, routes_client=routes_client)
+
+    route = asyncio.run(controller.fetch_route_between(
+        {"latitude": 24.7, "longitude": 46.6}, {"latitude": 24.8, "longitude": 46.7}
+    ))
+
+    body = routes_client.compute_routes.call_args[0][0]
+    assert body["origin"] == {"location": {"latLng": {"latitude": 24.7, "longitude": 46.6}}}
+    assert route["coordinates"] == [[38.5, -120.2], [40.7, -120.95]]
+    assert route["duration"] == "10 mins"
+    assert route["distance_km"] == 4.2
+
+
+def test_trip_controller_fetch_route_between_raises_without_routes(mock_ghg_data):
+    routes_client = Mock()
+    routes_client.compute_routes = AsyncMock(return_value={"error": "quota"})
+    controller = TripController(api_key="key", ghg_data=mock_ghg_data, routes_client=routes_client)
+
+    with pytest.raises(ValueError):
+        asyncio.run(controller.fetch_route_between(
+            {"latitude": 24.7, "longitude": 46.6}, {"latitude": 24.8, "longitude": 46.7}
+        ))
+
+
+def test_navigation_controller_records_breadcrumbs_and_flushes_at_trip_end():
+    breadcrumbs = Mock()
+    breadcrumbs.flush_session.return_value = 2
+    controller = NavigationController(breadcrumbs=breadcrumbs)
+    controller.init_route(
+        [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.90, "longitude": 46.60}],
+        "20 mins", session_id="d", trip_id=42,
+    )
+
+    controller.location_update({"latitude": 24.75, "longitude": 46.60}, 90, 40, session_id="d")
+    controller.location_update_batch([
+        {"session_id": "d", "location": {"latitude": 24.76, "longitude": 46.60}, "speed_kmh": 50, "timestamp": 5.0},
+    ])
+
+    assert breadcrumbs.record.call_args_list[0][0] == ("d", 24.75, 46.60, 40, 90, None, 42)
+    assert breadcrumbs.record.call_args_list[1][0][5] == 5.0
+
+    controller.end_session("d")
+    assert controller.flush_trace("d") == 2
+    breadcrumbs.flush_session.assert_called_once_with("d")
+
+
+def test_navigation_controller_starts_session_from_route_hash():
+    from utils.route_geometry_cache import RouteGeometryCache
+
+    controller = NavigationController(routes=RouteGeometryCache())
+    route = [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.80, "longitude": 46.60}]
+
+    first = controller.init_route(route, "10 mins", session_id="driver-1")
+    second = controller.init_route(None, "12 mins", session_id="driver-2", route_hash=first["route_hash"])
+
+    assert second["route_hash"] == first["route_hash"]
+    assert second["total_km"] == pytest.approx(first["total_km"])
+    assert controller.sessions.get("driver-2").routeSegments is controller.sessions.get("driver-1").routeSegments
+    assert controller.get_stats()["route_geometry"]["size"] == 1
+
+    with pytest.raises(ValueError, match="Unknown route hash"):
+        controller.init_route(None, "10 mins", session_id="driver-3", route_hash="0" * 32)
+
+
+def test_navigation_controller_starts_session_from_saved_trip():
+    db = Mock()
+    db.get.return_value = Mock(coordinates=[[46.60, 24.70], [46.60, 24.80]], duration_min=14, company_id=3, driver_id=None)
+    trip_route = TripController.get_trip_route(db, "7", {"id": 5, "role": "driver", "company_id": 3})
+
+    controller = NavigationController(trip_routes=lambda trip_id, user: trip_route if trip_id == 7 else None)
+    result = controller.init_route(None, None, session_id="d", trip_id=7)
+
+    assert trip_route[0] == [24.70, 24.80]
+    assert result["base_duration"] == 14
+    assert result["total_km"] == pytest.approx(11.1, rel=0.01)
+    assert controller.sessions.get("d").tripId == 7
+
+    with pytest.raises(ValueError, match="no stored route"):
+        controller.init_route(None, None, session_id="d", trip_id=8)
+
+
+def test_saved_trip_is_only_usable_by_its_company_and_driver():
+    db = Mock()
+    db.get.return_value = Mock(coordinates=[[46.60, 24.70], [46.60, 24.80]], duration_min=14, company_id=3, driver_id=5)
+
+    assert TripController.get_trip_route(db, 7, {"id": 5, "role": "driver", "company_id": 3}) is not None
+    assert TripController.get_trip_route(db, 7, {"id": 1, "role": "manager", "company_id": 3}) is not None
+    for user in (
+        None,
+        {"id": 6, "role": "driver", "company_id": 3},
+        {"id": 1, "role": "manager", "company_id": 4},
+    ):
+        with pytest.raises(PermissionError):
+            TripController.get_trip_route(db, 7, user)
+
+
+def test_trip_id_is_checked_even_when_coords_are_sent():
+    def trip_routes(trip_id, user):
+        if user is None:
+            raise PermissionError("Sign in to navigate a saved trip")
+        return [24.70, 24.80], [46.60, 46.60], "14 mins"
+
+    controller = NavigationController(trip_routes=trip_routes)
+    coords = [{"latitude": 24.70, "longitude": 46.60}, {"latitude": 24.90, "longitude": 46.60}]
+
+    with pytest.raises(PermissionError):
+        controller.init_route(coords, "20 mins", session_id="d", trip_id=7)
+    assert controller.sessions.get("d") is None
+
+    channel = controller.open_channel("d", {"id": 5, "role": "driver", "company_id": 3})
+    route = channel.handle_frame({"type": "init", "coords": coords, "duration_text": "20 mins", "trip_id": 7})
+    assert route["total_km"] == pytest.approx(22.2, rel=0.01)
+    assert controller.sessions.get("d").tripId == 7
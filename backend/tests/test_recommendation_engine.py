@@ -21,13 +21,14 @@ def engine():
     
     with patch("models.ai_models.recommendation_engine.joblib.load") as mock_load:
 
+        # one output row per feature row, like the real models
         reg_model = MagicMock()
-        reg_model.predict = MagicMock(return_value=np.array([5.0]))
+        reg_model.predict = MagicMock(side_effect=lambda X: np.full(len(X), 5.0))
 
         clf_model = MagicMock()
-        clf_model.predict = MagicMock(return_value=np.array(["Green"]))
+        clf_model.predict = MagicMock(side_effect=lambda X: np.array(["Green"] * len(X)))
         clf_model.predict_proba = MagicMock(
-            return_value=np.array([[0.8, 0.15, 0.05]])
+            side_effect=lambda X: np.tile([0.8, 0.15, 0.05], (len(X), 1))
         )
         clf_model.classes_ = np.array(["Green", "Yellow", "Red"])
 
@@ -53,6 +54,19 @@ def engine():
         return eng
 
 
+@pytest.fixture
+def cached_engine():
+    with patch("models.ai_models.recommendation_engine.joblib.load") as mock_load:
+        reg_model = MagicMock()
+        reg_model.predict = MagicMock(side_effect=lambda X: np.arange(len(X), dtype=float) + 5.0)
+        clf_model = MagicMock()
+        clf_model.predict_proba = MagicMock(side_effect=lambda X: np.tile([0.8, 0.15, 0.05], (len(X), 1)))
+        clf_model.classes_ = np.array(["Green", "Yellow", "Red"])
+        mock_load.side_effect = [reg_model, clf_model, {}, {}]
+
+        return GreenMileRecommendationEngine(cache_size=100, cache_ttl_seconds=60)
+
+
 @pytest.fixture
 def base_trip():
     return {
@@ -204,6 +218,69 @@ class TestPrepareFeatures:
         assert len(df) == 1
 
 
+class TestCompiledFeatureEncoder:
+    # encode_features() against the per-row dict + DataFrame path it replaced
+
+    @pytest.fixture
+    def sklearn_engine(self, engine):
+        from sklearn.preprocessing import LabelEncoder
+
+        engine.label_encoders = {
+            "Vehicle Type": LabelEncoder().fit(["Truck", "Van", "Car"]),
+            "Fuel Type": LabelEncoder().fit(["Diesel", "Gasoline", "CNG", "Electric", "Hybrid"]),
+            "Road Type": LabelEncoder().fit(["Highway", "Urban", "Rural"]),
+            "Traffic Conditions": LabelEncoder().fit(["Light", "Moderate", "Heavy"]),
+        }
+        engine._compile_feature_encoder()
+        return engine
+
+    @staticmethod
+    def _dataframe_features(engine, trip_data):
+        trip_encoded, warnings = dict(trip_data), []
+        for col in engine.CATEGORICAL_COLUMNS:
+            if col in trip_encoded:
+                trip_encoded[f"{col}_encoded"], warn = engine._safe_encode(col, trip_encoded[col])
+                if warn:
+                    warnings.append(warn)
+        for f in engine.feature_columns:
+            trip_encoded.setdefault(f, 0)
+        return pd.DataFrame([trip_encoded])[engine.feature_columns].to_numpy(dtype=float), warnings
+
+    def test_matches_dataframe_path(self, sklearn_engine, base_trip):
+        routes = [
+            base_trip,
+            {**base_trip, "Vehicle Type": "Van", "Road Type": "Rural", "Traffic Conditions": "Heavy"},
+            {**base_trip, "Fuel Type": "Rocket Fuel", "Traffic Conditions": "Gridlock"},
+            {"Distance_km": 3.5, "Fuel Type": "CNG"},
+            {**base_trip, "City": "Riyadh", "Speed": "72.5"},
+        ]
+
+        features, warnings = sklearn_engine.encode_features(routes)
+
+        for row, trip in enumerate(routes):
+            expected, expected_warnings = self._dataframe_features(sklearn_engine, trip)
+            assert features[row].tolist() == expected[0].tolist()
+            assert warnings[row] == expected_warnings
+
+    def test_codes_come_from_encoder_classes(self, sklearn_engine, base_trip):
+        trip = {k: v for k, v in base_trip.items() if k != "City"}
+        trip["Fuel Type"] = "Hybrid"
+        sklearn_engine._safe_encode = MagicMock(side_effect=AssertionError("transform called"))
+
+        features, warnings = sklearn_engine.encode_features([trip])
+
+        position = sklearn_engine.feature_columns.index("Fuel Type_encoded")
+        assert features[0, position] == 4  # classes_ are sorted: CNG, Diesel, Electric, Gasoline, Hybrid
+        assert warnings == [[]]
+
+    def test_unknown_values_keep_their_warnings(self, sklearn_engine, base_trip):
+        _, warnings = sklearn_engine.encode_features([{**base_trip, "Fuel Type": "Rocket Fuel", "City": "Riyadh"}])
+        assert warnings[0] == [
+            "Unknown value 'Rocket Fuel' for Fuel Type",
+            "Missing encoder for 'City'",
+        ]
+
+
 
 #  SINGLE ROUTE PREDICTION TESTS
 
@@ -282,11 +359,7 @@ class TestCompareRoutes:
 
     def test_returns_required_keys(self, engine, two_routes):
         # Make Route B dirtier
-        call_count = [0]
-        def varying_predict(features):
-            call_count[0] += 1
-            return np.array([5.0]) if call_count[0] == 1 else np.array([10.0])
-        engine.regression_model.predict = varying_predict
+        engine.regression_model.predict = lambda features: np.array([5.0, 10.0])
 
         result = engine.compare_routes(two_routes)
         for key in ["all_routes", "best_route", "worst_route",
@@ -296,27 +369,23 @@ class TestCompareRoutes:
             assert key in result
 
     def test_best_route_has_lowest_co2(self, engine, two_routes):
-        emissions = iter([5.0, 10.0])
-        engine.regression_model.predict = lambda _: np.array([next(emissions)])
+        engine.regression_model.predict = lambda _: np.array([5.0, 10.0])
         result = engine.compare_routes(two_routes)
         assert result["best_route"]["predicted_co2e_kg"] <= result["worst_route"]["predicted_co2e_kg"]
 
     def test_co2_saving_is_difference(self, engine, two_routes):
-        emissions = iter([5.0, 10.0])
-        engine.regression_model.predict = lambda _: np.array([next(emissions)])
+        engine.regression_model.predict = lambda _: np.array([5.0, 10.0])
         result = engine.compare_routes(two_routes)
         expected = round(10.0 - 5.0, 4)
         assert result["co2e_saving_kg"] == expected
 
     def test_saving_percent_between_0_and_100(self, engine, two_routes):
-        emissions = iter([5.0, 10.0])
-        engine.regression_model.predict = lambda _: np.array([next(emissions)])
+        engine.regression_model.predict = lambda _: np.array([5.0, 10.0])
         result = engine.compare_routes(two_routes)
         assert 0 <= result["co2e_saving_percent"] <= 100
 
     def test_all_routes_sorted_ascending(self, engine, two_routes):
-        emissions = iter([10.0, 5.0])  # deliberately reversed
-        engine.regression_model.predict = lambda _: np.array([next(emissions)])
+        engine.regression_model.predict = lambda _: np.array([10.0, 5.0])  # deliberately reversed
         result = engine.compare_routes(two_routes)
         co2_values = [r["predicted_co2e_kg"] for r in result["all_routes"]]
         assert co2_values == sorted(co2_values)
@@ -336,8 +405,7 @@ class TestCompareRoutes:
         assert isinstance(result["generated_at"], str)
 
     def test_fuel_saving_liters_non_negative(self, engine, two_routes):
-        emissions = iter([5.0, 10.0])
-        engine.regression_model.predict = lambda _: np.array([next(emissions)])
+        engine.regression_model.predict = lambda _: np.array([5.0, 10.0])
         result = engine.compare_routes(two_routes)
         assert result["fuel_saving_liters"] >= 0
 
@@ -347,12 +415,69 @@ class TestCompareRoutes:
             {**base_trip, "name": "R2"},
             {**base_trip, "name": "R3"},
         ]
-        emissions = iter([8.0, 3.0, 15.0])
-        engine.regression_model.predict = lambda _: np.array([next(emissions)])
+        engine.regression_model.predict = lambda _: np.array([8.0, 3.0, 15.0])
         result = engine.compare_routes(routes)
         assert result["best_route"]["route_name"] == "R2"
         assert result["worst_route"]["route_name"] == "R3"
 
+    def test_one_batched_model_pass_per_comparison(self, engine, base_trip):
+        routes = [{**base_trip, "name": f"R{i}"} for i in range(3)]
+        engine.regression_model.predict = MagicMock(return_value=np.array([8.0, 3.0, 15.0]))
+        engine.classification_model.predict_proba = MagicMock(return_value=np.array([
+            [0.2, 0.7, 0.1],
+            [0.9, 0.05, 0.05],
+            [0.1, 0.2, 0.7],
+        ]))
+
+        result = engine.compare_routes(routes)
+
+        engine.regression_model.predict.assert_called_once()
+        engine.classification_model.predict_proba.assert_called_once()
+        engine.classification_model.predict.assert_not_called()
+        assert len(engine.regression_model.predict.call_args[0][0]) == 3
+        # category is the most probable class of each route's row
+        categories = {r["route_name"]: r["category"] for r in result["all_routes"]}
+        assert categories == {"R0": "Yellow", "R1": "Green", "R2": "Red"}
+
+
+
+# PREDICTION CACHE TESTS
+
+class TestPredictionCache:
+
+    def test_repeated_rows_skip_the_models(self, cached_engine, base_trip):
+        first = cached_engine.predict_single_route(base_trip)
+        # a few metres longer and a fraction of a degree warmer: same cell
+        second = cached_engine.predict_single_route({**base_trip, "Distance_km": 20.01, "Temperature": 28.1})
+
+        assert cached_engine.regression_model.predict.call_count == 1
+        assert cached_engine.classification_model.predict_proba.call_count == 1
+        assert second["predicted_co2e_kg"] == first["predicted_co2e_kg"]
+        assert cached_engine.prediction_cache.stats()["hits"] == 1
+
+    def test_only_uncached_rows_reach_the_models(self, cached_engine, base_trip):
+        cached_engine.predict_single_route(base_trip)
+        routes = [base_trip, {**base_trip, "Distance_km": 45.0}, {**base_trip, "Distance_km": 60.0}]
+
+        result = cached_engine.predict_routes(routes)
+
+        assert len(cached_engine.regression_model.predict.call_args[0][0]) == 2
+        assert [r["predicted_co2e_kg"] for r in result] == [5.0, 5.0, 6.0]
+
+    def test_reload_invalidates_cached_predictions(self, cached_engine, base_trip):
+        cached_engine.predict_single_route(base_trip)
+        models = (cached_engine.regression_model, cached_engine.classification_model, {}, {})
+
+        with patch("models.ai_models.recommendation_engine.joblib.load", side_effect=list(models)):
+            cached_engine.load_models()
+
+        assert len(cached_engine.prediction_cache) == 0
+        assert cached_engine.model_version == 2
+        cached_engine.predict_single_route(base_trip)
+        assert cached_engine.regression_model.predict.call_count == 2
+
+    def test_disabled_by_default(self, engine):
+        assert engine.prediction_cache is None
 
 
 # REASONS & RECOMMENDATIONS TESTS
@@ -509,7 +634,7 @@ class TestEdgeCases:
 
     def test_worst_route_zero_co2_saving_percent(self, engine, base_trip):
         """When worst CO2 = 0, saving percent should be 0 (no division by zero)."""
-        engine.regression_model.predict = MagicMock(return_value=np.array([0.0]))
+        engine.regression_model.predict = MagicMock(return_value=np.array([0.0, 0.0]))
         result = engine.compare_routes([base_trip, dict(base_trip)])
         assert result["co2e_saving_percent"] == 0.0
 
@@ -0,0 +1,155 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from models.trip_trace_db import TripTracePointDB
+from utils.breadcrumbs import BreadcrumbLog
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace.db'}")
+    TripTracePointDB.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def stored(session_factory, session_id=None):
+    db = session_factory()
+    try:
+        query = select(TripTracePointDB).order_by(TripTracePointDB.recorded_at, TripTracePointDB.id)
+        if session_id is not None:
+            query = query.where(TripTracePointDB.session_id == session_id)
+        return db.execute(query).scalars().all()
+    finally:
+        db.close()
+
+
+class FailingSession:
+    def connection(self):
+        raise RuntimeError("database is down")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_record_buffers_without_touching_the_database(session_factory):
+    log = BreadcrumbLog(session_factory, flush_size=100, flush_interval=60)
+    for i in range(10):
+        log.record("d", 24.7 + i * 1e-4, 46.6, 40.0, 90.0, timestamp=1000 + i)
+
+    assert len(log) == 10
+    assert stored(session_factory) == []
+    log.close()
+
+
+def test_flush_writes_all_sessions_in_one_bulk_insert(session_factory):
+    log = BreadcrumbLog(session_factory, flush_size=100, flush_interval=60)
+    log.record("a", 24.70, 46.60, 30.0, 0.0, timestamp=1.0, trip_id=7)
+    log.record("b", 24.80, 46.70, timestamp=2.0)
+    log.record("a", 24.71, 46.60, 35.0, 0.0, timestamp=3.0, trip_id=7)
+
+    assert log.flush() == 3
+    assert len(log) == 0
+    assert log.stats()["flushes"] == 1
+
+    rows = stored(session_factory, "a")
+    assert [(r.latitude, r.recorded_at, r.trip_id) for r in rows] == [(24.70, 1.0, 7), (24.71, 3.0, 7)]
+    log.close()
+
+
+def test_flush_session_commits_only_that_session(session_factory):
+    log = BreadcrumbLog(session_factory, flush_size=100, flush_interval=60)
+    log.record("ending", 24.70, 46.60)
+    log.record("ending", 24.71, 46.60)
+    log.record("other", 24.80, 46.70)
+
+    assert log.flush_session("ending") == 2
+    assert len(stored(session_factory, "ending")) == 2
+    assert stored(session_factory, "other") == []
+    assert len(log) == 1
+    log.close()
+
+
+def test_size_threshold_triggers_background_flush(session_factory):
+    log = BreadcrumbLog(session_factory, flush_size=5, flush_interval=60)
+    for i in range(5):
+        log.record("d", 24.7, 46.6 + i * 1e-4)
+
+    deadline = time.monotonic() + 5
+    while len(stored(session_factory)) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(stored(session_factory)) == 5
+    log.close()
+
+
+def test_failed_flush_keeps_pings_for_retry(session_factory):
+    healthy = session_factory
+    state = {"down": True}
+    log = BreadcrumbLog(lambda: FailingSession() if state["down"] else healthy(), flush_size=100, flush_interval=60)
+    log.record("d", 24.70, 46.60)
+    log.record("d", 24.71, 46.60)
+
+    assert log.flush() == 0
+    with pytest.raises(RuntimeError):
+        log.flush_session("d")
+    assert len(log) == 2
+    assert log.stats()["failed_flushes"] == 2
+
+    state["down"] = False
+    assert log.flush_session("d") == 2
+    assert [r.latitude for r in stored(healthy, "d")] == [24.70, 24.71]
+    log.close()
+
+
+def test_max_buffered_drops_oldest(session_factory):
+    log = BreadcrumbLog(lambda: FailingSession(), flush_size=2, flush_interval=60, max_buffered=3)
+    log._stopped = True  # keep the background thread out of the way
+    for i in range(5):
+        log.record("d", 24.7 + i, 46.6)
+
+    assert len(log) == 3
+    assert log.stats()["dropped"] == 2
+    assert [row[3] for row in log._buffers["d"]] == [26.7, 27.7, 28.7]
+
+
+def test_dropping_takes_the_longest_waiting_buffers_first(session_factory):
+    state = {"down": True}
+    log = BreadcrumbLog(
+        lambda: FailingSession() if state["down"] else session_factory(),
+        flush_size=100, flush_interval=60, max_buffered=100,
+    )
+    log._stopped = True
+    log.record("early", 24.70, 46.60)
+    log.record("early", 24.71, 46.60)
+    log.record("late", 24.80, 46.60)
+    assert log.flush() == 0  # taken and put back in front of newer pings
+
+    log.record("newer", 24.90, 46.60)
+    log._drop_oldest_locked(3)
+
+    assert list(log._buffers) == ["newer"]
+    assert log.stats()["dropped"] == 3
+
+
+def test_pings_from_two_workers_keep_fix_order(session_factory):
+    worker_a = BreadcrumbLog(session_factory, flush_size=100, flush_interval=60)
+    worker_b = BreadcrumbLog(session_factory, flush_size=100, flush_interval=60)
+    worker_a.record("d", 24.70, 46.60, timestamp=10.0)
+    worker_b.record("d", 24.71, 46.60, timestamp=11.0)
+    worker_a.record("d", 24.72, 46.60, timestamp=12.0)
+
+    worker_b.flush_session("d")
+    worker_a.flush_session("d")
+
+    rows = stored(session_factory, "d")
+    assert [r.latitude for r in rows] == [24.70, 24.71, 24.72]
+    assert len({r.id for r in rows}) == 3
+    worker_a.close()
+    worker_b.close()
@@ -0,0 +1,99 @@
+import asyncio
+import operator
+import os
+import threading
+from concurrent.futures import BrokenExecutor
+
+import pytest
+from utils.inference_executor import ExecutorSaturated, InferenceExecutor
+
+
+def test_runs_calls_and_records_timings():
+    executor = InferenceExecutor(max_workers=2, max_queue=4)
+
+    async def run():
+        return await asyncio.gather(*(executor.submit(operator.mul, i, 2) for i in range(5)))
+
+    assert asyncio.run(run()) == [0, 2, 4, 6, 8]
+
+    stats = executor.stats()
+    assert stats["completed"] == 5
+    assert stats["in_flight"] == 0
+    assert stats["execution"]["count"] == 5
+    assert stats["queue_wait"]["count"] == 5
+    assert stats["queue_wait"]["max_ms"] >= stats["queue_wait"]["p50_ms"] >= 0
+    executor.shutdown()
+
+
+def test_rejects_calls_beyond_workers_plus_queue():
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        blocked = [asyncio.ensure_future(executor.submit(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturated):
+            await executor.submit(release.wait, 5)
+
+        stats = executor.stats()
+        assert stats["in_flight"] == 2
+        assert stats["queued"] == 1
+
+        release.set()
+        return await asyncio.gather(*blocked)
+
+    assert asyncio.run(run()) == [True, True]
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["in_flight"] == 0
+    executor.shutdown()
+
+
+def test_errors_propagate_and_free_the_slot():
+    executor = InferenceExecutor(max_workers=1, max_queue=0)
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(executor.submit(operator.truediv, 1, 0))
+
+    assert asyncio.run(executor.submit(operator.add, 1, 1)) == 2
+    assert executor.stats()["failed"] == 1
+    executor.shutdown()
+
+
+def test_process_pool():
+    executor = InferenceExecutor(kind="process", max_workers=1, max_queue=2)
+    try:
+        assert asyncio.run(executor.submit(pow, 2, 10)) == 1024
+        executor.restart()
+        assert asyncio.run(executor.submit(pow, 3, 2)) == 9
+        assert executor.stats()["restarts"] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_broken_process_pool_is_replaced():
+    executor = InferenceExecutor(kind="process", max_workers=1, max_queue=2)
+    try:
+        # the worker dies mid-call, as when it is killed or runs out of memory
+        with pytest.raises(BrokenExecutor):
+            asyncio.run(executor.submit(os._exit, 1))
+
+        assert asyncio.run(executor.submit(pow, 2, 10)) == 1024
+        stats = executor.stats()
+        assert (stats["broken"], stats["failed"], stats["completed"], stats["in_flight"]) == (1, 1, 1, 0)
+
+        # broken before submit noticed (the breaking call's callback not run yet)
+        with pytest.raises(BrokenExecutor):
+            executor._current_pool().submit(os._exit, 1).result()
+        assert asyncio.run(executor.submit(pow, 3, 2)) == 9
+        assert executor.stats()["broken"] == 2
+    finally:
+        executor.shutdown()
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        InferenceExecutor(kind="fiber")
+    with pytest.raises(ValueError):
+        InferenceExecutor(max_workers=0)
+    with pytest.raises(ValueError):
+        InferenceExecutor(max_queue=-1)
@@ -0,0 +1,295 @@
+import pytest
+from controllers.NavigationController import NavigationController
+from utils.navigation_sessions import NavigationSessionStore, SharedNavigationSessionStore
+from utils.route_geometry_cache import RouteGeometryCache
+from utils.state_store import MemoryStateStore, SQLiteStateStore
+
+
+ROUTE = [
+    {"latitude": 24.7136, "longitude": 46.6753},
+    {"latitude": 24.7200, "longitude": 46.6850},
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestNavigationSessionStore:
+    def test_sessions_are_isolated(self):
+        store = NavigationSessionStore()
+
+        a = store.get_or_create("driver-a")
+        b = store.get_or_create("driver-b")
+        a.init_route(ROUTE, "10 mins")
+
+        assert a is not b
+        assert store.get_or_create("driver-a") is a
+        assert len(b.coords) == 0
+
+    def test_get_unknown_returns_none(self):
+        assert NavigationSessionStore().get("nobody") is None
+
+    def test_idle_session_expires(self):
+        clock = FakeClock()
+        store = NavigationSessionStore(ttl_seconds=60, clock=clock)
+        store.get_or_create("a")
+
+        clock.now += 59
+        assert store.get("a") is not None
+
+        clock.now += 61
+        assert store.get("a") is None
+        assert "a" not in store
+        assert store.stats()["expired"] == 1
+
+    def test_activity_keeps_session_alive(self):
+        clock = FakeClock()
+        store = NavigationSessionStore(ttl_seconds=60, clock=clock)
+        store.get_or_create("a")
+
+        for _ in range(5):
+            clock.now += 50
+            assert store.get("a") is not None
+
+    def test_bounded_evicts_least_recently_seen(self):
+        clock = FakeClock()
+        store = NavigationSessionStore(max_sessions=2, clock=clock)
+
+        store.get_or_create("a")
+        clock.now += 1
+        store.get_or_create("b")
+        clock.now += 1
+        store.get("a")
+        clock.now += 1
+        store.get_or_create("c")
+
+        assert len(store) == 2
+        assert "b" not in store
+        assert "a" in store and "c" in store
+        assert store.stats()["evicted"] == 1
+
+    def test_full_store_prefers_dropping_expired_sessions(self):
+        clock = FakeClock()
+        store = NavigationSessionStore(ttl_seconds=10, max_sessions=2, clock=clock)
+        store.get_or_create("a")
+        store.get_or_create("b")
+
+        clock.now += 11
+        store.get_or_create("c")
+
+        assert len(store) == 1
+        stats = store.stats()
+        assert stats["expired"] == 2
+        assert stats["evicted"] == 0
+
+    def test_sweep_and_remove(self):
+        clock = FakeClock()
+        store = NavigationSessionStore(ttl_seconds=10, clock=clock)
+        store.get_or_create("a")
+        store.get_or_create("b")
+
+        assert store.remove("a") is True
+        assert store.remove("a") is False
+
+        clock.now += 11
+        assert store.sweep() == 1
+        assert len(store) == 0
+
+    def test_on_expire_sees_idle_and_evicted_sessions(self):
+        clock = FakeClock()
+        dropped = []
+        store = NavigationSessionStore(ttl_seconds=10, max_sessions=2, clock=clock, on_expire=dropped.append)
+
+        store.get_or_create("a")
+        clock.now += 11
+        assert store.get("a") is None
+
+        store.get_or_create("b")
+        store.get_or_create("c")
+        store.get_or_create("d")
+        clock.now += 11
+        store.sweep()
+
+        assert dropped == ["a", "b", "c", "d"]
+
+    def test_controller_forgets_reroute_back_off_of_expired_sessions(self):
+        clock = FakeClock()
+        forgotten = []
+
+        class Rerouter:
+            def forget(self, session_id):
+                forgotten.append(session_id)
+
+        controller = NavigationController(NavigationSessionStore(ttl_seconds=10, clock=clock), rerouter=Rerouter())
+        controller.init_route(ROUTE, "10 mins", session_id="d")
+
+        clock.now += 11
+        controller.sessions.sweep()
+        assert forgotten == ["d"]
+
+    def test_invalid_settings(self):
+        with pytest.raises(ValueError):
+            NavigationSessionStore(ttl_seconds=0)
+        with pytest.raises(ValueError):
+            NavigationSessionStore(max_sessions=0)
+
+
+class TestSharedNavigationSessionStore:
+    def make_workers(self, backend, **kwargs):
+        return (
+            SharedNavigationSessionStore(backend, **kwargs),
+            SharedNavigationSessionStore(backend, **kwargs),
+        )
+
+    def test_route_and_progress_follow_the_driver_between_workers(self, tmp_path):
+        path = str(tmp_path / "state.db")
+        worker_a = SharedNavigationSessionStore(SQLiteStateStore(path))
+        worker_b = SharedNavigationSessionStore(SQLiteStateStore(path))
+
+        nav = worker_a.get_or_create("driver-1")
+        nav.init_route(ROUTE, "10 mins")
+        worker_a.save("driver-1", nav)
+
+        nav = worker_b.get("driver-1")
+        assert nav is not None
+        assert nav.baseDurationMinutes == 10
+        result = nav.update_location({"latitude": 24.7168, "longitude": 46.6801}, 90, 40)
+        worker_b.save("driver-1", nav)
+
+        nav = worker_a.get("driver-1")
+        assert nav.remainingKm == pytest.approx(result["remainingKm"])
+        assert nav.lastSnappedIndex == 0
+        assert nav.snappedLocation.latitude == pytest.approx(result["snappedLocation"]["latitude"])
+
+    def test_route_built_once_per_worker(self):
+        backend = MemoryStateStore()
+        worker_a, worker_b = self.make_workers(backend)
+
+        nav = worker_a.get_or_create("d")
+        nav.init_route(ROUTE, "10 mins")
+        worker_a.save("d", nav)
+
+        for _ in range(3):
+            nav = worker_b.get("d")
+            nav.update_location({"latitude": 24.7168, "longitude": 46.6801}, 0, 30)
+            worker_b.save("d", nav)
+
+        assert worker_b.stats()["route_loads"] == 1
+        assert worker_b.stats()["cache_hits"] == 2
+
+    def test_route_loads_reuse_cached_geometry(self):
+        backend = MemoryStateStore()
+        worker_a, worker_b = self.make_workers(backend, routes=RouteGeometryCache())
+
+        nav = worker_a.get_or_create("d")
+        nav.init_route(ROUTE, "10 mins", worker_a.routes)
+        worker_a.save("d", nav)
+        worker_b.routes.get_or_build(nav.routeSegments.lat, nav.routeSegments.lng)
+
+        assert worker_b.get("d").routeSegments is worker_b.routes.get(nav.routeHash)
+
+    def test_route_coordinates_stored_once_per_route(self):
+        backend = MemoryStateStore()
+        worker_a, worker_b = self.make_workers(backend)
+
+        for session_id in ("d1", "d2"):
+            nav = worker_a.get_or_create(session_id)
+            nav.init_route(ROUTE, "10 mins")
+            worker_a.save(session_id, nav)
+
+        assert backend.count(SharedNavigationSessionStore.GEOMETRY_PREFIX) == 1
+        route = backend.get(SharedNavigationSessionStore.ROUTE_PREFIX + "d1")
+        assert "coords" not in route
+        assert backend.get(SharedNavigationSessionStore.GEOMETRY_PREFIX + route["routeHash"]) == nav.route_coords_list()
+
+        assert worker_b.get("d2").totalRouteKm == pytest.approx(nav.totalRouteKm)
+
+    def test_session_is_gone_when_its_geometry_expired(self):
+        backend = MemoryStateStore()
+        worker_a, worker_b = self.make_workers(backend)
+
+        nav = worker_a.get_or_create("d")
+        nav.init_route(ROUTE, "10 mins")
+        worker_a.save("d", nav)
+        backend.delete(SharedNavigationSessionStore.GEOMETRY_PREFIX + nav.routeHash)
+
+        assert worker_b.get("d") is None
+
+    def test_same_route_restarted_is_republished(self):
+        backend = MemoryStateStore()
+        routes = RouteGeometryCache()
+        worker_a, worker_b = self.make_workers(backend)
+
+        nav = worker_a.get_or_create("d")
+        nav.init_route(ROUTE, "10 mins", routes)
+        worker_a.save("d", nav)
+        assert worker_b.get("d").baseDurationMinutes == 10
+
+        # same shared geometry, new trip settings
+        nav.init_route(ROUTE, "25 mins", routes)
+        worker_a.save("d", nav)
+        assert worker_b.get("d").baseDurationMinutes == 25
+
+    def test_new_route_invalidates_other_workers(self):
+        backend = MemoryStateStore()
+        worker_a, worker_b = self.make_workers(backend)
+
+        nav = worker_a.get_or_create("d")
+        nav.init_route(ROUTE, "10 mins")
+        worker_a.save("d", nav)
+        assert worker_b.get("d").totalRouteKm == pytest.approx(nav.totalRouteKm)
+
+        nav.init_route(ROUTE[:1] + [{"latitude": 24.75, "longitude": 46.70}], "30 mins")
+        worker_a.save("d", nav)
+
+        other = worker_b.get("d")
+        assert other.baseDurationMinutes == 30
+        assert other.totalRouteKm == pytest.approx(nav.totalRouteKm)
+
+    def test_remove_and_expiry(self):
+        clock = FakeClock()
+        backend = MemoryStateStore(clock=clock)
+        worker_a, worker_b = self.make_workers(backend, ttl_seconds=60)
+
+        worker_a.get_or_create("a")
+        worker_a.get_or_create("b")
+        assert len(worker_b) == 2
+
+        assert worker_b.remove("a") is True
+        assert worker_a.get("a") is None
+
+        clock.now += 61
+        assert worker_a.get("b") is None
+        assert len(worker_a) == 0
+
+    def test_on_expire_when_a_loaded_session_is_gone(self):
+        clock = FakeClock()
+        dropped = []
+        backend = MemoryStateStore(clock=clock)
+        worker = SharedNavigationSessionStore(backend, ttl_seconds=60, on_expire=dropped.append)
+
+        worker.get_or_create("a")
+        clock.now += 61
+        assert worker.get("a") is None
+        assert worker.get("never-seen") is None
+        assert dropped == ["a"]
+
+    def test_works_with_navigation_controller(self):
+        backend = MemoryStateStore()
+        controller_a = NavigationController(SharedNavigationSessionStore(backend))
+        controller_b = NavigationController(SharedNavigationSessionStore(backend))
+
+        controller_a.init_route(ROUTE, "10 mins", session_id="d")
+        result = controller_b.location_update(
+            {"latitude": 24.7168, "longitude": 46.6801}, 0, 30, session_id="d"
+        )
+
+        assert result["remainingKm"] < controller_b.sessions.get("d").totalRouteKm
+        assert controller_a.end_session("d") is True
+        with pytest.raises(ValueError):
+            controller_b.location_update({"latitude": 24.7, "longitude": 46.6}, 0, 0, session_id="d")
@@ -0,0 +1,110 @@
+import random
+import numpy as np
+import pytest
+from utils.polyline import decode_polyline, decode_polylines, encode_polyline
+
+
+def _reference_decode(polyline):
+    """The original scalar decoder from Trip.decode_polyline."""
+    decoded_points = []
+    index = 0
+    lat = 0
+    lng = 0
+
+    while index < len(polyline):
+        values = []
+        for _ in range(2):
+            result = 0
+            shift = 0
+            while True:
+                c = ord(polyline[index]) - 63
+                index += 1
+                result |= (c & 0x1F) << shift
+                shift += 5
+                if c < 32:
+                    break
+            values.append(~(result >> 1) if (result & 1) else (result >> 1))
+        lat += values[0]
+        lng += values[1]
+        decoded_points.append((lat / 1e5, lng / 1e5))
+
+    return decoded_points
+
+
+def _random_route(n, seed):
+    rng = random.Random(seed)
+    lat, lng = 24.7136, 46.6753
+    points = []
+    for _ in range(n):
+        lat += rng.uniform(-0.01, 0.01)
+        lng += rng.uniform(-0.01, 0.01)
+        points.append((lat, lng))
+    return points
+
+
+GOOGLE_SAMPLE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+class TestDecodePolyline:
+    def test_google_reference_sample(self):
+        decoded = decode_polyline(GOOGLE_SAMPLE)
+        assert decoded.tolist() == [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]]
+
+    def test_matches_scalar_decoder(self):
+        for seed in range(5):
+            encoded = encode_polyline(_random_route(500, seed))
+            expected = _reference_decode(encoded)
+            assert [tuple(p) for p in decode_polyline(encoded).tolist()] == expected
+
+    def test_lnglat_order_swaps_axes(self):
+        latlng = decode_polyline(GOOGLE_SAMPLE)
+        lnglat = decode_polyline(GOOGLE_SAMPLE, order="lnglat")
+        assert np.array_equal(latlng[:, ::-1], lnglat)
+
+    def test_output_is_contiguous_float64(self):
+        decoded = decode_polyline(GOOGLE_SAMPLE, order="lnglat")
+        assert decoded.dtype == np.float64
+        assert decoded.flags["C_CONTIGUOUS"]
+        assert decoded.shape == (3, 2)
+
+    def test_empty_polyline(self):
+        assert decode_polyline("").shape == (0, 2)
+
+    @pytest.mark.parametrize("bad", ["invalid@@@", "_p~iF~ps|", "_p~iF", "ü"])
+    def test_invalid_input_raises_value_error(self, bad):
+        with pytest.raises(ValueError):
+            decode_polyline(bad)
+
+    def test_unknown_order_raises(self):
+        with pytest.raises(ValueError):
+            decode_polyline(GOOGLE_SAMPLE, order="xy")
+
+
+class TestDecodePolylinesBatch:
+    def test_batch_matches_individual_decoding(self):
+        encoded = [encode_polyline(_random_route(n, n)) for n in (1, 40, 0, 300)]
+        points, offsets = decode_polylines(encoded)
+
+        assert offsets.tolist() == [0, 1, 41, 41, 341]
+        for i, e in enumerate(encoded):
+            assert [tuple(p) for p in points[offsets[i]:offsets[i + 1]].tolist()] == _reference_decode(e)
+
+    def test_batch_rejects_value_spanning_polylines(self):
+        # "_p~iF~ps|" is missing its final terminator; it must not borrow from the next polyline
+        with pytest.raises(ValueError):
+            decode_polylines(["_p~iF~ps|", "U"])
+
+    def test_empty_batch(self):
+        points, offsets = decode_polylines([])
+        assert points.shape == (0, 2)
+        assert offsets.tolist() == [0]
+
+
+class TestEncodePolyline:
+    def test_round_trip(self):
+        route = _random_route(200, 7)
+        decoded = decode_polyline(encode_polyline(route))
+        assert np.allclose(decoded, np.round(np.array(route), 5), atol=1e-9)
+
+    def test_google_reference_sample(self):
+        assert encode_polyline([(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]) == GOOGLE_SAMPLE
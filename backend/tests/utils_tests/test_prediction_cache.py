@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from utils.prediction_cache import PredictionCache
+
+
+COLUMNS = ["Distance_km", "Speed", "Hour", "City_encoded"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rows_within_a_quantization_step_share_a_key():
+    cache = PredictionCache(COLUMNS, quantization={"Distance_km": 0.1, "Speed": 1.0})
+
+    keys = cache.make_keys(np.array([
+        [12.34, 60.2, 9, 1],
+        [12.31, 59.9, 9, 1],
+        [12.46, 60.2, 9, 1],   # next distance cell
+        [12.34, 60.2, 10, 1],  # exact columns must match exactly
+        [12.34, 60.2, 9, 2],
+    ]))
+
+    assert keys[0] == keys[1]
+    assert len(set(keys)) == 4
+
+
+def test_negative_zero_matches_zero():
+    cache = PredictionCache(COLUMNS, quantization={"Distance_km": 0.1})
+    a, b = cache.make_keys(np.array([[0.0, 0.0, 0, 0], [-0.01, -0.0, 0, 0]]))
+    assert a == b
+
+
+def test_lru_eviction_and_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(COLUMNS, quantization={}, ttl_seconds=60, max_entries=2, clock=clock)
+
+    cache.put(b"a", 1)
+    cache.put(b"b", 2)
+    assert cache.get(b"a") == 1
+    cache.put(b"c", 3)
+
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == 1
+
+    clock.now += 61
+    assert cache.get(b"a") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["expirations"] == 1
+    assert stats["hits"] == 2
+    assert stats["hit_rate"] == 0.5
+
+
+def test_clear_counts_invalidations():
+    cache = PredictionCache(COLUMNS, quantization={})
+    cache.put(b"a", 1)
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_default_quantization_needs_its_columns():
+    with pytest.raises(ValueError):
+        PredictionCache(COLUMNS)
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        PredictionCache(COLUMNS, quantization={"Altitude": 1.0})
+    with pytest.raises(ValueError):
+        PredictionCache(COLUMNS, quantization={"Speed": 0})
+    with pytest.raises(ValueError):
+        PredictionCache(COLUMNS, max_entries=0)
+    with pytest.raises(ValueError):
+        PredictionCache(COLUMNS, ttl_seconds=0)
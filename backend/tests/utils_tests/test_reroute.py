@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from models.Navigation import Point
+from utils.reroute import Rerouter
+
+
+ROUTE = {"coordinates": [[24.70, 46.60], [24.80, 46.60]], "duration": "12 mins", "distance_km": 11.1}
+DESTINATION = Point(24.80, 46.60)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_fetch(result=ROUTE, delay=0.0, error=None):
+    calls = []
+
+    async def fetch(origin, destination):
+        calls.append((origin, destination))
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return fetch, calls
+
+
+def test_concurrent_reroutes_for_one_session_share_a_fetch():
+    fetch, calls = make_fetch(delay=0.01)
+    rerouter = Rerouter(fetch)
+
+    async def run():
+        return await asyncio.gather(*(
+            rerouter.reroute("d", Point(24.70 + i * 1e-3, 46.61), DESTINATION) for i in range(5)
+        ))
+
+    routes = asyncio.run(run())
+
+    assert routes == [ROUTE] * 5
+    assert len(calls) == 1
+    assert rerouter.stats()["deduplicated"] == 4
+
+
+def test_recurring_detour_is_served_from_cache():
+    fetch, calls = make_fetch()
+    rerouter = Rerouter(fetch)
+
+    first = asyncio.run(rerouter.reroute("driver-1", Point(24.7000, 46.6100), DESTINATION))
+    # another driver leaving the route a few metres away
+    second = asyncio.run(rerouter.reroute("driver-2", Point(24.70001, 46.61001), DESTINATION))
+    elsewhere = asyncio.run(rerouter.reroute("driver-3", Point(24.7100, 46.6100), DESTINATION))
+
+    assert first == second == elsewhere == ROUTE
+    assert len(calls) == 2
+    assert calls[0][0] == {"latitude": 24.7, "longitude": 46.61}
+    assert rerouter.cache.stats()["hits"] == 1
+
+
+def test_failed_fetch_backs_off_per_session():
+    clock = FakeClock()
+    fetch, calls = make_fetch(error=ValueError("Google returned no routes"))
+    rerouter = Rerouter(fetch, retry_seconds=15, clock=clock)
+
+    assert asyncio.run(rerouter.reroute("d", Point(24.70, 46.61), DESTINATION)) is None
+    assert asyncio.run(rerouter.reroute("d", Point(24.70, 46.61), DESTINATION)) is None
+    assert len(calls) == 1
+
+    clock.now += 16
+    asyncio.run(rerouter.reroute("d", Point(24.70, 46.61), DESTINATION))
+    assert len(calls) == 2
+    assert rerouter.stats()["failures"] == 2
+
+
+def test_old_failures_are_dropped_and_forget_clears_the_back_off():
+    clock = FakeClock()
+    fetch, calls = make_fetch(error=ValueError("Google returned no routes"))
+    rerouter = Rerouter(fetch, retry_seconds=15, clock=clock)
+
+    for i in range(3):
+        asyncio.run(rerouter.reroute(f"d{i}", Point(24.70 + i * 0.01, 46.61), DESTINATION))
+    assert rerouter.stats()["backing_off"] == 3
+
+    # a later failure sweeps the ones whose back-off is over
+    clock.now += 16
+    asyncio.run(rerouter.reroute("d9", Point(24.75, 46.61), DESTINATION))
+    assert rerouter.stats()["backing_off"] == 1
+
+    rerouter.forget("d9")
+    assert rerouter.stats()["backing_off"] == 0
+    assert len(calls) == 4
+
+
+def test_rejects_non_positive_cell_size():
+    with pytest.raises(ValueError):
+        Rerouter(make_fetch()[0], cell_meters=0)
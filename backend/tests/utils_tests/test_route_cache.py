@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock, patch
+from utils.route_cache import RouteCache
+from backend.models.Trip import Trip
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+OPTIONS = {"travelMode": "DRIVE", "routingPreference": "TRAFFIC_AWARE_OPTIMAL"}
+MORNING = datetime(2024, 5, 1, 8, 5)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return RouteCache(ttl_seconds=60, max_entries=2, bucket_minutes=15, clock=clock)
+
+
+class TestRouteCacheKeys:
+    def test_key_normalizes_whitespace_and_case(self, cache):
+        a = cache.make_key("  King  Fahd Road", "Olaya", "Riyadh", OPTIONS, now=MORNING)
+        b = cache.make_key("king fahd road ", "OLAYA", " riyadh", OPTIONS, now=MORNING)
+        assert a == b
+
+    def test_key_depends_on_routing_options(self, cache):
+        a = cache.make_key("A", "B", "Riyadh", OPTIONS, now=MORNING)
+        b = cache.make_key("A", "B", "Riyadh", {**OPTIONS, "travelMode": "TWO_WHEELER"}, now=MORNING)
+        assert a != b
+
+    def test_key_option_order_does_not_matter(self, cache):
+        reordered = dict(reversed(list(OPTIONS.items())))
+        assert cache.make_key("A", "B", "C", OPTIONS, now=MORNING) == cache.make_key("A", "B", "C", reordered, now=MORNING)
+
+    def test_key_depends_on_time_bucket(self, cache):
+        same_bucket = datetime(2024, 5, 1, 8, 14)
+        next_bucket = datetime(2024, 5, 1, 8, 15)
+        key = cache.make_key("A", "B", "C", OPTIONS, now=MORNING)
+        assert key == cache.make_key("A", "B", "C", OPTIONS, now=same_bucket)
+        assert key != cache.make_key("A", "B", "C", OPTIONS, now=next_bucket)
+
+
+class TestRouteCacheStorage:
+    def test_miss_then_hit(self, cache):
+        assert cache.get("k") is None
+        cache.put("k", {"routes": []})
+        assert cache.get("k") == {"routes": []}
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_entry_expires_after_ttl(self, cache, clock):
+        cache.put("k", {"routes": []})
+        clock.now += 59
+        assert cache.get("k") is not None
+        clock.now += 1
+        assert cache.get("k") is None
+        assert cache.stats()["expirations"] == 1
+        assert len(cache) == 0
+
+    def test_lru_eviction(self, cache):
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")          # "b" is now least recently used
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_clear(self, cache):
+        cache.put("a", 1)
+        cache.clear()
+        assert len(cache) == 0
+
+    @pytest.mark.parametrize("kwargs", [{"ttl_seconds": 0}, {"max_entries": 0}, {"bucket_minutes": 0}])
+    def test_invalid_configuration(self, kwargs):
+        with pytest.raises(ValueError):
+            RouteCache(**kwargs)
+
+
+GHG = {
+    "fuel_consumption": {"Passenger Cars": 0.08, "Light-Duty Trucks": 0.12},
+    "factors": [
+        {"vehicle_type": "Passenger Cars", "fuel_type": "Petrol", "model_year_range": "2020",
+         "co2_factor": 2.31, "ch4_factor": 0.0001, "n2o_factor": 0.0001},
+        {"vehicle_type": "Light-Duty Trucks", "fuel_type": "Diesel", "model_year_range": "2015",
+         "co2_factor": 2.68, "ch4_factor": 0.00005, "n2o_factor": 0.00005},
+    ],
+}
+
+GOOGLE_PAYLOAD = {
+    "routes": [{
+        "distanceMeters": 10000,
+        "duration": "600s",
+        "description": "Route A",
+        "polyline": {"encodedPolyline": "_p~iF~ps|U_ulLnnqC"},
+    }]
+}
+
+
+def _google_response(payload):
+    response = Mock()
+    response.json.return_value = payload
+    response.raise_for_status = Mock()
+    return response
+
+
+class TestTripUsesRouteCache:
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    def test_second_trip_is_served_from_cache(self, mock_post):
+        mock_post.return_value = _google_response(GOOGLE_PAYLOAD)
+        cache = RouteCache()
+
+        first = asyncio.run(Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, GHG, "key", route_cache=cache).get_routes())
+        second = asyncio.run(Trip(" a ", "b", "RIYADH", "Car", "Petrol", 2020, GHG, "key", route_cache=cache).get_routes())
+
+        assert mock_post.call_count == 1
+        assert first == second
+        assert cache.stats()["hits"] == 1
+
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    def test_cached_payload_recomputes_emissions_for_other_vehicle(self, mock_post):
+        mock_post.return_value = _google_response(GOOGLE_PAYLOAD)
+        cache = RouteCache()
+
+        car = asyncio.run(Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, GHG, "key", route_cache=cache).get_routes())
+        van = asyncio.run(Trip("A", "B", "Riyadh", "Van", "Diesel", 2015, GHG, "key", route_cache=cache).get_routes())
+
+        assert mock_post.call_count == 1
+        assert car["routes"][0]["coordinates"] == van["routes"][0]["coordinates"]
+        assert car["routes"][0]["emissions"]["co2"] != van["routes"][0]["emissions"]["co2"]
+
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    def test_responses_without_routes_are_not_cached(self, mock_post):
+        mock_post.return_value = _google_response({"status": "ok"})
+        cache = RouteCache()
+
+        asyncio.run(Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, GHG, "key", route_cache=cache).get_routes())
+        asyncio.run(Trip("A", "B", "Riyadh", "Car", "Petrol", 2020, GHG, "key", route_cache=cache).get_routes())
+
+        assert mock_post.call_count == 2
+        assert len(cache) == 0
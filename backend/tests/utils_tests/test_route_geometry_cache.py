@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from models.Navigation import Navigation
+from utils.route_geometry_cache import RouteGeometryCache
+
+
+def _route(n, lat0=24.70, step=0.0002):
+    return [{"latitude": lat0 + i * step, "longitude": 46.60 + i * step / 2} for i in range(n)]
+
+
+def test_same_coordinates_share_one_frozen_geometry():
+    routes = RouteGeometryCache()
+    a, b = Navigation(), Navigation()
+
+    first = a.init_route(_route(300), "10 mins", routes)
+    second = b.init_route(_route(300), "20 mins", routes)
+
+    assert first["route_hash"] == second["route_hash"]
+    assert a.routeSegments is b.routeSegments
+    assert not a.routeSegments.segments.flags.writeable
+    assert (a.baseDurationMinutes, b.baseDurationMinutes) == (10, 20)
+    assert routes.stats()["hits"] == 1
+    assert routes.stats()["misses"] == 1
+
+
+def test_hash_depends_on_every_coordinate():
+    route = _route(50)
+    moved = [dict(p) for p in route]
+    moved[25]["longitude"] += 1e-9
+
+    assert Navigation().init_route(route, "5 mins")["route_hash"] != \
+        Navigation().init_route(moved, "5 mins")["route_hash"]
+
+
+def test_sessions_on_a_shared_route_progress_independently():
+    routes = RouteGeometryCache()
+    route = _route(200)
+    a, b = Navigation(), Navigation()
+    a.init_route(route, "10 mins", routes)
+    b.init_route(route, "10 mins", routes)
+
+    near_start = a.update_location(route[10], 0, 40)
+    near_end = b.update_location(route[190], 0, 40)
+
+    assert near_start["remainingKm"] > near_end["remainingKm"]
+    assert a.lastSnappedIndex < 20 < 180 < b.lastSnappedIndex
+
+
+def test_least_recently_used_route_is_evicted():
+    routes = RouteGeometryCache(max_entries=2)
+    keys = [routes.get_or_build(*zip(*[(p["latitude"], p["longitude"]) for p in _route(10, lat0)]))[0]
+            for lat0 in (24.1, 24.2)]
+    routes.get(keys[0])
+    routes.get_or_build(np.array([25.0, 25.1]), np.array([46.0, 46.1]))
+
+    assert keys[0] in routes
+    assert keys[1] not in routes
+    assert routes.stats()["evictions"] == 1
+    assert routes.stats()["bytes"] > 0
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        RouteGeometryCache(max_entries=0)
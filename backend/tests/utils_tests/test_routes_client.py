@@ -0,0 +1,133 @@
+import asyncio
+import httpx
+import pytest
+from utils.routes_client import GoogleRoutesClient, get_default_routes_client
+
+
+ROUTES_PAYLOAD = {"routes": [{"distanceMeters": 1000, "duration": "60s"}]}
+
+
+def _client(handler, **kwargs):
+    return GoogleRoutesClient(url="http://routes.test/compute", transport=httpx.MockTransport(handler), **kwargs)
+
+
+class TestGoogleRoutesClient:
+    def test_returns_json_and_sends_body_and_headers(self):
+        seen = {}
+
+        def handler(request):
+            seen["url"] = str(request.url)
+            seen["key"] = request.headers["X-Goog-Api-Key"]
+            seen["body"] = request.content
+            return httpx.Response(200, json=ROUTES_PAYLOAD)
+
+        client = _client(handler)
+        result = asyncio.run(client.compute_routes({"travelMode": "DRIVE"}, {"X-Goog-Api-Key": "k"}))
+
+        assert result == ROUTES_PAYLOAD
+        assert seen["url"] == "http://routes.test/compute"
+        assert seen["key"] == "k"
+        assert b"DRIVE" in seen["body"]
+        assert client.stats()["requests"] == 1
+        assert client.stats()["in_flight"] == 0
+
+    def test_http_error_status_raises_and_is_counted(self):
+        client = _client(lambda request: httpx.Response(500, json={"error": "boom"}))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(client.compute_routes({}, {}))
+
+        assert client.stats()["errors"] == 1
+
+    def test_timeout_is_counted(self):
+        def handler(request):
+            raise httpx.ReadTimeout("slow google", request=request)
+
+        client = _client(handler)
+
+        with pytest.raises(httpx.TimeoutException):
+            asyncio.run(client.compute_routes({}, {}))
+
+        assert client.stats()["timeouts"] == 1
+
+    def test_concurrency_is_bounded(self):
+        state = {"active": 0, "peak": 0}
+
+        async def handler(request):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return httpx.Response(200, json=ROUTES_PAYLOAD)
+
+        client = _client(handler, max_concurrency=3)
+
+        async def burst():
+            await asyncio.gather(*(client.compute_routes({}, {}) for _ in range(12)))
+
+        asyncio.run(burst())
+
+        assert state["peak"] == 3
+        assert client.stats()["requests"] == 12
+
+    def test_client_is_reused_within_a_loop_and_rebound_across_loops(self):
+        client = _client(lambda request: httpx.Response(200, json=ROUTES_PAYLOAD))
+
+        async def two_calls():
+            await client.compute_routes({}, {})
+            first = client._client
+            await client.compute_routes({}, {})
+            return first, client._client
+
+        first, second = asyncio.run(two_calls())
+        assert first is second
+
+        # the first loop closed its client when it shut down
+        assert first.is_closed
+
+        asyncio.run(client.compute_routes({}, {}))
+        assert client._client is not first
+
+    def test_refuses_a_second_running_loop(self):
+        import threading
+
+        client = _client(lambda request: httpx.Response(200, json=ROUTES_PAYLOAD))
+        other = asyncio.new_event_loop()
+        thread = threading.Thread(target=other.run_forever)
+        thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(client.compute_routes({}, {}), other).result(5)
+
+            with pytest.raises(RuntimeError):
+                asyncio.run(client.compute_routes({}, {}))
+        finally:
+            asyncio.run_coroutine_threadsafe(client.aclose(), other).result(5)
+            other.call_soon_threadsafe(other.stop)
+            thread.join()
+            other.close()
+
+    def test_invalid_json_is_an_http_error(self):
+        client = _client(lambda request: httpx.Response(200, content=b"<html>quota</html>"))
+
+        with pytest.raises(httpx.DecodingError):
+            asyncio.run(client.compute_routes({}, {}))
+
+        assert client.stats()["errors"] == 1
+
+    def test_aclose(self):
+        client = _client(lambda request: httpx.Response(200, json=ROUTES_PAYLOAD))
+
+        async def use_and_close():
+            await client.compute_routes({}, {})
+            await client.aclose()
+
+        asyncio.run(use_and_close())
+        assert client._client is None
+        assert client._closer is None
+
+    def test_invalid_concurrency(self):
+        with pytest.raises(ValueError):
+            GoogleRoutesClient(max_concurrency=0)
+
+    def test_default_client_is_shared(self):
+        assert get_default_routes_client() is get_default_routes_client()
@@ -0,0 +1,89 @@
+import asyncio
+from utils.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_with_same_key_share_one_execution(self):
+        group = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"value": 42}
+
+        async def burst():
+            return await asyncio.gather(*(group.do("k", work) for _ in range(10)))
+
+        results = asyncio.run(burst())
+
+        assert len(calls) == 1
+        assert all(r is results[0] for r in results)
+        stats = group.stats()
+        assert stats["executions"] == 1
+        assert stats["coalesced"] == 9
+        assert stats["upstream_calls_saved"] == 9
+        assert stats["in_flight"] == 0
+
+    def test_different_keys_run_independently(self):
+        group = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        async def burst():
+            return await asyncio.gather(
+                group.do("a", lambda: work("a")),
+                group.do("b", lambda: work("b")),
+            )
+
+        assert asyncio.run(burst()) == ["a", "b"]
+        assert group.stats()["executions"] == 2
+
+    def test_sequential_calls_are_not_cached(self):
+        group = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            return len(calls)
+
+        async def twice():
+            return [await group.do("k", work), await group.do("k", work)]
+
+        assert asyncio.run(twice()) == [1, 2]
+        assert group.stats()["coalesced"] == 0
+
+    def test_exception_is_shared_by_all_waiters(self):
+        group = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def burst():
+            return await asyncio.gather(*(group.do("k", work) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(burst())
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert group.stats()["executions"] == 1
+        assert group.stats()["in_flight"] == 0
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        group = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def scenario():
+            leader = asyncio.ensure_future(group.do("k", work))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(group.do("k", work))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(scenario()) == "done"
@@ -0,0 +1,247 @@
+import fnmatch
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+
+import pytest
+from utils.state_store import (
+    MemoryStateStore,
+    RedisStateStore,
+    SQLiteStateStore,
+    StateNamespace,
+    StateStore,
+    create_state_store,
+)
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """The slice of the redis-py client RedisStateStore uses, kept in a dict."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+
+    def _alive(self, name):
+        entry = self.data.get(name)
+        if entry is not None and entry[1] is not None and self.clock() >= entry[1]:
+            del self.data[name]
+            return None
+        return entry
+
+    def get(self, name):
+        entry = self._alive(name)
+        return None if entry is None else entry[0].encode("utf-8")
+
+    def set(self, name, value, ex=None):
+        self.data[name] = (value, None if ex is None else self.clock() + ex)
+        return True
+
+    def delete(self, *names):
+        return sum(1 for name in names if self._alive(name) is not None and self.data.pop(name))
+
+    def expire(self, name, seconds):
+        entry = self._alive(name)
+        if entry is None:
+            return False
+        self.data[name] = (entry[0], self.clock() + seconds)
+        return True
+
+    def scan_iter(self, match="*"):
+        for name in list(self.data):
+            if fnmatch.fnmatchcase(name, match) and self._alive(name) is not None:
+                yield name
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store_and_clock(request, tmp_path):
+    clock = FakeClock()
+    if request.param == "memory":
+        store = MemoryStateStore(clock=clock)
+    elif request.param == "sqlite":
+        store = SQLiteStateStore(str(tmp_path / "state.db"), clock=clock)
+    else:
+        store = RedisStateStore(FakeRedis(clock))
+    yield store, clock
+    store.close()
+
+
+class TestStateStoreContract:
+    def test_set_get_roundtrip_returns_copy(self, store_and_clock):
+        store, _ = store_and_clock
+        value = {"otp": "1234", "coords": [[24.7, 46.6]]}
+
+        store.set("k", value)
+        got = store.get("k")
+        got["otp"] = "changed"
+
+        assert store.get("k") == value
+
+    def test_missing_key(self, store_and_clock):
+        store, _ = store_and_clock
+        assert store.get("nope") is None
+        assert store.delete("nope") is False
+        assert store.touch("nope", 10) is False
+
+    def test_ttl_expiry_and_touch(self, store_and_clock):
+        store, clock = store_and_clock
+        store.set("k", 1, ttl_seconds=60)
+
+        clock.now += 50
+        assert store.touch("k", 60) is True
+
+        clock.now += 50
+        assert store.get("k") == 1
+
+        clock.now += 11
+        assert store.get("k") is None
+
+    def test_pop_and_delete(self, store_and_clock):
+        store, _ = store_and_clock
+        store.set("k", "v")
+
+        assert store.pop("k") == "v"
+        assert store.get("k") is None
+        assert store.pop("k") is None
+
+    def test_count_by_prefix_skips_expired(self, store_and_clock):
+        store, clock = store_and_clock
+        store.set("a:1", 1)
+        store.set("a:2", 2, ttl_seconds=10)
+        store.set("b:1", 3)
+
+        assert store.count("a:") == 2
+        clock.now += 11
+        assert store.count("a:") == 1
+        assert store.count("") == 2
+
+
+class TestStateNamespace:
+    def test_dict_style_access(self):
+        pending = StateNamespace(MemoryStateStore(), "signup:", ttl_seconds=600)
+        pending["a@x.com"] = {"otp": "1234"}
+
+        assert "a@x.com" in pending
+        assert pending.get("a@x.com") == {"otp": "1234"}
+        assert pending.get("b@x.com") is None
+        assert len(pending) == 1
+
+        del pending["a@x.com"]
+        assert "a@x.com" not in pending
+        with pytest.raises(KeyError):
+            del pending["a@x.com"]
+
+    def test_namespaces_do_not_collide(self):
+        store = MemoryStateStore()
+        managers = StateNamespace(store, "signup:manager:")
+        drivers = StateNamespace(store, "signup:driver:")
+
+        managers["a@x.com"] = {"role": "manager"}
+        assert drivers.get("a@x.com") is None
+
+    def test_entries_expire_with_ttl(self):
+        clock = FakeClock()
+        pending = StateNamespace(MemoryStateStore(clock=clock), "signup:", ttl_seconds=600)
+        pending["a@x.com"] = {"otp": "1234"}
+
+        clock.now += 601
+        assert pending.get("a@x.com") is None
+
+
+class TestSQLiteStateStoreSharing:
+    def test_two_instances_share_one_file(self, tmp_path):
+        path = str(tmp_path / "state.db")
+        worker_a = SQLiteStateStore(path)
+        worker_b = SQLiteStateStore(path)
+
+        worker_a.set("signup:a@x.com", {"otp": "1234"})
+        assert worker_b.get("signup:a@x.com") == {"otp": "1234"}
+
+        worker_b.delete("signup:a@x.com")
+        assert worker_a.get("signup:a@x.com") is None
+
+    def test_visible_across_processes(self, tmp_path):
+        path = str(tmp_path / "state.db")
+        store = SQLiteStateStore(path)
+
+        subprocess.run(
+            [
+                sys.executable, "-c",
+                "import sys; from utils.state_store import SQLiteStateStore;"
+                "SQLiteStateStore(sys.argv[1]).set('from-child', {'pid': 1})",
+                path,
+            ],
+            cwd=BACKEND_DIR,
+            check=True,
+        )
+
+        assert store.get("from-child") == {"pid": 1}
+
+    def test_close_closes_every_threads_connection(self, tmp_path):
+        store = SQLiteStateStore(str(tmp_path / "state.db"))
+        store.set("main", 1)
+        opened = []
+
+        def worker():
+            store.set("worker", 2)
+            opened.append(store._local.conn)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        store.close()
+        with pytest.raises(sqlite3.ProgrammingError):
+            opened[0].execute("SELECT 1")
+        # usable again on a fresh connection
+        assert store.get("worker") == 2
+        store.close()
+
+    def test_purge_expired(self, tmp_path):
+        clock = FakeClock()
+        store = SQLiteStateStore(str(tmp_path / "state.db"), clock=clock)
+        store.set("a", 1, ttl_seconds=5)
+        store.set("b", 2)
+
+        clock.now += 6
+        assert store.purge_expired() == 1
+        assert store.get("b") == 2
+
+
+def test_state_store_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+    class Partial(StateStore):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+class TestCreateStateStore:
+    def test_memory_default(self):
+        assert isinstance(create_state_store(None), MemoryStateStore)
+        assert isinstance(create_state_store("memory://"), MemoryStateStore)
+
+    def test_sqlite_url(self, tmp_path):
+        store = create_state_store(f"sqlite:///{tmp_path / 'state.db'}")
+        assert isinstance(store, SQLiteStateStore)
+        store.close()
+
+    def test_unknown_scheme(self):
+        with pytest.raises(ValueError):
+            create_state_store("etcd://localhost")
@@ -7,12 +7,21 @@ from dotenv import load_dotenv
 load_dotenv()
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+    return user_from_token(credentials.credentials)
+
+def get_optional_user(credentials: HTTPAuthorizationCredentials = Depends(optional_security)):
+    """The signed-in user, or None when the request carries no bearer token."""
+    if credentials is None:
+        return None
+    return user_from_token(credentials.credentials)
+
+def user_from_token(token):
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get("sub")
@@ -0,0 +1,220 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from sqlalchemy import insert
+
+from models.trip_trace_db import TripTracePointDB
+
+# buffered rows are tuples in this column order
+COLUMNS = (
+    "session_id", "trip_id", "recorded_at",
+    "latitude", "longitude", "speed_kmh", "heading",
+)
+
+
+class BreadcrumbLog:
+    """
+    Buffered, append-only log of navigation pings (trip_trace_points).
+
+    record() only appends a tuple to the session's in-memory buffer, so the
+    location_update hot path never touches the database. A background thread
+    (started on first use) writes everything buffered in one bulk INSERT when
+    flush_size pings are waiting or every flush_interval seconds.
+    flush_session() writes one session's pings synchronously and returns once
+    they are committed; the controller calls it when a trip ends.
+
+    If the database is unavailable, pings stay buffered and are retried on the
+    next flush; past max_buffered the oldest ones are dropped (and counted) so
+    an outage cannot exhaust memory. Session buffers are kept in the order
+    they started, so dropping takes the front ones without any sorting.
+
+    Stored pings are ordered within a session by recorded_at (the fix time)
+    and then by the table's identity key, which also keeps arrival order for
+    pings sent by different workers.
+    """
+
+    def __init__(self, session_factory, flush_size=1000, flush_interval=5.0, max_buffered=200000, clock=time.time):
+        if flush_size <= 0:
+            raise ValueError("flush_size must be positive")
+        if flush_interval <= 0:
+            raise ValueError("flush_interval must be positive")
+
+        self.session_factory = session_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max(max_buffered, flush_size)
+        self.clock = clock
+
+        # session id -> deque of rows, oldest buffer first
+        self._buffers = OrderedDict()
+        self._buffered = 0
+        self._lock = threading.Lock()
+        # one writer at a time, so flush_session also waits for an in-progress flush
+        self._write_lock = threading.Lock()
+
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+        self.recorded = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    def record(self, session_id, latitude, longitude, speed_kmh=None, heading=None, timestamp=None, trip_id=None):
+        row = (
+            session_id,
+            trip_id,
+            float(timestamp) if timestamp is not None else self.clock(),
+            float(latitude),
+            float(longitude),
+            speed_kmh,
+            heading,
+        )
+
+        with self._lock:
+            rows = self._buffers.get(session_id)
+            if rows is None:
+                rows = self._buffers[session_id] = deque()
+            rows.append(row)
+            self._buffered += 1
+            self.recorded += 1
+            if self._buffered > self.max_buffered:
+                self._drop_oldest_locked(self._buffered - self.max_buffered)
+            full = self._buffered >= self.flush_size
+
+        if self._thread is None:
+            self._start()
+        if full:
+            self._wake.set()
+
+    def _drop_oldest_locked(self, count):
+        # from the front of the buffers that have waited longest
+        while count > 0 and self._buffers:
+            session_id, rows = next(iter(self._buffers.items()))
+            n = min(count, len(rows))
+            for _ in range(n):
+                rows.popleft()
+            if not rows:
+                del self._buffers[session_id]
+            self._buffered -= n
+            self.dropped += n
+            count -= n
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None or self._stopped:
+                return
+            self._thread = threading.Thread(target=self._run, name="breadcrumb-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _take(self, session_id=None):
+        with self._lock:
+            if session_id is None:
+                buffers, self._buffers = self._buffers, OrderedDict()
+            else:
+                rows = self._buffers.pop(session_id, None)
+                buffers = {session_id: rows} if rows else {}
+            self._buffered -= sum(len(rows) for rows in buffers.values())
+            return buffers
+
+    def _restore(self, buffers):
+        with self._lock:
+            # older than anything recorded since they were taken: back to the front
+            for session_id, rows in reversed(buffers.items()):
+                newer = self._buffers.get(session_id)
+                if newer is not None:
+                    rows.extend(newer)
+                self._buffers[session_id] = rows
+                self._buffers.move_to_end(session_id, last=False)
+                self._buffered += len(rows) - (len(newer) if newer is not None else 0)
+            if self._buffered > self.max_buffered:
+                self._drop_oldest_locked(self._buffered - self.max_buffered)
+
+    @staticmethod
+    def _insert_statement(dialect):
+        return insert(TripTracePointDB.__table__).compile(dialect=dialect, column_keys=list(COLUMNS))
+
+    def _write(self, buffers):
+        rows = [row for session_rows in buffers.values() for row in session_rows]
+        if not rows:
+            return 0
+
+        db = self.session_factory()
+        try:
+            connection = db.connection()
+            statement = self._insert_statement(connection.dialect)
+            if statement.positional:
+                # straight to the driver's executemany: the buffered tuples are
+                # already parameter rows, so no per-row dicts or ORM work
+                connection.exec_driver_sql(str(statement), rows)
+            else:
+                connection.execute(
+                    insert(TripTracePointDB.__table__),
+                    [dict(zip(COLUMNS, row)) for row in rows],
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        return len(rows)
+
+    def _flush(self, session_id=None):
+        with self._write_lock:
+            buffers = self._take(session_id)
+            if not buffers:
+                return 0
+            try:
+                written = self._write(buffers)
+            except Exception:
+                self.failed_flushes += 1
+                self._restore(buffers)
+                raise
+            self.written += written
+            self.flushes += 1
+            return written
+
+    def flush(self):
+        """Write every buffered ping now; returns how many were written (0 on failure)."""
+        try:
+            return self._flush()
+        except Exception:
+            return 0
+
+    def flush_session(self, session_id):
+        """Write one session's pings and return once committed (raises if the write fails)."""
+        return self._flush(session_id)
+
+    def close(self):
+        """Stop the background thread and write what is left."""
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        return self.flush()
+
+    def __len__(self):
+        return self._buffered
+
+    def stats(self):
+        return {
+            "buffered": self._buffered,
+            "recorded": self.recorded,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "flush_size": self.flush_size,
+            "flush_interval": self.flush_interval,
+        }
@@ -0,0 +1,218 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class ExecutorSaturated(Exception):
+    """Raised by InferenceExecutor.submit when the queue is full."""
+
+
+def _timed(fn, args):
+    # runs in the worker; CLOCK_MONOTONIC is system-wide, so the timestamps
+    # compare with the submitting process's even in a process pool
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic()
+
+
+class _Timings:
+    """Running count / total / max plus a window of recent samples for percentiles."""
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self.recent)
+
+        def percentile(q):
+            return round(recent[min(len(recent) - 1, int(len(recent) * q))] * 1000, 3) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class InferenceExecutor:
+    """
+    Bounded pool for CPU-heavy model inference, kept apart from the event
+    loop and from the shared threadpool that serves the sync endpoints.
+
+    kind="thread" runs calls on max_workers threads of this process;
+    kind="process" runs them in max_workers worker processes (spawned, each
+    set up by initializer(*initargs)), so inference does not hold this
+    process's GIL. In that case fn and its arguments must be picklable.
+
+    At most max_workers calls run and max_queue more wait; submit() raises
+    ExecutorSaturated beyond that instead of queueing without limit, so a
+    burst is shed (503) rather than growing latency for everyone. Calls
+    whose caller went away still count until they finish.
+
+    A pool that breaks (a worker process killed or crashing, an initializer
+    failing) refuses every later call, so it is dropped and the next call
+    starts a fresh one; the calls it was running fail with BrokenExecutor.
+
+    stats() reports queue wait (submit to start) and execution time, over
+    everything and over the last timing_window calls.
+    """
+
+    def __init__(self, kind="thread", max_workers=2, max_queue=32, initializer=None, initargs=(),
+                 timing_window=1000):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"kind must be one of {EXECUTOR_KINDS}")
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+        if max_queue < 0:
+            raise ValueError("max_queue must not be negative")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self.in_flight = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.broken = 0
+        self.queue_wait = _Timings(timing_window)
+        self.execution = _Timings(timing_window)
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def _create_pool(self):
+        if self.kind == "process":
+            # spawn, not fork: the server process has running threads
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+                initargs=self.initargs,
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="inference",
+            initializer=self.initializer,
+            initargs=self.initargs,
+        )
+
+    def _reserve(self):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise ExecutorSaturated(
+                    f"Inference queue is full ({self.in_flight} of {self.capacity} in flight)"
+                )
+            self.in_flight += 1
+            self.submitted += 1
+
+    def _current_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._create_pool()
+            return self._pool
+
+    def _drop_broken(self, pool):
+        # a broken pool has already stopped its workers; just stop using it
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self.broken += 1
+
+    def _submit(self, call):
+        pool = self._current_pool()
+        try:
+            return pool, pool.submit(*call)
+        except BrokenExecutor:
+            # broke under an earlier call before its callback dropped it; nothing ran
+            self._drop_broken(pool)
+            pool = self._current_pool()
+            return pool, pool.submit(*call)
+
+    def _done(self, pool, submitted_at, future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenExecutor):
+            self._drop_broken(pool)
+
+        with self._lock:
+            self.in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+                return
+            _, started, finished = future.result()
+            self.completed += 1
+            self.queue_wait.add(max(0.0, started - submitted_at))
+            self.execution.add(finished - started)
+
+    async def submit(self, fn, *args):
+        """Run fn(*args) on the pool and return its result (ExecutorSaturated if full)."""
+
+        self._reserve()
+        submitted_at = time.monotonic()
+        try:
+            pool, future = self._submit((_timed, fn, args))
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+                self.failed += 1
+            raise
+        future.add_done_callback(lambda f: self._done(pool, submitted_at, f))
+
+        result, _, _ = await asyncio.wrap_future(future)
+        return result
+
+    def restart(self):
+        """Replace the pool (new workers re-run initializer); running calls finish on the old one."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self.restarts += 1
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.max_workers),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "broken": self.broken,
+                "queue_wait": self.queue_wait.summary(),
+                "execution": self.execution.summary(),
+            }
@@ -0,0 +1,343 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from models.Navigation import Navigation
+from models.route_segments import route_hash
+
+
+class _Session:
+    __slots__ = ("nav", "last_seen")
+
+    def __init__(self, nav, last_seen):
+        self.nav = nav
+        self.last_seen = last_seen
+
+
+class NavigationSessionStore:
+    """
+    Live Navigation state per driver/session id.
+
+    Sessions idle for longer than ttl_seconds are dropped, and at most
+    max_sessions are kept (the least recently seen one is evicted to make room).
+    Sessions are kept in least-recently-seen order, so eviction and sweeping
+    only touch the oldest entries. The lock guards that order (O(1) per
+    lookup); the Navigation objects themselves are updated without it,
+    because each session is driven by a single driver and updates for
+    different drivers never touch shared state.
+
+    on_expire(session_id), if set, is called (outside the lock) for every
+    session dropped as idle or evicted, so per-session state kept elsewhere
+    can go with it.
+    """
+
+    def __init__(self, ttl_seconds=1800, max_sessions=10000, clock=time.monotonic, factory=Navigation,
+                 on_expire=None):
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+        if max_sessions <= 0:
+            raise ValueError("max_sessions must be positive")
+
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.factory = factory
+        self.on_expire = on_expire
+
+        # session id -> _Session, least recently seen first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = clock()
+
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _is_expired(self, session, now):
+        return now - session.last_seen > self.ttl_seconds
+
+    def _notify(self, dropped):
+        if self.on_expire is not None:
+            for session_id in dropped:
+                self.on_expire(session_id)
+
+    def get(self, session_id):
+        """Return the session's Navigation (marking it active), or None."""
+        now = self.clock()
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+
+            if not self._is_expired(session, now):
+                session.last_seen = now
+                self._sessions.move_to_end(session_id)
+                return session.nav
+
+            del self._sessions[session_id]
+            self.expired += 1
+
+        self._notify([session_id])
+        return None
+
+    def get_or_create(self, session_id):
+        nav = self.get(session_id)
+        if nav is not None:
+            return nav
+
+        dropped = []
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                now = self.clock()
+                if now - self._last_sweep >= self.ttl_seconds:
+                    self._sweep_locked(now, dropped)
+
+                if len(self._sessions) >= self.max_sessions:
+                    self._sweep_locked(now, dropped)
+                    while len(self._sessions) >= self.max_sessions:
+                        dropped.append(self._sessions.popitem(last=False)[0])
+                        self.evicted += 1
+
+                session = _Session(self.factory(), now)
+                self._sessions[session_id] = session
+                self.created += 1
+
+        self._notify(dropped)
+        return session.nav
+
+    def save(self, session_id, nav):
+        """Sessions live in this process, so updates are already visible."""
+
+    def remove(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _sweep_locked(self, now, dropped):
+        # oldest first, so stop at the first session still in use
+        removed = 0
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if not self._is_expired(session, now):
+                break
+            dropped.append(self._sessions.popitem(last=False)[0])
+            removed += 1
+        self.expired += removed
+        self._last_sweep = now
+        return removed
+
+    def sweep(self):
+        """Drop every idle session now; returns how many were removed."""
+        dropped = []
+        with self._lock:
+            removed = self._sweep_locked(self.clock(), dropped)
+        self._notify(dropped)
+        return removed
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def stats(self):
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+class _CachedRoute:
+    __slots__ = ("nav", "version", "generation", "touched")
+
+    def __init__(self, nav, version, generation, touched):
+        self.nav = nav
+        self.version = version
+        self.generation = generation
+        self.touched = touched
+
+
+class SharedNavigationSessionStore:
+    """
+    Navigation sessions kept in a StateStore, so any API worker (process or
+    host) can serve any driver.
+
+    Two keys per session, and one per route:
+      - navroute:<id>    route hash, base duration and trip, written only
+                         when the route changes, tagged with a random version;
+      - navlive:<id>     live fields (last snap, speed, ETA, ...) plus the
+                         route version, rewritten after every update;
+      - navgeom:<hash>   the route's coordinates, written once for every
+                         session (on every worker) that drives that route.
+    Each worker keeps an LRU of Navigation objects whose route it has already
+    built; on a lookup it reads the live key and, if the cached route version
+    still matches, just applies the live fields, so the RouteSegments arrays
+    are rebuilt only when a worker sees a route for the first time (and not
+    even then if `routes`, a RouteGeometryCache, already holds its hash).
+
+    Callers mutate the returned Navigation and then call save(). Two workers
+    updating the same session at the same instant is last-write-wins, the
+    same as one driver's fixes arriving out of order.
+
+    Sessions expire in the backend; on_expire(session_id), if set, is called
+    when this worker finds that a session it had loaded is gone.
+    """
+
+    LIVE_PREFIX = "navlive:"
+    ROUTE_PREFIX = "navroute:"
+    GEOMETRY_PREFIX = "navgeom:"
+
+    def __init__(self, backend, ttl_seconds=1800, cache_size=1000, clock=time.monotonic, factory=Navigation,
+                 routes=None, on_expire=None):
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+        if cache_size <= 0:
+            raise ValueError("cache_size must be positive")
+
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self.clock = clock
+        self.factory = factory
+        self.routes = routes
+        self.on_expire = on_expire
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.route_loads = 0
+        self.cache_hits = 0
+
+    def _cached(self, session_id):
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                self._cache.move_to_end(session_id)
+            return entry
+
+    def _remember(self, session_id, entry):
+        with self._lock:
+            self._cache[session_id] = entry
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, session_id):
+        with self._lock:
+            return self._cache.pop(session_id, None) is not None
+
+    def get(self, session_id):
+        """Return the session's Navigation with the latest shared state, or None."""
+        live = self.backend.get(self.LIVE_PREFIX + session_id)
+        if live is None:
+            if self._forget(session_id) and self.on_expire is not None:
+                self.on_expire(session_id)
+            return None
+
+        version = live.pop("route_version", None)
+        entry = self._cached(session_id)
+
+        if entry is not None and entry.version == version:
+            self.cache_hits += 1
+            entry.nav.apply_live_state(live)
+            return entry.nav
+
+        route = self.backend.get(self.ROUTE_PREFIX + session_id) if version else None
+        if version and (route is None or route.get("version") != version):
+            # route expired or replaced under us; treat the session as gone
+            self._forget(session_id)
+            return None
+
+        segments = None
+        if route is not None:
+            segments = self.routes.get(route["routeHash"]) if self.routes is not None else None
+            if segments is None:
+                coords = self.backend.get(self.GEOMETRY_PREFIX + route["routeHash"])
+                if coords is None:
+                    self._forget(session_id)
+                    return None
+                route = {**route, "coords": coords}
+
+        nav = self.factory.from_state(route, live, self.routes, segments)
+        self.route_loads += 1
+        self._remember(session_id, _CachedRoute(nav, version, nav.routeGeneration, self.clock()))
+        return nav
+
+    def get_or_create(self, session_id):
+        nav = self.get(session_id)
+        if nav is not None:
+            return nav
+
+        nav = self.factory()
+        self.save(session_id, nav)
+        self.created += 1
+        return nav
+
+    def save(self, session_id, nav):
+        """Publish nav's state; the route is rewritten only if it changed."""
+        now = self.clock()
+        entry = self._cached(session_id)
+
+        if entry is None or entry.nav is not nav or entry.generation != nav.routeGeneration:
+            version = None
+            if nav.routeSegments is not None:
+                version = uuid.uuid4().hex
+                route = {"version": version, **nav.route_state(), "routeHash": self._route_id(nav)}
+                self._publish_geometry(route["routeHash"], nav)
+                self.backend.set(self.ROUTE_PREFIX + session_id, route, self.ttl_seconds)
+            entry = _CachedRoute(nav, version, nav.routeGeneration, now)
+            self._remember(session_id, entry)
+
+        elif entry.version is not None and now - entry.touched >= self.ttl_seconds / 4:
+            # keep the route alive as long as the live key is
+            self.backend.touch(self.ROUTE_PREFIX + session_id, self.ttl_seconds)
+            self._publish_geometry(self._route_id(nav), nav)
+            entry.touched = now
+
+        self.backend.set(
+            self.LIVE_PREFIX + session_id,
+            {"route_version": entry.version, **nav.live_state()},
+            self.ttl_seconds,
+        )
+
+    @staticmethod
+    def _route_id(nav):
+        if nav.routeHash is not None:
+            return nav.routeHash
+        n = nav.routeSegments.vertex_count
+        return route_hash(nav.routeSegments.lat[:n], nav.routeSegments.lng[:n])
+
+    def _publish_geometry(self, route_id, nav):
+        """Write the route's coordinates unless another session already has (refreshing their TTL)."""
+        if not self.backend.touch(self.GEOMETRY_PREFIX + route_id, self.ttl_seconds):
+            self.backend.set(self.GEOMETRY_PREFIX + route_id, nav.route_coords_list(), self.ttl_seconds)
+
+    def remove(self, session_id):
+        # the geometry may be shared with other sessions; it expires on its own
+        self._forget(session_id)
+        self.backend.delete(self.ROUTE_PREFIX + session_id)
+        return self.backend.delete(self.LIVE_PREFIX + session_id)
+
+    def __len__(self):
+        return self.backend.count(self.LIVE_PREFIX)
+
+    def __contains__(self, session_id):
+        return self.backend.get(self.LIVE_PREFIX + session_id) is not None
+
+    def stats(self):
+        return {
+            "active": len(self),
+            "ttl_seconds": self.ttl_seconds,
+            "cached_routes": len(self._cache),
+            "cache_size": self.cache_size,
+            "created": self.created,
+            "route_loads": self.route_loads,
+            "cache_hits": self.cache_hits,
+        }
@@ -0,0 +1,130 @@
+import numpy as np
+
+# Google encoded polyline format:
+# https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+#
+# Each coordinate delta is zigzag-encoded and split into 5-bit chunks, offset by
+# 63. A chunk < 0x20 terminates a value. Instead of walking the string one
+# character at a time, we find every terminator at once, sum the shifted chunks
+# of each value with np.add.reduceat, and rebuild absolute coordinates with a
+# cumulative sum (reset at each polyline boundary for batch decoding).
+
+PRECISION = 1e5
+
+# 12 chunks = 60 bits; a real coordinate delta never needs more than 7
+MAX_CHUNKS_PER_VALUE = 12
+
+LAT_LNG = "latlng"
+LNG_LAT = "lnglat"
+
+
+def _to_chunks(encoded_polylines):
+    try:
+        raw = [p.encode("ascii") for p in encoded_polylines]
+    except (AttributeError, UnicodeEncodeError) as e:
+        raise ValueError(f"Polyline is not an ASCII string: {e}")
+
+    lengths = np.fromiter((len(r) for r in raw), dtype=np.int64, count=len(raw))
+    chunks = np.frombuffer(b"".join(raw), dtype=np.uint8).astype(np.int64) - 63
+    return chunks, lengths
+
+
+def decode_polylines(encoded_polylines, order=LAT_LNG):
+    """
+    Decode several encoded polylines in one pass.
+
+    Returns (points, offsets): points is a C-contiguous float64 array of shape
+    (N, 2) holding every decoded vertex, and polyline k occupies
+    points[offsets[k]:offsets[k + 1]].
+    order is "latlng" (Google's order) or "lnglat" (GeoJSON / map order).
+    Output is identical to decoding each string with the scalar algorithm.
+    """
+    if order not in (LAT_LNG, LNG_LAT):
+        raise ValueError(f"Unknown axis order '{order}'")
+
+    chunks, lengths = _to_chunks(encoded_polylines)
+    polyline_count = len(lengths)
+
+    if chunks.size == 0:
+        return np.empty((0, 2), dtype=np.float64), np.zeros(polyline_count + 1, dtype=np.int64)
+
+    is_terminator = chunks < 32
+    char_ends = np.cumsum(lengths)
+
+    # every non-empty polyline must end on a terminator, or a value would
+    # spill over into the next polyline
+    non_empty = lengths > 0
+    if not is_terminator[char_ends[non_empty] - 1].all():
+        raise ValueError("Polyline ends in the middle of a value")
+
+    terminator_positions = np.flatnonzero(is_terminator)
+    value_starts = np.empty_like(terminator_positions)
+    value_starts[0] = 0
+    value_starts[1:] = terminator_positions[:-1] + 1
+
+    value_ids = np.repeat(
+        np.arange(terminator_positions.size),
+        terminator_positions - value_starts + 1,
+    )
+    chunk_positions = np.arange(chunks.size) - value_starts[value_ids]
+
+    if chunk_positions.max() >= MAX_CHUNKS_PER_VALUE:
+        raise ValueError("Polyline value is too long")
+
+    shifted = (chunks & 0x1F) << (5 * chunk_positions)
+    values = np.add.reduceat(shifted, value_starts)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # values per polyline must pair up into (lat, lng)
+    values_per_polyline = np.diff(
+        np.concatenate(([0], np.searchsorted(terminator_positions, char_ends)))
+    )
+    if (values_per_polyline % 2).any():
+        raise ValueError("Polyline has an unpaired coordinate")
+
+    points_per_polyline = values_per_polyline // 2
+    offsets = np.zeros(polyline_count + 1, dtype=np.int64)
+    np.cumsum(points_per_polyline, out=offsets[1:])
+
+    totals = np.cumsum(deltas.reshape(-1, 2), axis=0)
+
+    # restart the running sum at the first vertex of each polyline
+    if polyline_count > 1:
+        previous_totals = np.zeros((polyline_count, 2), dtype=np.int64)
+        has_previous = offsets[:-1] > 0
+        previous_totals[has_previous] = totals[offsets[:-1][has_previous] - 1]
+        totals -= np.repeat(previous_totals, points_per_polyline, axis=0)
+
+    if order == LNG_LAT:
+        totals = totals[:, ::-1]
+
+    return np.ascontiguousarray(totals / PRECISION), offsets
+
+
+def decode_polyline(encoded_polyline, order=LAT_LNG):
+    """Decode a single encoded polyline into an (N, 2) float64 array."""
+    points, _ = decode_polylines([encoded_polyline], order=order)
+    return points
+
+
+def encode_polyline(points):
+    """Encode (lat, lng) pairs. Used by tests and benchmarks to build inputs."""
+    encoded = []
+    previous_lat = 0
+    previous_lng = 0
+
+    for lat, lng in points:
+        lat_e5 = int(round(lat * PRECISION))
+        lng_e5 = int(round(lng * PRECISION))
+
+        for delta in (lat_e5 - previous_lat, lng_e5 - previous_lng):
+            value = ~(delta << 1) if delta < 0 else (delta << 1)
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+
+        previous_lat = lat_e5
+        previous_lng = lng_e5
+
+    return "".join(encoded)
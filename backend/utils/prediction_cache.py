@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Default quantization steps for the continuous features: rows that differ by
+# less than a step (100 m of distance, 1 km/h of speed, half a degree)
+# share a prediction. Every other feature is matched exactly.
+DEFAULT_QUANTIZATION = {
+    "Distance_km": 0.1,
+    "Speed": 1.0,
+    "Temperature": 0.5,
+    "Humidity": 1.0,
+    "Wind Speed": 1.0,
+}
+
+
+class PredictionCache:
+    """
+    TTL + LRU cache of model outputs per encoded feature row.
+
+    Routes between the same depots at the same hour encode to nearly the same
+    feature vector. The key is a hash of the row with the continuous columns
+    snapped to a grid (quantization: column -> step), so such routes reuse the
+    first prediction made for their cell. Values are whatever the engine
+    stores per row (its predicted CO2e and class probabilities) and must be
+    treated as read-only. The engine clears the cache when it reloads models.
+    """
+
+    def __init__(self, feature_columns, quantization=None, ttl_seconds=600, max_entries=10000, clock=time.monotonic):
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+
+        quantization = DEFAULT_QUANTIZATION if quantization is None else quantization
+        unknown = set(quantization) - set(feature_columns)
+        if unknown:
+            raise ValueError(f"Unknown quantized columns: {sorted(unknown)}")
+        if any(step <= 0 for step in quantization.values()):
+            raise ValueError("quantization steps must be positive")
+
+        self.feature_columns = list(feature_columns)
+        self.quantization = dict(quantization)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+
+        # per-column divisor; 0 marks columns compared exactly
+        self._steps = np.array([self.quantization.get(name, 0.0) for name in self.feature_columns])
+        self._quantized = self._steps > 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def make_keys(self, features):
+        """One key per row of a (rows, len(feature_columns)) feature array."""
+        grid = np.array(features, dtype=np.float64)
+        grid[:, self._quantized] = np.round(grid[:, self._quantized] / self._steps[self._quantized])
+        # -0.0 and 0.0 must hash alike
+        grid += 0.0
+        return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in grid]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (models changed, so no cached output is valid)."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "quantization": self.quantization,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
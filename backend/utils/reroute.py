@@ -0,0 +1,100 @@
+import math
+import time
+
+from models.local_projection import METERS_PER_DEG_LAT
+from utils.route_cache import RouteCache
+from utils.singleflight import SingleFlight
+
+
+class Rerouter:
+    """
+    New routes for drivers who left theirs.
+
+    fetch_route(origin, destination) is an async callable returning
+    {"coordinates": [[lat, lng], ...], "duration", "distance_km"}
+    (TripController.fetch_route_between in the app). On top of it:
+      - one fetch at a time per session: pings that arrive while a reroute is
+        in flight wait for it instead of starting another;
+      - results are cached by the origin's and destination's grid cells (and
+        RouteCache's time-of-day bucket), so drivers taking the same detour,
+        e.g. around a closed road, reuse one fetch;
+      - after a failed fetch the session waits retry_seconds before trying again
+        (failures older than that are dropped, oldest first, as new ones come in).
+    """
+
+    def __init__(self, fetch_route, cache=None, cell_meters=40.0, retry_seconds=15.0, clock=time.monotonic):
+        if cell_meters <= 0:
+            raise ValueError("cell_meters must be positive")
+
+        self.fetch_route = fetch_route
+        self.cache = cache if cache is not None else RouteCache(ttl_seconds=900, max_entries=1024)
+        self.cell_meters = cell_meters
+        self.retry_seconds = retry_seconds
+        self.clock = clock
+        self.singleflight = SingleFlight()
+
+        self._failed_at = {}
+
+        self.fetches = 0
+        self.failures = 0
+
+    def _cell(self, point):
+        lat_step = self.cell_meters / METERS_PER_DEG_LAT
+        lng_step = lat_step / max(math.cos(math.radians(point.latitude)), 0.01)
+        return math.floor(point.latitude / lat_step), math.floor(point.longitude / lng_step)
+
+    def make_key(self, origin, destination):
+        return ("reroute", self._cell(origin), self._cell(destination), self.cache.time_bucket())
+
+    async def reroute(self, session_id, origin, destination):
+        """Route from origin (the driver) to destination, or None if unavailable right now."""
+        key = self.make_key(origin, destination)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        failed_at = self._failed_at.get(session_id)
+        if failed_at is not None and self.clock() - failed_at < self.retry_seconds:
+            return None
+
+        async def fetch():
+            self.fetches += 1
+            try:
+                route = await self.fetch_route(
+                    {"latitude": origin.latitude, "longitude": origin.longitude},
+                    {"latitude": destination.latitude, "longitude": destination.longitude},
+                )
+            except Exception:
+                self.failures += 1
+                self._record_failure(session_id, self.clock())
+                return None
+
+            self._failed_at.pop(session_id, None)
+            self.cache.put(key, route)
+            return route
+
+        return await self.singleflight.do(session_id, fetch)
+
+    def _record_failure(self, session_id, now):
+        # re-inserted at the end, so the dict stays in failure-time order
+        self._failed_at.pop(session_id, None)
+        self._failed_at[session_id] = now
+
+        while self._failed_at:
+            oldest, failed_at = next(iter(self._failed_at.items()))
+            if now - failed_at < self.retry_seconds:
+                break
+            del self._failed_at[oldest]
+
+    def forget(self, session_id):
+        """Drop per-session state (the session ended or expired)."""
+        self._failed_at.pop(session_id, None)
+
+    def stats(self):
+        return {
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "backing_off": len(self._failed_at),
+            "deduplicated": self.singleflight.coalesced,
+            "cache": self.cache.stats(),
+        }
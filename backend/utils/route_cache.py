@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+class RouteCache:
+    """
+    TTL + LRU cache for raw Google Routes responses.
+
+    Entries are keyed by the normalized trip endpoints, the routing options sent
+    to Google and a time-of-day bucket (traffic-aware routes change over the
+    day). Only the raw Google payload is stored, so emissions for any
+    vehicle/fuel/year can be recomputed from a hit. Cached payloads are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self, ttl_seconds=900, max_entries=1024, bucket_minutes=15, clock=time.monotonic):
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        if bucket_minutes <= 0:
+            raise ValueError("bucket_minutes must be positive")
+
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.bucket_minutes = bucket_minutes
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def normalize_place(value):
+        return " ".join(str(value or "").split()).lower()
+
+    def time_bucket(self, now=None):
+        now = now or datetime.now()
+        return (now.hour * 60 + now.minute) // self.bucket_minutes
+
+    def make_key(self, origin, destination, city, routing_options, now=None):
+        return (
+            self.normalize_place(origin),
+            self.normalize_place(destination),
+            self.normalize_place(city),
+            json.dumps(routing_options, sort_keys=True, separators=(",", ":")),
+            self.time_bucket(now),
+        )
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl_seconds, payload)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
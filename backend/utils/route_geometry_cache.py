@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+from models.route_segments import RouteSegments, route_hash
+
+
+class RouteGeometryCache:
+    """
+    LRU cache of initialized route geometry (RouteSegments), keyed by the
+    content hash of the route's coordinates.
+
+    Drivers running the same depot routes share one read-only copy of the
+    projected segment arrays instead of each session building its own, and a
+    client that already sent a route can start another session on it by hash
+    alone. Entries are frozen before they are shared; evicting one only drops
+    the cache's reference, sessions using it keep theirs.
+    """
+
+    def __init__(self, max_entries=256):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Cached RouteSegments for a route hash, or None."""
+        with self._lock:
+            segments = self._entries.get(key)
+            if segments is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return segments
+
+    def put(self, key, segments):
+        segments.freeze()
+        with self._lock:
+            self._entries[key] = segments
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return segments
+
+    def get_or_build(self, latitudes, longitudes):
+        """(route hash, shared RouteSegments) for these coordinates, building them on a miss."""
+        key = route_hash(latitudes, longitudes)
+        segments = self.get(key)
+        if segments is None:
+            segments = self.put(key, RouteSegments.from_arrays(latitudes, longitudes))
+        return key, segments
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(segments.nbytes for segments in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import httpx
+
+GOOGLE_ROUTES_URL = "https://routes.googleapis.com/directions/v2:computeRoutes"
+
+
+class GoogleRoutesClient:
+    """
+    Shared async HTTP client for the Google Routes API.
+
+    One pooled httpx.AsyncClient (keep-alive connections, connect/read/pool
+    timeouts) plus a semaphore bounding how many route requests are in flight
+    at once. asyncio primitives are bound to the event loop that first uses
+    them, so the client and semaphore are (re)created lazily per running loop;
+    under uvicorn that is a single loop for the life of the worker. Each
+    client is closed on its own loop when that loop shuts down, and using the
+    client from a second loop while the first is still running is refused.
+    """
+
+    def __init__(
+        self,
+        url=GOOGLE_ROUTES_URL,
+        connect_timeout=3.0,
+        read_timeout=10.0,
+        pool_timeout=5.0,
+        max_connections=50,
+        max_keepalive_connections=20,
+        keepalive_expiry=30.0,
+        max_concurrency=50,
+        transport=None,
+    ):
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+
+        self.url = url
+        self.timeout = httpx.Timeout(
+            read_timeout,
+            connect=connect_timeout,
+            pool=pool_timeout,
+        )
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.max_concurrency = max_concurrency
+        self.transport = transport
+
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._closer = None
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.in_flight = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _bind_to_running_loop(self):
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            if self._loop is not loop or self._client is None:
+                if self._loop is not None and self._loop is not loop and self._loop.is_running():
+                    raise RuntimeError("GoogleRoutesClient is in use by another running event loop")
+
+                self._client = httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=self.limits,
+                    transport=self.transport,
+                )
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._loop = loop
+                self._closer = loop.create_task(self._close_when_loop_ends(self._client))
+
+            return self._client, self._semaphore
+
+    @staticmethod
+    async def _close_when_loop_ends(client):
+        # cancelled with the loop's other tasks at shutdown (asyncio.run,
+        # uvicorn); the connection pool can only be closed on its own loop
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await client.aclose()
+
+    async def compute_routes(self, request_body, request_headers):
+        """POST a computeRoutes request and return the decoded JSON body.
+
+        Raises httpx.HTTPError (including timeouts, non-2xx statuses and
+        bodies that are not JSON).
+        """
+        client, semaphore = self._bind_to_running_loop()
+
+        async with semaphore:
+            self.requests += 1
+            self.in_flight += 1
+            try:
+                response = await client.post(
+                    self.url, json=request_body, headers=request_headers
+                )
+                response.raise_for_status()
+                try:
+                    return response.json()
+                except ValueError as e:
+                    raise httpx.DecodingError(
+                        f"Invalid JSON from Google Routes: {e}", request=response.request
+                    ) from e
+
+            except httpx.TimeoutException:
+                self.timeouts += 1
+                raise
+            except httpx.HTTPError:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    async def aclose(self):
+        client, closer = self._client, self._closer
+        self._client = None
+        self._closer = None
+        self._loop = None
+        if closer is not None:
+            closer.cancel()
+        if client is not None:
+            await client.aclose()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "max_concurrency": self.max_concurrency,
+            "max_connections": self.limits.max_connections,
+        }
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_routes_client():
+    """Process-wide client used when a Trip is not given one explicitly."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = GoogleRoutesClient()
+        return _default_client
@@ -0,0 +1,50 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent coroutine calls that share a key.
+
+    The first caller for a key starts the work as a task; callers arriving while
+    it is still running await the same task instead of starting their own. The
+    task is shielded, so a leader that disconnects does not cancel the work for
+    everyone else. Nothing is cached once the task finishes.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        loop = asyncio.get_running_loop()
+        call = self._calls.get(key)
+
+        if call is not None and call[0] is loop and not call[1].done():
+            self.coalesced += 1
+            return await asyncio.shield(call[1])
+
+        task = loop.create_task(fn())
+        self._calls[key] = (loop, task)
+        self.executions += 1
+
+        def _forget(finished_task):
+            if self._calls.get(key, (None, None))[1] is finished_task:
+                del self._calls[key]
+
+        task.add_done_callback(_forget)
+        return await asyncio.shield(task)
+
+    def in_flight(self):
+        return len(self._calls)
+
+    def stats(self):
+        total = self.executions + self.coalesced
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "upstream_calls_saved": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+            "in_flight": self.in_flight(),
+        }
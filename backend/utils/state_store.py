@@ -0,0 +1,277 @@
+import json
+import math
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+import time
+
+
+class StateStore(ABC):
+    """
+    Key/value store for state that several API workers must share.
+
+    Values are JSON-serializable and stored as JSON, so every backend hands
+    back a fresh copy and nothing depends on living in one process. Keys may
+    carry a TTL in seconds. Implementations:
+      - MemoryStateStore:  one process (the default, same as the old dicts)
+      - SQLiteStateStore:  every worker process on one host
+      - RedisStateStore:   every host, through any redis-py style client
+    """
+
+    @abstractmethod
+    def get(self, key):
+        """Value stored at key, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key, value, ttl_seconds=None):
+        """Store value at key, expiring after ttl_seconds (never if None)."""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove key; True if it existed."""
+
+    @abstractmethod
+    def touch(self, key, ttl_seconds):
+        """Restart key's TTL; True if it existed."""
+
+    @abstractmethod
+    def count(self, prefix=""):
+        """Number of live keys starting with prefix."""
+
+    def pop(self, key):
+        value = self.get(key)
+        if value is not None:
+            self.delete(key)
+        return value
+
+    def close(self):
+        pass
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and now >= entry[1]:
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, self.clock())
+            return None if entry is None else json.loads(entry[0])
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = None if ttl_seconds is None else self.clock() + ttl_seconds
+        encoded = json.dumps(value)
+        with self._lock:
+            self._entries[key] = (encoded, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def touch(self, key, ttl_seconds):
+        with self._lock:
+            now = self.clock()
+            entry = self._live(key, now)
+            if entry is None:
+                return False
+            self._entries[key] = (entry[0], now + ttl_seconds)
+            return True
+
+    def count(self, prefix=""):
+        with self._lock:
+            now = self.clock()
+            return sum(
+                1 for key in list(self._entries)
+                if key.startswith(prefix) and self._live(key, now) is not None
+            )
+
+
+class SQLiteStateStore(StateStore):
+    """
+    State in one SQLite file (WAL mode), shared by every process that opens it.
+
+    Each thread gets its own connection; statements run in autocommit, so each
+    get/set is a single atomic statement. Expired rows are ignored on read and
+    removed lazily. close() closes every thread's connection.
+    """
+
+    def __init__(self, path, clock=time.time, busy_timeout=5.0):
+        self.path = path
+        self.clock = clock
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # only this thread uses it; close() may run on another one
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM state WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and self.clock() >= row[1]:
+            self._conn().execute(
+                "DELETE FROM state WHERE key = ? AND expires_at = ?", (key, row[1])
+            )
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = None if ttl_seconds is None else self.clock() + ttl_seconds
+        self._conn().execute(
+            "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, json.dumps(value), expires_at),
+        )
+
+    def delete(self, key):
+        return self._conn().execute("DELETE FROM state WHERE key = ?", (key,)).rowcount > 0
+
+    def touch(self, key, ttl_seconds):
+        now = self.clock()
+        return self._conn().execute(
+            "UPDATE state SET expires_at = ? "
+            "WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (now + ttl_seconds, key, now),
+        ).rowcount > 0
+
+    def count(self, prefix=""):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM state "
+            "WHERE substr(key, 1, ?) = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (len(prefix), prefix, self.clock()),
+        ).fetchone()[0]
+
+    def purge_expired(self):
+        return self._conn().execute(
+            "DELETE FROM state WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (self.clock(),),
+        ).rowcount
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            # threads that used the store open a new connection on next use
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+
+class RedisStateStore(StateStore):
+    """
+    State in Redis. `client` is anything with the redis-py calls used here:
+    get, set(name, value, ex=None), delete, expire and scan_iter(match=).
+    """
+
+    def __init__(self, client, prefix="greenmile:"):
+        self.client = client
+        self.prefix = prefix
+
+    @staticmethod
+    def _ttl(ttl_seconds):
+        return None if ttl_seconds is None else max(1, math.ceil(ttl_seconds))
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return json.loads(raw)
+
+    def set(self, key, value, ttl_seconds=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self._ttl(ttl_seconds))
+
+    def delete(self, key):
+        return self.client.delete(self.prefix + key) > 0
+
+    def touch(self, key, ttl_seconds):
+        return bool(self.client.expire(self.prefix + key, self._ttl(ttl_seconds)))
+
+    def count(self, prefix=""):
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}{prefix}*"))
+
+
+class StateNamespace:
+    """Dict-style view of one key prefix with a default TTL (e.g. pending signups)."""
+
+    def __init__(self, store, prefix, ttl_seconds=None):
+        self.store = store
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key, default=None):
+        value = self.store.get(self.prefix + key)
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.prefix + key, value, self.ttl_seconds)
+
+    def __delitem__(self, key):
+        if not self.store.delete(self.prefix + key):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.store.get(self.prefix + key) is not None
+
+    def __len__(self):
+        return self.store.count(self.prefix)
+
+
+def create_state_store(url):
+    """
+    Build a store from a URL:
+      memory://                 in-process (default)
+      sqlite:///path/state.db   shared by worker processes on this host
+      redis://host:6379/0       shared across hosts (needs the redis package)
+    """
+    if not url or url.startswith("memory://"):
+        return MemoryStateStore()
+
+    if url.startswith("sqlite:///"):
+        return SQLiteStateStore(url[len("sqlite:///"):])
+
+    if url.startswith(("redis://", "rediss://")):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for redis:// state backends") from e
+        return RedisStateStore(redis.Redis.from_url(url))
+
+    raise ValueError(f"Unsupported state backend URL: {url}")